@@ -0,0 +1,236 @@
+"""
+Bulk writes for content items
+Generated content is saved with one unordered insert_many, and the batch
+endpoints approve or edit many items with a single bulk_write and delete
+them with a single delete_many instead of one round trip per item. Every batch
+operation reports a result per item, so a partial failure only fails the
+items it affected.
+"""
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from content_validation import check_for_approval, validate_content, violation_summary
+from stats_counters import stats_counters
+
+# Largest number of items accepted by one batch request
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+
+STATUS_OK = "ok"
+STATUS_NOT_FOUND = "not_found"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+STATUS_INVALID = "invalid"
+
+
+def _failed_indexes(error: BulkWriteError) -> Dict[int, str]:
+    """Positions of the operations that failed in an unordered bulk write"""
+    return {e["index"]: e.get("errmsg", "write failed") for e in error.details.get("writeErrors", [])}
+
+
+def _summary(results: List[Dict]) -> Dict:
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"requested": len(results), "counts": counts, "results": results}
+
+
+async def insert_content_items(collection, items: List[Dict], memory_collection=None) -> List[Dict]:
+    """
+    Save new content items in one unordered insert_many
+
+    Args:
+        collection: Content collection, or None for the in-memory fallback
+        items: Content items (already carrying "id" and "created_at")
+        memory_collection: In-memory content collection used when collection is None
+
+    Returns:
+        The items that were saved (a failed document does not stop the others)
+    """
+    if not items:
+        return []
+    saved = list(items)
+    if collection is None:
+        saved, skipped = memory_collection.insert_many(items)
+        for content_id in skipped:
+            print(f"⚠️ Warning: Could not save content {content_id}: duplicate id")
+    else:
+        try:
+            await collection.insert_many(items, ordered=False)
+        except BulkWriteError as e:
+            failed = _failed_indexes(e)
+            for index, message in failed.items():
+                print(f"⚠️ Warning: Could not save content {items[index].get('id')}: {message}")
+            saved = [item for index, item in enumerate(items) if index not in failed]
+
+    by_status = {}
+    for item in saved:
+        by_status[item.get('status')] = by_status.get(item.get('status'), 0) + 1
+    for status, count in by_status.items():
+        await stats_counters.content_transition(None, status, count)
+    return saved
+
+
+async def _existing(collection, memory_collection, ids: List[str], with_text: bool = False) -> Dict[str, Dict]:
+    """id -> {id, status, platform} (plus content if with_text) for the requested ids that exist"""
+    if collection is None:
+        return {document["id"]: document for document in memory_collection.find({"id": {"$in": ids}})}
+    projection = {"_id": 0, "id": 1, "status": 1, "platform": 1, **({"content": 1} if with_text else {})}
+    cursor = collection.find({"id": {"$in": ids}}, projection)
+    return {document["id"]: document async for document in cursor}
+
+
+async def batch_approve(collection, memory_collection, ids: List[str], auto_fix: bool = True) -> Dict:
+    """
+    Mark pending items approved with one bulk_write
+
+    Each item is re-validated first: items with errors are auto-fixed (if
+    auto_fix and the fixes make them valid) or left pending and reported as
+    invalid. Items that are not pending are skipped; no platform posting
+    happens here.
+    """
+    ids = list(dict.fromkeys(ids))
+    existing = await _existing(collection, memory_collection, ids, with_text=True)
+    approved_at = datetime.now().isoformat()
+
+    updates = {}
+    invalid = {}
+    for content_id in ids:
+        document = existing.get(content_id)
+        if document is None or document.get("status") != "pending":
+            continue
+        text, fixes, validation = check_for_approval(document.get("platform"), document.get("content", ""), auto_fix)
+        if not validation["valid"]:
+            invalid[content_id] = validation
+            continue
+        update = {"status": "approved", "approved_at": approved_at, "validation": validation}
+        if fixes:
+            update.update({"content": text, "auto_fixes": fixes, "edited_at": approved_at})
+        updates[content_id] = update
+    pending = list(updates)
+
+    approved = set()
+    if pending:
+        if collection is None:
+            for content_id, update in updates.items():
+                if memory_collection.update_one({"id": content_id, "status": "pending"}, update) is not None:
+                    approved.add(content_id)
+        else:
+            operations = [
+                UpdateOne({"id": content_id, "status": "pending"}, {"$set": update}) for content_id, update in updates.items()
+            ]
+            try:
+                result = await collection.bulk_write(operations, ordered=False)
+                modified = result.modified_count
+            except BulkWriteError as e:
+                modified = e.details.get("nModified", 0)
+            approved = set(pending)
+            if modified < len(pending):
+                # Some items changed status after the lookup (or failed to write); find out which were ours
+                cursor = collection.find({"id": {"$in": pending}, "approved_at": approved_at}, {"_id": 0, "id": 1})
+                approved = {document["id"] async for document in cursor}
+
+    await stats_counters.content_transition("pending", "approved", len(approved))
+
+    results = []
+    for content_id in ids:
+        if content_id not in existing:
+            results.append({"id": content_id, "status": STATUS_NOT_FOUND})
+        elif content_id in approved:
+            result = {"id": content_id, "status": STATUS_OK, "approved_at": approved_at}
+            if "auto_fixes" in updates[content_id]:
+                result["auto_fixes"] = updates[content_id]["auto_fixes"]
+            results.append(result)
+        elif content_id in invalid:
+            results.append({
+                "id": content_id,
+                "status": STATUS_INVALID,
+                "message": f"Content fails platform validation: {violation_summary(invalid[content_id])}",
+                "validation": invalid[content_id]
+            })
+        elif content_id in pending:
+            results.append({"id": content_id, "status": STATUS_SKIPPED, "message": "Content changed status during the batch"})
+        else:
+            results.append({"id": content_id, "status": STATUS_SKIPPED, "message": f"Content is {existing[content_id].get('status')}, not pending"})
+    return _summary(results)
+
+
+async def batch_delete(collection, memory_collection, ids: List[str]) -> Dict:
+    """Delete items with one delete_many"""
+    ids = list(dict.fromkeys(ids))
+    existing = await _existing(collection, memory_collection, ids)
+    found = [i for i in ids if i in existing]
+
+    remaining = set()
+    if found:
+        if collection is None:
+            memory_collection.delete_many({"id": {"$in": found}})
+        else:
+            result = await collection.delete_many({"id": {"$in": found}})
+            if result.deleted_count < len(found):
+                cursor = collection.find({"id": {"$in": found}}, {"_id": 0, "id": 1})
+                remaining = {document["id"] async for document in cursor}
+
+    by_status = {}
+    for content_id in found:
+        if content_id not in remaining:
+            status = existing[content_id].get("status")
+            by_status[status] = by_status.get(status, 0) + 1
+    for status, count in by_status.items():
+        await stats_counters.content_transition(status, None, count)
+
+    results = []
+    for content_id in ids:
+        if content_id not in existing:
+            results.append({"id": content_id, "status": STATUS_NOT_FOUND})
+        elif content_id in remaining:
+            results.append({"id": content_id, "status": STATUS_FAILED, "message": "Content was not deleted"})
+        else:
+            results.append({"id": content_id, "status": STATUS_OK})
+    return _summary(results)
+
+
+async def batch_edit(collection, memory_collection, edits: List[Dict]) -> Dict:
+    """
+    Replace the text of several items with one unordered bulk_write
+
+    Args:
+        edits: [{"id": ..., "content": ...}]; a later edit of the same id wins
+    """
+    new_text = {edit["id"]: edit["content"] for edit in edits}
+    ids = list(new_text)
+    existing = await _existing(collection, memory_collection, ids)
+    edited_at = datetime.now().isoformat()
+
+    updates = {
+        content_id: {
+            "content": new_text[content_id],
+            "edited_at": edited_at,
+            "validation": validate_content(existing[content_id].get("platform"), new_text[content_id])
+        }
+        for content_id in ids if content_id in existing
+    }
+
+    failed = {}
+    if updates:
+        if collection is None:
+            for content_id, update in updates.items():
+                memory_collection.update_one({"id": content_id}, update)
+        else:
+            operations = [UpdateOne({"id": content_id}, {"$set": update}) for content_id, update in updates.items()]
+            try:
+                await collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                positions = list(updates)
+                failed = {positions[index]: message for index, message in _failed_indexes(e).items()}
+
+    results = []
+    for content_id in ids:
+        if content_id not in existing:
+            results.append({"id": content_id, "status": STATUS_NOT_FOUND})
+        elif content_id in failed:
+            results.append({"id": content_id, "status": STATUS_FAILED, "message": failed[content_id]})
+        else:
+            results.append({"id": content_id, "status": STATUS_OK, "validation": updates[content_id]["validation"]})
+    return _summary(results)
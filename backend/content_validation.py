@@ -0,0 +1,265 @@
+"""
+Local platform-constraint validation for generated and edited content
+Checks length, hashtag count, the Reddit title/body split, leftover model
+preambles and forbidden phrases without any model call, and applies
+deterministic fixes (trimming, hashtag pruning, title extraction) so an
+oversized post does not have to go back through regeneration.
+"""
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+# Hard limits are errors (the platform rejects or truncates the post); soft ones are warnings
+PLATFORM_CONSTRAINTS = {
+    'Twitter': {'max_length': 280, 'unit': 'characters', 'severity': 'error', 'max_hashtags': 3},
+    'LinkedIn': {'max_length': 1300, 'unit': 'characters', 'severity': 'error', 'max_hashtags': 5},
+    'Instagram': {'max_length': 2200, 'unit': 'characters', 'severity': 'error', 'max_hashtags': 30},
+    'Facebook': {'max_length': 5000, 'unit': 'characters', 'severity': 'warning', 'max_hashtags': 5},
+    'Reddit': {'max_length': 40000, 'unit': 'characters', 'severity': 'error', 'title_max_length': 300},
+    'Email': {'max_length': 2000, 'unit': 'characters', 'severity': 'warning'},
+    'Website': {'max_length': 2000, 'unit': 'words', 'severity': 'warning'},
+    'YouTube': {'max_length': 5000, 'unit': 'words', 'severity': 'warning'}
+}
+
+DEFAULT_FORBIDDEN_PHRASES = [
+    'as an ai',
+    'as a language model',
+    '[insert',
+    '[your ',
+    'lorem ipsum'
+]
+# Extra comma-separated phrases, e.g. competitor names or banned claims
+FORBIDDEN_PHRASES = DEFAULT_FORBIDDEN_PHRASES + [
+    phrase.strip().lower() for phrase in os.getenv('CONTENT_FORBIDDEN_PHRASES', '').split(',') if phrase.strip()
+]
+
+_HASHTAG_RE = re.compile(r'(?<![\w#])#\w+')
+# A first line like "Here is the regenerated LinkedIn post:" that the model should not have written
+_PREAMBLE_RE = re.compile(r"^\s*(here is|here's|here are|sure[,!.]|certainly[,!.]|of course[,!.])[^\n]*:\s*(\n|$)", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r'[.!?](?=\s|$)')
+
+
+def _length(text: str, unit: str) -> int:
+    return len(text.split()) if unit == 'words' else len(text)
+
+
+def _split_title(content: str) -> Tuple[str, str]:
+    """Split Reddit content into title and body the same way posting does"""
+    lines = content.split('\n', 1)
+    return lines[0].strip(), (lines[1].strip() if len(lines) > 1 else '')
+
+
+def _violation(rule: str, severity: str, message: str, fixable: bool, limit=None, actual=None) -> Dict:
+    return {
+        "rule": rule,
+        "severity": severity,
+        "message": message,
+        "limit": limit,
+        "actual": actual,
+        "fixable": fixable
+    }
+
+
+def find_violations(platform: str, content: str) -> List[Dict]:
+    """
+    Check content against the platform's constraints
+
+    Args:
+        platform: Target platform
+        content: Post text
+
+    Returns:
+        List of violations (empty if the content passes)
+    """
+    constraints = PLATFORM_CONSTRAINTS.get(platform, {})
+    violations = []
+    content = content or ''
+
+    if not content.strip():
+        return [_violation("empty", "error", "Content is empty", False)]
+
+    if _PREAMBLE_RE.match(content):
+        violations.append(_violation("preamble", "warning", "Content starts with a model preamble line", True))
+
+    lowered = content.lower()
+    for phrase in FORBIDDEN_PHRASES:
+        if phrase in lowered:
+            violations.append(_violation("forbidden_phrase", "error", f"Contains forbidden phrase '{phrase}'", True, actual=phrase))
+
+    max_hashtags = constraints.get('max_hashtags')
+    if max_hashtags is not None:
+        hashtags = len(_HASHTAG_RE.findall(content))
+        if hashtags > max_hashtags:
+            violations.append(_violation(
+                "hashtags", "warning", f"{hashtags} hashtags (max {max_hashtags} for {platform})", True, max_hashtags, hashtags
+            ))
+
+    body = content
+    title_max = constraints.get('title_max_length')
+    if title_max is not None:
+        title, body = _split_title(content)
+        if not body:
+            violations.append(_violation("missing_title", "warning", "No separate title line; the first line is used as the title", True))
+            body = content
+        if len(title) > title_max:
+            violations.append(_violation(
+                "title_length", "error", f"Title is {len(title)} characters (max {title_max})", True, title_max, len(title)
+            ))
+
+    max_length = constraints.get('max_length')
+    if max_length is not None:
+        unit = constraints['unit']
+        length = _length(body, unit)
+        if length > max_length:
+            violations.append(_violation(
+                "length", constraints['severity'], f"{length} {unit} (max {max_length} for {platform})", True, max_length, length
+            ))
+
+    return violations
+
+
+def validate_content(platform: str, content: str) -> Dict:
+    """Validation result to store on a content document"""
+    violations = find_violations(platform, content)
+    return {
+        "valid": not any(v["severity"] == "error" for v in violations),
+        "violations": violations,
+        "checked_at": datetime.now().isoformat()
+    }
+
+
+def _trim(text: str, max_length: int, unit: str) -> str:
+    """Cut text to the limit, preferring a sentence end, then a word boundary"""
+    if _length(text, unit) <= max_length:
+        return text
+    if unit == 'words':
+        return ' '.join(text.split()[:max_length])
+
+    cut = text[:max_length]
+    sentence_ends = [m.end() for m in _SENTENCE_END_RE.finditer(cut)]
+    if sentence_ends and sentence_ends[-1] >= max_length // 2:
+        return cut[:sentence_ends[-1]].rstrip()
+    cut = text[:max_length - 1]
+    if ' ' in cut:
+        cut = cut[:cut.rindex(' ')]
+    return cut.rstrip(' ,;:-') + '…'
+
+
+def _trim_keeping_hashtags(text: str, max_length: int, unit: str) -> str:
+    """Trim text but keep a trailing block of hashtags, which usually matters most on short posts"""
+    match = re.search(r'(\s+(?:#\w+\s*)+)$', text)
+    if match is None or unit != 'characters':
+        return _trim(text, max_length, unit)
+    tags = match.group(1).strip()
+    room = max_length - len(tags) - 1
+    if room < max_length // 2:
+        return _trim(text, max_length, unit)
+    return f"{_trim(text[:match.start()], room, unit)} {tags}"
+
+
+def _drop_sentences_with(text: str, phrases: List[str]) -> str:
+    """Remove the sentences that contain any of the phrases"""
+    kept_lines = []
+    for line in text.split('\n'):
+        sentences = re.split(r'(?<=[.!?])\s+', line)
+        kept = [s for s in sentences if not any(phrase in s.lower() for phrase in phrases)]
+        if kept or not line.strip():
+            kept_lines.append(' '.join(kept))
+    return '\n'.join(kept_lines).strip()
+
+
+def _prune_hashtags(text: str, max_hashtags: int) -> str:
+    """Keep the first max_hashtags hashtags and drop the rest"""
+    seen = 0
+
+    def keep_or_drop(match):
+        nonlocal seen
+        seen += 1
+        return match.group(0) if seen <= max_hashtags else ''
+
+    pruned = _HASHTAG_RE.sub(keep_or_drop, text)
+    return re.sub(r'[ \t]{2,}', ' ', re.sub(r'[ \t]+\n', '\n', pruned)).strip()
+
+
+def _extract_title(content: str, title_max: int) -> str:
+    """Give Reddit content a title line that fits, using its first sentence where possible"""
+    title, body = _split_title(content)
+    if body and len(title) <= title_max:
+        return content
+
+    match = _SENTENCE_END_RE.search(title)
+    if match and match.end() <= title_max:
+        new_title = title[:match.end()]
+    else:
+        new_title = _trim(title, title_max, 'characters')
+    # Whatever the title did not take moves to the body, so no text is repeated
+    taken = len(new_title) - 1 if new_title != title and new_title.endswith('…') else len(new_title)
+    rest = '\n'.join(part for part in (title[taken:].strip(), body) if part)
+    return f"{new_title.strip()}\n{rest}" if rest else new_title.strip()
+
+
+def auto_fix_content(platform: str, content: str) -> Tuple[str, List[str]]:
+    """
+    Apply deterministic local fixes for fixable violations
+
+    Args:
+        platform: Target platform
+        content: Post text
+
+    Returns:
+        Tuple of (fixed content, names of the fixes applied)
+    """
+    constraints = PLATFORM_CONSTRAINTS.get(platform, {})
+    violations = {v["rule"] for v in find_violations(platform, content) if v["fixable"]}
+    applied = []
+    fixed = content or ''
+
+    if "preamble" in violations:
+        fixed = _PREAMBLE_RE.sub('', fixed, count=1).strip()
+        applied.append("preamble")
+    if "forbidden_phrase" in violations:
+        fixed = _drop_sentences_with(fixed, FORBIDDEN_PHRASES)
+        applied.append("forbidden_phrase")
+    if "hashtags" in violations:
+        fixed = _prune_hashtags(fixed, constraints['max_hashtags'])
+        applied.append("hashtags")
+    if "title_length" in violations or "missing_title" in violations:
+        fixed = _extract_title(fixed, constraints['title_max_length'])
+        applied.append("title")
+    if "length" in violations:
+        if constraints.get('title_max_length') is not None:
+            title, body = _split_title(fixed)
+            fixed = f"{title}\n{_trim(body, constraints['max_length'], constraints['unit'])}"
+        else:
+            fixed = _trim_keeping_hashtags(fixed, constraints['max_length'], constraints['unit'])
+        applied.append("length")
+
+    return fixed, applied
+
+
+def check_for_approval(platform: str, content: str, auto_fix: bool = True) -> Tuple[str, List[str], Dict]:
+    """
+    Re-validate content before approval, auto-fixing it if it has errors
+
+    Args:
+        platform: Target platform
+        content: Current post text
+        auto_fix: Apply the local fixes when the text has error-level violations
+
+    Returns:
+        Tuple of (text to approve, fixes applied, validation of that text);
+        the item must not be approved unless validation["valid"] is True
+    """
+    validation = validate_content(platform, content)
+    if validation["valid"] or not auto_fix:
+        return content, [], validation
+    fixed, fixes = auto_fix_content(platform, content)
+    if not fixes:
+        return content, [], validation
+    return fixed, fixes, validate_content(platform, fixed)
+
+
+def violation_summary(validation: Dict) -> str:
+    """Error-level violation messages joined for an API error message"""
+    return "; ".join(v["message"] for v in validation.get("violations", []) if v["severity"] == "error")
@@ -19,10 +19,12 @@ async def connect_to_mongo():
     """Connect to MongoDB"""
     global client, database
     try:
-        client = AsyncIOMotorClient(MONGODB_URL)
-        database = client[DATABASE_NAME]
-        # Test connection
-        await client.admin.command('ping')
+        mongo_client = AsyncIOMotorClient(MONGODB_URL)
+        # Test connection before publishing it, so a failed connect leaves the
+        # collection getters returning None and the in-memory fallback in use
+        await mongo_client.admin.command('ping')
+        client = mongo_client
+        database = mongo_client[DATABASE_NAME]
         print(f"✅ Connected to MongoDB: {DATABASE_NAME}")
         return database
     except Exception as e:
@@ -73,3 +75,28 @@ def get_credentials_collection():
     """Get platform credentials collection"""
     db = get_database()
     return db.credentials if db is not None else None
+
+def get_jobs_collection():
+    """Get background jobs collection"""
+    db = get_database()
+    return db.jobs if db is not None else None
+
+def get_generation_cache_collection():
+    """Get generation cache collection"""
+    db = get_database()
+    return db.generation_cache if db is not None else None
+
+def get_drafts_collection():
+    """Get speculative (hidden) drafts collection"""
+    db = get_database()
+    return db.drafts if db is not None else None
+
+def get_usage_collection():
+    """Get per-call LLM usage ledger collection"""
+    db = get_database()
+    return db.usage_ledger if db is not None else None
+
+def get_counters_collection():
+    """Get dashboard counters collection"""
+    db = get_database()
+    return db.counters if db is not None else None
@@ -0,0 +1,249 @@
+"""
+MongoDB index registry and schema migrations
+INDEXES declares the indexes every collection should have; ensure_indexes()
+creates the missing ones at startup and reports indexes that exist but are
+not declared. MIGRATIONS are one-off, versioned changes (backfills, drops)
+applied once per database and recorded in the schema_migrations collection.
+"""
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from pymongo.errors import DuplicateKeyError
+from database import get_database
+
+# Drop indexes that exist in the database but are not declared below
+DB_DROP_UNDECLARED_INDEXES = os.getenv('DB_DROP_UNDECLARED_INDEXES', 'false').lower() == 'true'
+# A running migration refreshes its claim this often; a claim silent for longer than the timeout
+# belonged to a worker that died, and the next startup takes it over
+MIGRATION_HEARTBEAT_SECONDS = 30
+MIGRATION_CLAIM_TIMEOUT_SECONDS = int(os.getenv('MIGRATION_CLAIM_TIMEOUT_SECONDS', '300'))
+
+# collection -> index specs; names default to MongoDB's own ("<field>_<direction>_...")
+INDEXES: Dict[str, List[Dict]] = {
+    "content": [
+        {"keys": [("id", 1)], "unique": True},
+        # Pending queue per client, newest first
+        {"keys": [("status", 1), ("client_id", 1), ("created_at", -1)]},
+        {"keys": [("client_id", 1), ("created_at", -1)]},
+        # Keyset pages of the pending queue across all clients
+        {"keys": [("status", 1), ("created_at", -1), ("id", -1)]},
+    ],
+    "clients": [
+        {"keys": [("client_id", 1)], "unique": True},
+        {"keys": [("onboarded_at", -1), ("client_id", -1)]},
+    ],
+    "campaigns": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("client_id", 1)]},
+        {"keys": [("created_at", -1), ("id", -1)]},
+    ],
+    "credentials": [
+        {"keys": [("client_id", 1), ("platform", 1)], "unique": True},
+    ],
+    "jobs": [
+        {"keys": [("job_id", 1)], "unique": True},
+        # Startup scan for interrupted jobs
+        {"keys": [("status", 1), ("heartbeat_at", 1)]},
+        # Finished jobs (set by jobs._persist_job)
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+    "generation_cache": [
+        {"keys": [("key", 1)], "unique": True},
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+    "drafts": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("status", 1), ("kind", 1), ("client_id", 1)]},
+        {"keys": [("status", 1), ("created_at", 1)]},
+        # Backstop for drafts the worker never deleted (set by speculation._store)
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+    "usage_ledger": [
+        {"keys": [("ts", 1)]},
+        {"keys": [("client_id", 1), ("ts", 1)]},
+    ],
+}
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+# Result of the last ensure_database_schema() run
+schema_report: Dict = {}
+
+
+def index_name(spec: Dict) -> str:
+    """Name MongoDB gives an index with these keys"""
+    return spec.get("name") or "_".join(f"{field}_{direction}" for field, direction in spec["keys"])
+
+
+async def _backfill_content_created_at(db):
+    """Content created before timestamps were set gets one, so it sorts and paginates"""
+    result = await db.content.update_many(
+        {"created_at": {"$exists": False}},
+        [{"$set": {"created_at": {"$ifNull": ["$approved_at", {"$ifNull": ["$regenerated_at", "1970-01-01T00:00:00"]}]}}}]
+    )
+    return {"modified": result.modified_count}
+
+
+# (version, description, migration) - append only, never renumber
+MIGRATIONS: List[tuple] = [
+    (1, "Backfill content.created_at for the (status, client_id, created_at) index", _backfill_content_created_at),
+]
+
+
+def _claim_cutoff() -> str:
+    return (datetime.now() - timedelta(seconds=MIGRATION_CLAIM_TIMEOUT_SECONDS)).isoformat()
+
+
+async def _claim_migration(migrations, version: int, description: str) -> bool:
+    """
+    Claim a migration by inserting its _id, or take over a stale claim
+
+    A claim still "running" after MIGRATION_CLAIM_TIMEOUT_SECONDS without a
+    heartbeat is taken over with an update conditioned on the heartbeat seen,
+    so only one worker wins it.
+    """
+    now = datetime.now().isoformat()
+    try:
+        await migrations.insert_one({
+            "_id": version, "description": description, "status": "running", "started_at": now, "heartbeat_at": now
+        })
+        return True
+    except DuplicateKeyError:
+        pass
+    claim = await migrations.find_one({"_id": version})
+    if claim is None or claim.get("status") != "running":
+        return False
+    started_at, heartbeat_at = claim.get("started_at"), claim.get("heartbeat_at")
+    if (heartbeat_at or started_at or '') >= _claim_cutoff():
+        # Another worker is applying it
+        return False
+    result = await migrations.update_one(
+        {"_id": version, "status": "running", "started_at": started_at, "heartbeat_at": heartbeat_at},
+        {"$set": {"started_at": now, "heartbeat_at": now, "taken_over_at": now}}
+    )
+    if result.modified_count:
+        print(f"⚠️ Warning: Migration {version} was left running since {started_at}; retrying it")
+    return result.modified_count == 1
+
+
+async def _heartbeat(migrations, version: int):
+    while True:
+        await asyncio.sleep(MIGRATION_HEARTBEAT_SECONDS)
+        await migrations.update_one({"_id": version, "status": "running"}, {"$set": {"heartbeat_at": datetime.now().isoformat()}})
+
+
+async def run_migrations(db) -> List[Dict]:
+    """
+    Apply pending migrations in version order
+
+    Each version is claimed by inserting its _id first, so concurrent workers
+    starting together apply it only once. Claims left by a worker that died
+    mid-migration are taken over once they time out.
+    """
+    applied = []
+    migrations = db[MIGRATIONS_COLLECTION]
+    done = {doc["_id"] for doc in await migrations.find({"status": "applied"}, {"_id": 1}).to_list(length=None)}
+
+    for version, description, migrate in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        if not await _claim_migration(migrations, version, description):
+            continue
+        heartbeat = asyncio.ensure_future(_heartbeat(migrations, version))
+        try:
+            result = await migrate(db)
+        except Exception as e:
+            # Release the claim so the next startup retries it
+            await migrations.delete_one({"_id": version})
+            applied.append({"version": version, "description": description, "error": str(e)})
+            print(f"⚠️ Warning: Migration {version} failed: {str(e)}")
+            # Later migrations may depend on this one
+            break
+        finally:
+            heartbeat.cancel()
+        await migrations.update_one(
+            {"_id": version},
+            {"$set": {"status": "applied", "result": result, "applied_at": datetime.now().isoformat()}}
+        )
+        applied.append({"version": version, "description": description, "result": result})
+        print(f"✅ Applied migration {version}: {description}")
+    return applied
+
+
+async def ensure_indexes(db) -> Dict:
+    """
+    Create declared indexes that are missing and report undeclared ones
+
+    Returns:
+        Dict with "missing" (declared but absent at startup), "created", "existing",
+        "extra" (present but undeclared), "dropped" and "errors" per collection
+    """
+    report = {"missing": {}, "created": {}, "existing": {}, "extra": {}, "dropped": {}, "errors": {}}
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        declared = {index_name(spec) for spec in specs} | {"_id_"}
+
+        for spec in specs:
+            name = index_name(spec)
+            if name in existing:
+                report["existing"].setdefault(collection_name, []).append(name)
+                continue
+            report["missing"].setdefault(collection_name, []).append(name)
+            options = {key: value for key, value in spec.items() if key not in ("keys", "name")}
+            try:
+                await collection.create_index(spec["keys"], name=name, **options)
+                report["created"].setdefault(collection_name, []).append(name)
+            except Exception as e:
+                # e.g. duplicate ids already stored block a unique index; the app still runs
+                report["errors"].setdefault(collection_name, []).append({"index": name, "error": str(e)})
+                print(f"⚠️ Warning: Could not create index {collection_name}.{name}: {str(e)}")
+
+        for name in sorted(set(existing) - declared):
+            report["extra"].setdefault(collection_name, []).append(name)
+            if DB_DROP_UNDECLARED_INDEXES:
+                await collection.drop_index(name)
+                report["dropped"].setdefault(collection_name, []).append(name)
+    return report
+
+
+async def ensure_database_schema() -> Optional[Dict]:
+    """Run pending migrations, then reconcile indexes (no-op without MongoDB)"""
+    db = get_database()
+    if db is None:
+        return None
+    migrations = await run_migrations(db)
+    indexes = await ensure_indexes(db)
+
+    schema_report.clear()
+    schema_report.update({
+        "checked_at": datetime.now().isoformat(),
+        "migrations_applied": migrations,
+        "latest_migration": max((m[0] for m in MIGRATIONS), default=0),
+        **indexes
+    })
+    missing, created, extra, errors = (
+        sum(len(names) for names in indexes[key].values()) for key in ("missing", "created", "extra", "errors")
+    )
+    print(f"✅ Indexes checked: {missing} missing ({created} created, {errors} failed), {extra} undeclared")
+    return schema_report
+
+
+async def get_schema_status() -> Dict:
+    """Last startup report plus the migrations recorded in the database"""
+    db = get_database()
+    recorded = []
+    if db is not None:
+        recorded = await db[MIGRATIONS_COLLECTION].find().sort("_id", 1).to_list(length=None)
+    cutoff = _claim_cutoff()
+    return {
+        "report": schema_report,
+        "migrations": recorded,
+        # Claimed but silent past the timeout; the next startup retries them
+        "stuck_migrations": [
+            migration["_id"] for migration in recorded
+            if migration.get("status") == "running" and (migration.get("heartbeat_at") or migration.get("started_at") or '') < cutoff
+        ],
+        "declared_indexes": {name: [index_name(spec) for spec in specs] for name, specs in INDEXES.items()}
+    }
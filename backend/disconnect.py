@@ -0,0 +1,67 @@
+"""
+Cancel request-scoped work when the HTTP client goes away
+Long operations (model calls, browser posting) run as a task while the
+request is polled for a disconnect. If the client leaves, the task is
+cancelled, which propagates into the OpenAI call (closing its connection
+and scheduler slot) or the puppeteer flow (closing the browser). Work
+submitted as detached is left to finish.
+"""
+import os
+import asyncio
+from typing import Awaitable, Dict
+from fastapi import Request
+
+DISCONNECT_POLL_SECONDS = float(os.getenv('DISCONNECT_POLL_SECONDS', '0.5'))
+
+
+class ClientDisconnected(Exception):
+    """Raised when work was cancelled because the client disconnected"""
+
+
+_stats = {"watched": 0, "detached": 0, "cancelled": 0, "by_operation": {}}
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable, operation: str, detached: bool = False):
+    """
+    Await work, cancelling it if the client disconnects first
+
+    Args:
+        request: Incoming request to watch
+        awaitable: The work to run
+        operation: Name for the counters (e.g. "regenerate")
+        detached: If True the work runs to completion regardless of the client
+
+    Returns:
+        Result of the work
+
+    Raises:
+        ClientDisconnected: If the client went away and the work was cancelled
+    """
+    if detached:
+        _stats["detached"] += 1
+        return await awaitable
+
+    _stats["watched"] += 1
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                break
+    finally:
+        # Also covers this coroutine itself being cancelled
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    _stats["cancelled"] += 1
+    _stats["by_operation"][operation] = _stats["by_operation"].get(operation, 0) + 1
+    print(f"Client disconnected; cancelled {operation}")
+    raise ClientDisconnected(f"Client disconnected during {operation}")
+
+
+def get_disconnect_stats() -> Dict:
+    """Counts of watched, detached and cancelled operations"""
+    return {**_stats, "by_operation": dict(_stats["by_operation"])}
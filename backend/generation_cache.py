@@ -0,0 +1,175 @@
+"""
+Content-addressed cache for generated content and images
+Keys are a hash of the normalized prompt and model parameters. Entries live in
+an in-process LRU tier and, when MongoDB is connected, in a TTL-expiring
+collection shared by all workers.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from database import get_generation_cache_collection
+
+GENERATION_CACHE_ENABLED = os.getenv('GENERATION_CACHE_ENABLED', 'true').lower() == 'true'
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', '512'))
+GENERATION_CACHE_TTL_SECONDS = int(os.getenv('GENERATION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+# DALL-E image URLs expire after about an hour, so image entries must not outlive them
+IMAGE_CACHE_TTL_SECONDS = int(os.getenv('IMAGE_CACHE_TTL_SECONDS', '3000'))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _normalize(value):
+    """Collapse whitespace in strings (recursively) so formatting noise does not change the key"""
+    if isinstance(value, str):
+        return _WHITESPACE_RE.sub(' ', value).strip()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def make_cache_key(kind: str, **inputs) -> str:
+    """
+    Build a cache key from the prompt inputs and model parameters
+
+    Args:
+        kind: Kind of generation ("content", "image", ...)
+        **inputs: Messages/prompt and model parameters (model, temperature, max_tokens, ...)
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    payload = json.dumps({"kind": kind, **_normalize(inputs)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier (in-process LRU + MongoDB TTL) cache for generated output"""
+
+    def __init__(self, max_entries: int = GENERATION_CACHE_MAX_ENTRIES, ttl_seconds: int = GENERATION_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "bypasses": 0,
+            "writes": 0
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= datetime.now():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: str, expires_at: datetime):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Look up a key in the in-process tier, then MongoDB"""
+        if not GENERATION_CACHE_ENABLED:
+            return None
+
+        value = self._memory_get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        collection = get_generation_cache_collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one({"key": key, "expires_at": {"$gt": datetime.utcnow()}})
+            except Exception as e:
+                print(f"⚠️ Warning: Generation cache lookup failed: {str(e)}")
+                doc = None
+            if doc is not None:
+                # Promote to the in-process tier, keeping the shorter local lifetime
+                expires_at = min(
+                    datetime.now() + (doc["expires_at"] - datetime.utcnow()),
+                    datetime.now() + timedelta(seconds=self.ttl_seconds)
+                )
+                self._memory_set(key, doc["value"], expires_at)
+                self._count("mongo_hits")
+                return doc["value"]
+
+        self._count("misses")
+        return None
+
+    async def aset(self, key: str, value: str, kind: str = "content", ttl_seconds: Optional[int] = None):
+        """Store a value in the in-process tier and MongoDB"""
+        if not GENERATION_CACHE_ENABLED or not value:
+            return
+
+        ttl = ttl_seconds or self.ttl_seconds
+        self._memory_set(key, value, datetime.now() + timedelta(seconds=ttl))
+        self._count("writes")
+
+        collection = get_generation_cache_collection()
+        if collection is None:
+            return
+        try:
+            await collection.update_one(
+                {"key": key},
+                {"$set": {
+                    "key": key,
+                    "kind": kind,
+                    "value": value,
+                    "created_at": datetime.utcnow(),
+                    "expires_at": datetime.utcnow() + timedelta(seconds=ttl)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️ Warning: Could not write generation cache entry: {str(e)}")
+
+    def record_bypass(self):
+        """Count a lookup that was explicitly skipped (e.g. regenerate)"""
+        self._count("bypasses")
+
+    def clear(self):
+        """Drop all in-process entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._entries)
+        lookups = counters["memory_hits"] + counters["mongo_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["mongo_hits"]
+        return {
+            "enabled": GENERATION_CACHE_ENABLED,
+            "memory_entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            **counters
+        }
+
+
+# Shared cache instance used by services.py
+generation_cache = GenerationCache()
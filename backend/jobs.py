@@ -0,0 +1,220 @@
+"""
+Background job tracking for long-running content generation
+Jobs are kept in memory and mirrored to MongoDB (when connected) so their
+progress can be polled through the API. Finished jobs are pruned from memory
+and expire from MongoDB after JOB_RETENTION_SECONDS. A running job's worker
+refreshes heartbeat_at; a queued/running job whose heartbeat stops (the
+process died or restarted) is marked failed instead of polling forever.
+"""
+import os
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Dict, List, Optional
+from database import get_jobs_collection
+
+# How long finished jobs can still be polled
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', '86400'))
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', '30'))
+# Missed heartbeats before a queued/running job counts as orphaned
+JOB_ORPHAN_HEARTBEATS = 3
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# In-memory job registry (source of truth for jobs started by this process)
+jobs_db: Dict[str, Dict] = {}
+
+# Strong references to running tasks so they are not garbage collected
+_running_tasks = set()
+
+
+async def _persist_job(job: Dict):
+    """Mirror a job document to MongoDB if connected (this also refreshes its heartbeat)"""
+    jobs_collection = get_jobs_collection()
+    if jobs_collection is None:
+        return
+    document = {**job, "heartbeat_at": datetime.now().isoformat()}
+    if job.get("finished_at"):
+        # TTL index in db_indexes.py
+        document["expires_at"] = datetime.fromisoformat(job["finished_at"]) + timedelta(seconds=JOB_RETENTION_SECONDS)
+    try:
+        await jobs_collection.replace_one({"job_id": job["job_id"]}, document, upsert=True)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not persist job {job['job_id']}: {str(e)}")
+
+
+def _prune_finished_jobs():
+    """Drop finished jobs older than the retention window from memory"""
+    cutoff = (datetime.now() - timedelta(seconds=JOB_RETENTION_SECONDS)).isoformat()
+    for job_id in [job_id for job_id, job in jobs_db.items() if (job.get("finished_at") or cutoff) < cutoff]:
+        del jobs_db[job_id]
+
+
+def _orphan_cutoff() -> str:
+    return (datetime.now() - timedelta(seconds=JOB_HEARTBEAT_SECONDS * JOB_ORPHAN_HEARTBEATS)).isoformat()
+
+
+def _orphan_update() -> Dict:
+    now = datetime.now()
+    return {
+        "status": "failed",
+        "error": "Job was interrupted (the server stopped before it finished)",
+        "finished_at": now.isoformat(),
+        "expires_at": now + timedelta(seconds=JOB_RETENTION_SECONDS)
+    }
+
+
+async def fail_orphaned_jobs() -> int:
+    """
+    Mark queued/running jobs whose worker stopped sending heartbeats as failed
+
+    Called at startup; jobs of other live workers keep their heartbeat fresh
+    and are left alone.
+
+    Returns:
+        Number of jobs marked failed
+    """
+    jobs_collection = get_jobs_collection()
+    if jobs_collection is None:
+        return 0
+    result = await jobs_collection.update_many(
+        {
+            "status": {"$in": list(ACTIVE_STATUSES)},
+            "job_id": {"$nin": list(jobs_db)},
+            "$or": [{"heartbeat_at": {"$lt": _orphan_cutoff()}}, {"heartbeat_at": {"$exists": False}}]
+        },
+        {"$set": _orphan_update()}
+    )
+    if result.modified_count:
+        print(f"⚠️ Warning: Marked {result.modified_count} interrupted job(s) as failed")
+    return result.modified_count
+
+
+async def create_job(job_type: str, client_id: Optional[str], platforms: List[str]) -> Dict:
+    """
+    Create a queued job with one progress entry per platform
+
+    Args:
+        job_type: Kind of job (e.g. "onboarding_generation")
+        client_id: Client the job belongs to
+        platforms: Platforms the job will generate content for
+
+    Returns:
+        The job document
+    """
+    job = {
+        "job_id": str(uuid.uuid4()),
+        "type": job_type,
+        "client_id": client_id,
+        "status": "queued",
+        "platforms": {platform: {"status": "pending"} for platform in platforms},
+        "total": len(platforms),
+        "completed": 0,
+        "failed": 0,
+        "content_ids": [],
+        "error": None,
+        "created_at": datetime.now().isoformat(),
+        "started_at": None,
+        "finished_at": None
+    }
+    _prune_finished_jobs()
+    jobs_db[job["job_id"]] = job
+    await _persist_job(job)
+    return job
+
+
+async def update_job(job_id: str, **fields) -> Optional[Dict]:
+    """Set top-level fields on a job"""
+    job = jobs_db.get(job_id)
+    if job is None:
+        return None
+    job.update(fields)
+    await _persist_job(job)
+    return job
+
+
+async def update_platform_progress(job_id: str, platform: str, status: str, **fields) -> Optional[Dict]:
+    """
+    Record progress for one platform of a job
+
+    Args:
+        job_id: Job to update
+        platform: Platform name
+        status: "running", "generated" (done but not saved yet), "completed" or "failed"
+        **fields: Extra details to store on the platform entry (e.g. error)
+
+    Returns:
+        The updated job document
+    """
+    job = jobs_db.get(job_id)
+    if job is None:
+        return None
+
+    entry = job["platforms"].setdefault(platform, {})
+    previous_status = entry.get("status")
+    entry["status"] = status
+    entry.update(fields)
+
+    if status != previous_status:
+        # A platform is counted once, in the bucket of its latest status
+        for counted in ("completed", "failed"):
+            if previous_status == counted:
+                job[counted] -= 1
+            if status == counted:
+                job[counted] += 1
+
+    await _persist_job(job)
+    return job
+
+
+async def get_job(job_id: str) -> Optional[Dict]:
+    """Get a job by ID from memory, falling back to MongoDB"""
+    job = jobs_db.get(job_id)
+    if job is not None:
+        return job
+
+    jobs_collection = get_jobs_collection()
+    if jobs_collection is not None:
+        job = await jobs_collection.find_one({"job_id": job_id}, {"_id": 0, "expires_at": 0})
+        if job is not None and job.get("status") in ACTIVE_STATUSES and (job.get("heartbeat_at") or '') < _orphan_cutoff():
+            # Its worker died after the startup check ran
+            update = _orphan_update()
+            await jobs_collection.update_one({"job_id": job_id, "status": {"$in": list(ACTIVE_STATUSES)}}, {"$set": update})
+            update.pop("expires_at")
+            job.update(update)
+    return job
+
+
+def run_in_background(job_id: str, coro: Awaitable):
+    """
+    Run a job coroutine as a background task on the event loop
+
+    The job is marked running when the task starts and completed or failed
+    when it finishes.
+    """
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            job = jobs_db.get(job_id)
+            if job is not None:
+                await _persist_job(job)
+
+    async def runner():
+        await update_job(job_id, status="running", started_at=datetime.now().isoformat())
+        beating = asyncio.ensure_future(heartbeat())
+        try:
+            await coro
+        except Exception as e:
+            print(f"Error in background job {job_id}: {str(e)}")
+            await update_job(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+            return
+        finally:
+            beating.cancel()
+        job = jobs_db.get(job_id, {})
+        status = "failed" if job.get("total") and job.get("failed") == job.get("total") else "completed"
+        await update_job(job_id, status=status, finished_at=datetime.now().isoformat())
+
+    task = asyncio.create_task(runner())
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    return task
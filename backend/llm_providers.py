@@ -0,0 +1,311 @@
+"""
+LLM provider backends
+services.py makes every chat and image call through the provider selected by
+LLM_PROVIDER: "openai" (the real API) or "stub", a deterministic local
+backend with configurable latency, error rate and streaming speed for load
+testing and benchmarking without network access or API costs.
+Providers return OpenAI-shaped response objects, so callers do not care
+which backend served them.
+"""
+import os
+import re
+import json
+import math
+import random
+import asyncio
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "openai" or "stub"
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai')
+
+# SDK-level retries; the shared rate limiter keeps these rare
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '3'))
+
+# Stub backend settings
+# Latency distribution: "fixed", "uniform", "normal" or "lognormal"
+STUB_LATENCY_DISTRIBUTION = os.getenv('STUB_LATENCY_DISTRIBUTION', 'lognormal')
+# Median time to first token and its spread (std dev, or half-width for "uniform")
+STUB_LATENCY_MS = float(os.getenv('STUB_LATENCY_MS', '800'))
+STUB_LATENCY_SPREAD_MS = float(os.getenv('STUB_LATENCY_SPREAD_MS', '300'))
+# Output speed after the first token; 0 returns the whole completion at once
+STUB_TOKENS_PER_SECOND = float(os.getenv('STUB_TOKENS_PER_SECOND', '60'))
+# Share of calls that fail, and the HTTP status they fail with
+STUB_ERROR_RATE = float(os.getenv('STUB_ERROR_RATE', '0'))
+STUB_ERROR_STATUS = int(os.getenv('STUB_ERROR_STATUS', '500'))
+# Share of max_tokens a completion fills
+STUB_OUTPUT_FILL = float(os.getenv('STUB_OUTPUT_FILL', '0.6'))
+STUB_IMAGE_LATENCY_MS = float(os.getenv('STUB_IMAGE_LATENCY_MS', '3000'))
+STUB_SEED = int(os.getenv('STUB_SEED', '42'))
+
+
+def _get_openai_api_key() -> str:
+    """Read and validate the OpenAI API key from the environment"""
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key or api_key == 'your_openai_api_key_here':
+        raise Exception("OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
+    return api_key
+
+
+class LLMProvider(ABC):
+    """Interface for chat and image backends"""
+
+    name = "base"
+
+    @abstractmethod
+    async def achat_completion(self, request_params: Dict):
+        """Create a chat completion"""
+
+    @abstractmethod
+    async def astream_chat_completion(self, request_params: Dict):
+        """
+        Start a streaming chat completion
+
+        Returns:
+            Async iterable of completion chunks with an async close() method;
+            the final chunk carries usage
+        """
+
+    @abstractmethod
+    async def agenerate_image(self, prompt: str, **params):
+        """Generate an image"""
+
+    def describe(self) -> Dict:
+        """Provider name and settings for monitoring"""
+        return {"name": self.name}
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI API backend (the client is created lazily to handle a missing API key)"""
+
+    name = "openai"
+
+    def __init__(self):
+        self._async_client = None
+
+    def async_client(self):
+        """Get or initialize async OpenAI client"""
+        if self._async_client is None:
+            api_key = _get_openai_api_key()
+            try:
+                self._async_client = AsyncOpenAI(
+                    api_key=api_key,
+                    timeout=60.0,
+                    max_retries=OPENAI_MAX_RETRIES
+                )
+            except Exception as e:
+                raise Exception(f"Failed to initialize async OpenAI client: {str(e)}")
+        return self._async_client
+
+    async def achat_completion(self, request_params: Dict):
+        return await self.async_client().chat.completions.create(**request_params)
+
+    async def astream_chat_completion(self, request_params: Dict):
+        return await self.async_client().chat.completions.create(
+            **request_params,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+    async def agenerate_image(self, prompt: str, **params):
+        return await self.async_client().images.generate(prompt=prompt, **params)
+
+    def describe(self) -> Dict:
+        return {"name": self.name, "max_retries": OPENAI_MAX_RETRIES}
+
+
+class StubProviderError(Exception):
+    """Simulated upstream failure (carries status_code like OpenAI API errors)"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Stub provider simulated error (HTTP {status_code})")
+        self.status_code = status_code
+
+
+_STUB_WORDS = (
+    "brand audience growth story launch insight community value trust quality "
+    "customers team product results ideas future share discover learn build "
+    "today together journey impact simple smarter better craft moment"
+).split()
+
+# Platform keys in the structured template's example JSON, e.g. "Twitter": {"content": "..."}
+_STRUCTURED_PLATFORM_RE = re.compile(r'"([^"]+)": \{"content": "\.\.\."\}')
+
+
+def _usage(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+    )
+
+
+class _StubStream:
+    """Async iterable of chunks mimicking the OpenAI SDK's AsyncStream"""
+
+    def __init__(self, provider: "StubProvider", texts: List[str], usage):
+        self._provider = provider
+        self._texts = texts
+        self._usage = usage
+        self._closed = False
+
+    async def __aiter__(self):
+        for text in self._texts:
+            for index, word in enumerate(text.split(' ')):
+                if self._closed:
+                    return
+                await asyncio.sleep(self._provider.token_delay())
+                yield SimpleNamespace(
+                    choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=word if index == 0 else f" {word}"))],
+                    usage=None
+                )
+        yield SimpleNamespace(choices=[], usage=self._usage)
+
+    async def close(self):
+        self._closed = True
+
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic local backend for load testing
+
+    Output text is derived from a hash of the request, so the same prompt
+    always yields the same completion. Latencies and injected errors come
+    from a single seeded random generator, so a run with the same request
+    sequence reproduces the same timings.
+    """
+
+    name = "stub"
+
+    def __init__(self, seed: int = STUB_SEED):
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _draw(self, fn):
+        with self._lock:
+            return fn(self._random)
+
+    def first_token_delay(self) -> float:
+        """Seconds until the first token, drawn from the configured distribution"""
+        median = STUB_LATENCY_MS / 1000.0
+        spread = STUB_LATENCY_SPREAD_MS / 1000.0
+        if STUB_LATENCY_DISTRIBUTION == 'fixed' or spread <= 0:
+            return median
+        if STUB_LATENCY_DISTRIBUTION == 'uniform':
+            return max(0.0, self._draw(lambda r: r.uniform(median - spread, median + spread)))
+        if STUB_LATENCY_DISTRIBUTION == 'normal':
+            return max(0.0, self._draw(lambda r: r.gauss(median, spread)))
+        # lognormal: long right tail like real API latencies
+        sigma = math.log(1 + spread / median) if median > 0 else 0.0
+        return self._draw(lambda r: r.lognormvariate(math.log(median), sigma)) if median > 0 else 0.0
+
+    def token_delay(self) -> float:
+        """Seconds between streamed tokens"""
+        return 1.0 / STUB_TOKENS_PER_SECOND if STUB_TOKENS_PER_SECOND > 0 else 0.0
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if STUB_ERROR_RATE > 0 and self._draw(lambda r: r.random()) < STUB_ERROR_RATE:
+            self.errors += 1
+            raise StubProviderError(STUB_ERROR_STATUS)
+
+    def _completion_texts(self, request_params: Dict) -> List[str]:
+        """Deterministic completion text for each of the request's n choices"""
+        messages = request_params.get('messages', [])
+        seed = hashlib.sha256(json.dumps(messages, sort_keys=True).encode('utf-8')).hexdigest()
+        word_count = max(3, int((request_params.get('max_tokens') or 1000) * STUB_OUTPUT_FILL * 0.75))
+
+        texts = []
+        for choice in range(request_params.get('n') or 1):
+            digest = hashlib.sha256(f"{seed}:{choice}".encode('utf-8')).digest()
+            words = [_STUB_WORDS[digest[i % len(digest)] % len(_STUB_WORDS)] for i in range(word_count)]
+            text = f"[stub {seed[:8]}] " + " ".join(words).capitalize() + "."
+            if (request_params.get('response_format') or {}).get('type') == 'json_object':
+                platforms = _STRUCTURED_PLATFORM_RE.findall(str(messages[-1].get('content') or '')) if messages else []
+                text = json.dumps({"platforms": {platform: {"content": f"{platform}: {text}"} for platform in platforms}})
+            texts.append(text)
+        return texts
+
+    def _prompt_tokens(self, request_params: Dict) -> int:
+        return sum(len(str(message.get('content') or '')) for message in request_params.get('messages', [])) // 4
+
+    def _response(self, request_params: Dict):
+        texts = self._completion_texts(request_params)
+        completion_tokens = sum(len(text.split(' ')) for text in texts)
+        return SimpleNamespace(
+            model=request_params.get('model'),
+            choices=[
+                SimpleNamespace(index=i, message=SimpleNamespace(role="assistant", content=text), finish_reason="stop")
+                for i, text in enumerate(texts)
+            ],
+            usage=_usage(self._prompt_tokens(request_params), completion_tokens)
+        ), completion_tokens
+
+    async def achat_completion(self, request_params: Dict):
+        self._maybe_fail()
+        response, completion_tokens = self._response(request_params)
+        await asyncio.sleep(self.first_token_delay() + completion_tokens * self.token_delay())
+        return response
+
+    async def astream_chat_completion(self, request_params: Dict):
+        self._maybe_fail()
+        await asyncio.sleep(self.first_token_delay())
+        response, _ = self._response(request_params)
+        return _StubStream(self, [choice.message.content for choice in response.choices], response.usage)
+
+    def _image_response(self, prompt: str, size: Optional[str]):
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        return SimpleNamespace(data=[SimpleNamespace(url=f"https://placehold.co/{size or '1024x1024'}/png?text=stub-{digest}")])
+
+    async def agenerate_image(self, prompt: str, **params):
+        self._maybe_fail()
+        await asyncio.sleep(STUB_IMAGE_LATENCY_MS / 1000.0)
+        return self._image_response(prompt, params.get('size'))
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "latency_distribution": STUB_LATENCY_DISTRIBUTION,
+            "latency_ms": STUB_LATENCY_MS,
+            "latency_spread_ms": STUB_LATENCY_SPREAD_MS,
+            "tokens_per_second": STUB_TOKENS_PER_SECOND,
+            "error_rate": STUB_ERROR_RATE,
+            "error_status": STUB_ERROR_STATUS,
+            "image_latency_ms": STUB_IMAGE_LATENCY_MS,
+            "calls": self.calls,
+            "errors": self.errors
+        }
+
+
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'stub': StubProvider
+}
+
+_provider: Optional[LLMProvider] = None
+
+
+def get_llm_provider() -> LLMProvider:
+    """Get or initialize the provider selected by LLM_PROVIDER"""
+    global _provider
+    if _provider is None:
+        if LLM_PROVIDER not in PROVIDERS:
+            raise Exception(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}'. Expected one of: {', '.join(PROVIDERS)}")
+        _provider = PROVIDERS[LLM_PROVIDER]()
+    return _provider
+
+
+def set_llm_provider(provider: LLMProvider):
+    """Replace the active provider (e.g. to inject a differently configured stub)"""
+    global _provider
+    _provider = provider
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, File, UploadFile, Form, Query
+from fastapi import FastAPI, File, UploadFile, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from typing import Optional, List
 from pydantic import BaseModel
@@ -8,12 +8,36 @@ from datetime import datetime
 import uvicorn
 import uuid
 import os
+import json
 from pathlib import Path
 from bson import ObjectId
 from contextlib import asynccontextmanager
-from services import generate_content_for_all_platforms, generate_content, regenerate_content, post_to_n8n
+from services import (
+    generate_content_for_all_platforms_async, get_target_platforms, build_content_item, PLATFORM_CONTENT_TYPES,
+    generate_content_async, generate_brand_digest_async, regenerate_content_async, regenerate_content_variants_async, stream_generate_content, stream_regenerate_content, post_to_n8n,
+    get_rate_limit_headroom,
+    get_llm_provider_info, get_model_routes, MAX_REGENERATION_VARIANTS
+)
 from database import connect_to_mongo, close_mongo_connection, get_database, get_clients_collection, get_content_collection, get_campaigns_collection, get_credentials_collection
+from db_indexes import ensure_database_schema, get_schema_status
 from platform_posting import post_to_platform
+from generation_cache import generation_cache
+from prompt_templates import get_prompt_cache_stats
+from resilience import get_resilience_status
+from singleflight import get_singleflight_stats
+from scheduler import model_call_scheduler, LANE_INTERACTIVE
+from model_routing import parse_model_routes
+from content_validation import validate_content, auto_fix_content, check_for_approval, violation_summary
+from speculation import speculative_generator
+from usage_ledger import usage_ledger
+from stats_counters import stats_counters
+from content_batch import BATCH_MAX_ITEMS, batch_approve, batch_delete, batch_edit, insert_content_items
+from pagination import InvalidCursor, paginate_collection, stream_ndjson
+from memory_store import MemoryCollection, memory_store
+from projections import InvalidProjection, build_projection, finish_document, parse_fields, project_document
+from semantic_cache import semantic_cache
+from disconnect import ClientDisconnected, cancel_on_disconnect, get_disconnect_stats
+from jobs import create_job, update_job, update_platform_progress, get_job, run_in_background, fail_orphaned_jobs
 from puppeteer_posting import post_to_platform_puppeteer
 import asyncio
 
@@ -35,10 +59,26 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Warning: MongoDB connection issue during startup: {str(e)}")
         print("Continuing without MongoDB (will use in-memory storage)")
+    else:
+        try:
+            await ensure_database_schema()
+        except Exception as e:
+            print(f"⚠️ Warning: Could not apply migrations/indexes: {str(e)}")
+        try:
+            await fail_orphaned_jobs()
+        except Exception as e:
+            print(f"⚠️ Warning: Could not check for interrupted jobs: {str(e)}")
+    
+    usage_ledger.start()
+    speculative_generator.start()
+    stats_counters.start(memory_store.status_counts)
     
     yield
     
     # Shutdown
+    await stats_counters.stop()
+    await speculative_generator.stop()
+    await usage_ledger.stop()
     try:
         await close_mongo_connection()
     except Exception as e:
@@ -80,6 +120,23 @@ class ClientOnboardingRequest(BaseModel):
 class ApproveContentRequest(BaseModel):
     platform: Optional[str] = None
     credentials: Optional[dict] = None
+    # Keep posting even if the client disconnects
+    detached: bool = False
+    # Apply local fixes to content that fails validation instead of refusing it
+    auto_fix: bool = True
+
+class BatchContentRequest(BaseModel):
+    ids: List[str]
+
+class BatchApproveRequest(BatchContentRequest):
+    auto_fix: bool = True
+
+class BatchEditItem(BaseModel):
+    id: str
+    content: str
+
+class BatchEditRequest(BaseModel):
+    items: List[BatchEditItem]
 
 # MongoDB collections will be accessed via helper functions from database.py
 
@@ -91,6 +148,49 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+async def apply_brand_digest(client_data: dict, use_cache: bool = True) -> Optional[dict]:
+    """Build the client's brand voice digest and store it on the client document"""
+    try:
+        digest = await generate_brand_digest_async(client_data, use_cache=use_cache)
+    except Exception as e:
+        # Generation still works from the (budget-trimmed) raw past examples
+        print(f"⚠️ Warning: Could not build brand digest: {str(e)}")
+        return None
+    if digest is None:
+        return None
+    
+    digest['brand_digest_at'] = datetime.now().isoformat()
+    clients_collection = get_clients_collection()
+    if clients_collection is not None:
+        await clients_collection.update_one({"client_id": client_data["client_id"]}, {"$set": digest})
+    client_data.update(digest)
+    return digest
+
+async def generate_onboarding_content(job_id: str, client_data: dict):
+    """Background job: generate initial content for a client and save it"""
+    await apply_brand_digest(client_data)
+    
+    async def on_progress(platform: str, status: str, **details):
+        # A platform only counts as completed once its content is saved below
+        if status == "completed":
+            status = "generated"
+        await update_platform_progress(job_id, platform, status, **details)
+    
+    generated_content = await generate_content_for_all_platforms_async(client_data, on_progress=on_progress)
+    for content_item in generated_content:
+        content_item['id'] = str(uuid.uuid4())
+        content_item['created_at'] = datetime.now().isoformat()
+    
+    saved = await insert_content_items(get_content_collection(), generated_content, memory_store.content)
+    saved_ids = {content_item['id'] for content_item in saved}
+    for content_item in generated_content:
+        if content_item['id'] in saved_ids:
+            await update_platform_progress(job_id, content_item['platform'], "completed", content_id=content_item['id'])
+        else:
+            await update_platform_progress(job_id, content_item['platform'], "failed", error="Could not save content")
+    
+    await update_job(job_id, content_ids=[content_item['id'] for content_item in saved])
+
 @app.post("/api/client/onboard")
 async def onboard_client(
     brand_tone: str = Form(...),
@@ -106,12 +206,23 @@ async def onboard_client(
     primary_channels: Optional[str] = Form(None),
     texts: Optional[str] = Form(None),
     generate_images: Optional[str] = Form(None),
+    generation_mode: Optional[str] = Form(None),
+    model_routes: Optional[str] = Form(None),
+    scheduling_weight: Optional[float] = Form(None),
     images: List[UploadFile] = File(None),
     videos: List[UploadFile] = File(None)
 ):
     """
     Client onboarding endpoint that accepts form data including file uploads
     """
+    try:
+        client_model_routes = parse_model_routes(model_routes)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
+        )
+    
     try:
         # Process uploaded images
         image_files = []
@@ -170,6 +281,11 @@ async def onboard_client(
             "primary_channels": primary_channels,
             "texts": texts,
             "generate_images": generate_images == 'true' or generate_images == 'on' if generate_images else False,
+            "generation_mode": generation_mode,
+            # Optional per-client route overrides, e.g. {"Twitter:post": {"model": "gpt-4o-mini"}}
+            "model_routes": client_model_routes,
+            # Share of generation capacity relative to other clients (default 1)
+            "scheduling_weight": scheduling_weight,
             "images": image_files,
             "videos": video_files,
             "onboarded_at": datetime.now().isoformat(),
@@ -182,38 +298,23 @@ async def onboard_client(
             await clients_collection.insert_one(client_data)
         else:
             # Fallback to in-memory if DB not connected
-            if not hasattr(app.state, 'clients_db'):
-                app.state.clients_db = []
-            app.state.clients_db.append(client_data)
+            memory_store.clients.insert_one(client_data)
+        await stats_counters.client_added()
         
-        # Generate initial content for all platforms
-        try:
-            generated_content = generate_content_for_all_platforms(client_data)
-            content_collection = get_content_collection()
-            
-            for content_item in generated_content:
-                content_item['id'] = str(uuid.uuid4())
-                content_item['created_at'] = datetime.now().isoformat()
-                
-                if content_collection is not None:
-                    await content_collection.insert_one(content_item)
-                else:
-                    # Fallback to in-memory
-                    if not hasattr(app.state, 'content_db'):
-                        app.state.content_db = []
-                    app.state.content_db.append(content_item)
-        except Exception as e:
-            print(f"Warning: Could not generate initial content: {str(e)}")
+        # Queue initial content generation for all platforms as a background job
+        job = await create_job("onboarding_generation", client_uuid, get_target_platforms(client_data))
+        run_in_background(job["job_id"], generate_onboarding_content(job["job_id"], client_data))
         
         # Convert ObjectId to string for JSON serialization (recursively handles nested structures)
         client_data_serializable = convert_objectid_to_str(client_data)
         
         return JSONResponse(
-            status_code=200,
+            status_code=202,
             content={
                 "success": True,
-                "message": "Client onboarded successfully",
+                "message": "Client onboarded successfully, content generation started",
                 "client_id": client_data["client_id"],
+                "job_id": job["job_id"],
                 "data": client_data_serializable
             }
         )
@@ -227,30 +328,75 @@ async def onboard_client(
             }
         )
 
-@app.get("/api/clients")
-async def get_clients():
-    """Get all onboarded clients"""
-    clients_collection = get_clients_collection()
+async def paginated_response(
+    items_key: str,
+    collection,
+    query: dict,
+    memory_collection: MemoryCollection,
+    sort_field: str,
+    id_field: str,
+    cursor: Optional[str],
+    limit: Optional[int],
+    include_total: bool,
+    stream: bool,
+    view: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    One keyset page of a list endpoint (or every item as NDJSON with stream=true)
     
-    if clients_collection is not None:
-        clients = await clients_collection.find({}).to_list(length=1000)
-        # Convert ObjectId to string for JSON serialization
-        for client in clients:
-            if '_id' in client:
-                client['_id'] = str(client['_id'])
-        return {
-            "success": True,
-            "count": len(clients),
-            "clients": clients
-        }
-    else:
-        # Fallback to in-memory
-        clients_db = getattr(app.state, 'clients_db', [])
-        return {
-            "success": True,
-            "count": len(clients_db),
-            "clients": clients_db
-        }
+    view=summary or fields=a,b,c are pushed down to MongoDB as a projection.
+    memory_collection serves the same query when MongoDB is not connected.
+    """
+    try:
+        projection = build_projection(items_key, view, parse_fields(fields), [sort_field, id_field])
+        if collection is not None:
+            if stream:
+                return StreamingResponse(
+                    stream_ndjson(collection, query, sort_field, id_field, projection, finish_document),
+                    media_type="application/x-ndjson"
+                )
+            page = await paginate_collection(collection, query, sort_field, id_field, cursor, limit, include_total, projection)
+        else:
+            # Fallback to in-memory
+            if stream:
+                items = memory_collection.find(query)
+                return StreamingResponse(
+                    (json.dumps(finish_document(project_document(items_key, item, projection)), default=str) + "\n" for item in items),
+                    media_type="application/x-ndjson"
+                )
+            page = memory_collection.page(query, cursor, limit, include_total)
+            page["items"] = [project_document(items_key, item, projection) for item in page["items"]]
+    except (InvalidCursor, InvalidProjection) as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
+        )
+    
+    return {
+        "success": True,
+        "count": len(page["items"]),
+        items_key: [finish_document(item) for item in page["items"]],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["has_more"],
+        "total": page["total"]
+    }
+
+@app.get("/api/clients")
+async def get_clients(
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    include_total: bool = Query(False),
+    stream: bool = Query(False),
+    view: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
+):
+    """Get onboarded clients, newest first, one page at a time (pass next_cursor for the next page)"""
+    return await paginated_response(
+        "clients", get_clients_collection(), {},
+        memory_store.clients,
+        "onboarded_at", "client_id", cursor, limit, include_total, stream, view, fields
+    )
 
 @app.get("/api/client/{client_id}")
 async def get_client(client_id: str):
@@ -265,8 +411,7 @@ async def get_client(client_id: str):
             return {"success": True, "client": client}
     else:
         # Fallback to in-memory
-        clients_db = getattr(app.state, 'clients_db', [])
-        client = next((c for c in clients_db if c["client_id"] == client_id), None)
+        client = memory_store.clients.find_one({"client_id": client_id})
         if client is not None:
             return {"success": True, "client": client}
     
@@ -275,38 +420,288 @@ async def get_client(client_id: str):
         content={"success": False, "message": "Client not found"}
     )
 
-# Content Management Endpoints
-@app.get("/api/content/pending")
-async def get_pending_content(client_id: Optional[str] = Query(None)):
-    """Get all pending content for approval"""
-    content_collection = get_content_collection()
+@app.post("/api/client/{client_id}/brand-digest")
+async def rebuild_brand_digest(client_id: str, refresh: bool = Query(False)):
+    """(Re)build a client's brand voice digest from its past examples and texts"""
+    clients_collection = get_clients_collection()
+    if clients_collection is not None:
+        client = await clients_collection.find_one({"client_id": client_id})
+    else:
+        client = memory_store.clients.find_one({"client_id": client_id})
     
-    if content_collection is not None:
-        query = {"status": "pending"}
-        if client_id and client_id != 'all':
-            query["client_id"] = client_id
-        
-        pending = await content_collection.find(query).to_list(length=1000)
-        # Convert ObjectId to string
-        for item in pending:
-            if '_id' in item:
-                item['_id'] = str(item['_id'])
+    if client is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Client not found"}
+        )
+    
+    digest = await apply_brand_digest(client, use_cache=not refresh)
+    return {
+        "success": digest is not None,
+        "message": "Brand digest updated" if digest else "No brand material to condense (or condensation failed)",
+        "data": digest
+    }
+
+@app.post("/api/client/{client_id}/content/next")
+async def generate_next_content(client_id: str, http_request: Request, request: Optional[dict] = None):
+    """
+    Create the next post for each of a client's platforms as pending content
+    
+    Drafts pre-generated while the model was idle are promoted instantly;
+    platforms without one are generated now. Body: optional "platforms".
+    """
+    clients_collection = get_clients_collection()
+    if clients_collection is not None:
+        client = await clients_collection.find_one({"client_id": client_id})
     else:
-        # Fallback to in-memory
-        content_db = getattr(app.state, 'content_db', [])
-        pending = [c for c in content_db if c.get('status') == 'pending']
-        if client_id and client_id != 'all':
-            pending = [c for c in pending if c.get('client_id') == client_id]
+        client = memory_store.clients.find_one({"client_id": client_id})
+    
+    if client is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Client not found"}
+        )
+    
+    platforms = (request or {}).get('platforms') or get_target_platforms(client)
+    # Claimed drafts are deleted once the content is saved, or handed back if this request fails
+    drafts = {draft['platform']: draft for draft in await speculative_generator.take_next_posts(client_id, platforms)}
+    
+    async def next_post(platform: str) -> dict:
+        draft = drafts.get(platform)
+        if draft is not None:
+            content_item = build_content_item(client, platform, draft['content_type'], draft['content'])
+            content_item['speculative_draft_id'] = draft['id']
+            return content_item
+        content_type = PLATFORM_CONTENT_TYPES.get(platform, 'post')
+        text = await generate_content_async(client, platform, content_type, use_cache=False, lane=LANE_INTERACTIVE)
+        return build_content_item(client, platform, content_type, text)
+    
+    try:
+        content_items = await cancel_on_disconnect(
+            http_request,
+            asyncio.gather(*(next_post(platform) for platform in platforms)),
+            operation="next_content",
+            detached=bool((request or {}).get('detached'))
+        )
+        for content_item in content_items:
+            content_item['id'] = str(uuid.uuid4())
+            content_item['created_at'] = datetime.now().isoformat()
+        content_items = await insert_content_items(get_content_collection(), content_items, memory_store.content)
+    except asyncio.CancelledError:
+        await speculative_generator.release(list(drafts.values()))
+        raise
+    except ClientDisconnected as e:
+        await speculative_generator.release(list(drafts.values()))
+        return JSONResponse(
+            status_code=499,
+            content={"success": False, "message": str(e)}
+        )
+    except Exception as e:
+        await speculative_generator.release(list(drafts.values()))
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Error generating content: {str(e)}"}
+        )
+    
+    saved_draft_ids = {content_item.get('speculative_draft_id') for content_item in content_items}
+    await speculative_generator.confirm([draft for draft in drafts.values() if draft['id'] in saved_draft_ids])
+    await speculative_generator.release([draft for draft in drafts.values() if draft['id'] not in saved_draft_ids])
     
     return {
         "success": True,
-        "count": len(pending),
-        "content": pending
+        "message": f"Created {len(content_items)} posts ({len(drafts)} from pre-generated drafts)",
+        "content": convert_objectid_to_str(content_items)
     }
 
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get status and per-platform progress of a background job"""
+    job = await get_job(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Job not found"}
+        )
+    
+    return {"success": True, "job": convert_objectid_to_str(job)}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Get generation cache hit/miss counters"""
+    return {"success": True, "cache": generation_cache.stats()}
+
+@app.get("/api/db/indexes")
+async def get_db_indexes():
+    """Get the startup index report (missing/extra indexes) and applied migrations"""
+    status = convert_objectid_to_str(await get_schema_status())
+    if get_database() is None:
+        # Running on the in-memory fallback: report its indexes instead
+        status["memory_store"] = memory_store.stats()
+    return {"success": True, **status}
+
+@app.get("/api/llm/rate-limit")
+async def get_rate_limit_status():
+    """Get current OpenAI rate limiter headroom"""
+    return {"success": True, "rate_limits": await get_rate_limit_headroom()}
+
+@app.get("/api/llm/prompt-cache")
+async def get_prompt_cache_status():
+    """Get provider-side prompt cache (cached token) statistics per template"""
+    return {"success": True, "prompt_cache": get_prompt_cache_stats()}
+
+@app.get("/api/llm/routes")
+async def get_llm_routes():
+    """Get per-platform model routes and their latency/token metrics"""
+    return {"success": True, **get_model_routes()}
+
+@app.get("/api/llm/provider")
+async def get_llm_provider_settings():
+    """Get the active LLM provider (openai or stub) and its settings"""
+    return {"success": True, "provider": get_llm_provider_info()}
+
+@app.get("/api/llm/inflight")
+async def get_llm_inflight():
+    """Get in-flight deduplication counters and calls cancelled by client disconnects"""
+    return {"success": True, **get_singleflight_stats(), "disconnects": get_disconnect_stats()}
+
+@app.get("/api/llm/scheduler")
+async def get_llm_scheduler():
+    """Get fair-share scheduler queue depth and wait times per lane"""
+    return {"success": True, **model_call_scheduler.stats()}
+
+@app.get("/api/llm/resilience")
+async def get_llm_resilience():
+    """Get circuit breaker state and hedged request statistics"""
+    return {"success": True, **get_resilience_status()}
+
+@app.get("/api/llm/usage")
+async def get_llm_usage(
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    client_id: Optional[str] = Query(None)
+):
+    """
+    Get token, cost and latency totals per client, platform and model
+    
+    start/end are ISO timestamps (inclusive); latency percentiles cover
+    upstream calls only, not cache hits.
+    """
+    return {"success": True, **await usage_ledger.summarize(start, end, client_id), "ledger": usage_ledger.stats()}
+
+@app.get("/api/llm/semantic-cache")
+async def get_semantic_cache_status():
+    """Get near-match index size, lookup latency and adapted-draft quality"""
+    return {"success": True, **semantic_cache.stats()}
+
+@app.get("/api/llm/speculation")
+async def get_llm_speculation():
+    """Get speculative pre-generation hit rate and wasted-token counters"""
+    return {"success": True, **(await speculative_generator.stats())}
+
+# Content Management Endpoints
+@app.get("/api/content/pending")
+async def get_pending_content(
+    client_id: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    include_total: bool = Query(False),
+    stream: bool = Query(False),
+    view: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
+):
+    """
+    Get pending content for approval, newest first, one page at a time
+    
+    view=summary returns a truncated "preview" instead of the body; fetch
+    GET /api/content/{content_id} for the full item.
+    """
+    query = {"status": "pending"}
+    if client_id and client_id != 'all':
+        query["client_id"] = client_id
+    
+    return await paginated_response(
+        "content", get_content_collection(), query, memory_store.content,
+        "created_at", "id", cursor, limit, include_total, stream, view, fields
+    )
+
+def batch_too_large(size: int) -> Optional[JSONResponse]:
+    if size > BATCH_MAX_ITEMS:
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "message": f"Batch has {size} items (max {BATCH_MAX_ITEMS})"}
+        )
+    return None
+
+@app.post("/api/content/batch/approve")
+async def batch_approve_content(request: BatchApproveRequest):
+    """
+    Approve many pending items in one request (status change only; use the
+    per-item approve endpoint to post with credentials). Items that fail
+    validation are auto-fixed if possible, otherwise reported as invalid.
+    """
+    rejected = batch_too_large(len(request.ids))
+    if rejected is not None:
+        return rejected
+    try:
+        result = await batch_approve(get_content_collection(), memory_store.content, request.ids, request.auto_fix)
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Error approving content: {str(e)}"}
+        )
+    return {"success": True, **result}
+
+@app.post("/api/content/batch/delete")
+async def batch_delete_content(request: BatchContentRequest):
+    """Delete many items in one request"""
+    rejected = batch_too_large(len(request.ids))
+    if rejected is not None:
+        return rejected
+    try:
+        result = await batch_delete(get_content_collection(), memory_store.content, request.ids)
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Error deleting content: {str(e)}"}
+        )
+    return {"success": True, **result}
+
+@app.post("/api/content/batch/edit")
+async def batch_edit_content(request: BatchEditRequest):
+    """Replace the text of many items in one request (each is re-validated)"""
+    rejected = batch_too_large(len(request.items))
+    if rejected is not None:
+        return rejected
+    try:
+        result = await batch_edit(get_content_collection(), memory_store.content, [item.model_dump() for item in request.items])
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Error editing content: {str(e)}"}
+        )
+    return {"success": True, **result}
+
+@app.get("/api/content/{content_id}")
+async def get_content_item(content_id: str):
+    """Get a full content item (list endpoints with view=summary only return a preview)"""
+    content, _ = await find_content_and_client(content_id)
+    if content is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Content not found"}
+        )
+    if '_id' in content:
+        content['_id'] = str(content['_id'])
+    return {"success": True, "data": content}
+
 @app.post("/api/content/{content_id}/approve")
-async def approve_content_endpoint(content_id: str, request: ApproveContentRequest = ApproveContentRequest()):
-    """Approve content and post to platform with credentials"""
+async def approve_content_endpoint(content_id: str, http_request: Request, request: ApproveContentRequest = ApproveContentRequest()):
+    """
+    Approve content and post to platform with credentials
+    
+    Browser posting is cancelled (and the browser closed) if the client
+    disconnects, unless "detached" is set.
+    """
     try:
         content_collection = get_content_collection()
         clients_collection = get_clients_collection()
@@ -318,11 +713,31 @@ async def approve_content_endpoint(content_id: str, request: ApproveContentReque
         
         if content_collection is not None:
             content = await content_collection.find_one({"id": content_id})
-            if content is None:
-                return JSONResponse(
-                    status_code=404,
-                    content={"success": False, "message": f"Content not found with id: {content_id}"}
-                )
+        else:
+            # Fallback to in-memory
+            content = memory_store.content.find_one({"id": content_id})
+        if content is None:
+            return JSONResponse(
+                status_code=404,
+                content={"success": False, "message": f"Content not found with id: {content_id}"}
+            )
+        previous_status = content.get('status')
+        
+        # The text may have been edited since it was last validated; never post a failing item
+        text, fixes, validation = check_for_approval(content.get('platform'), content.get('content', ''), request.auto_fix)
+        if not validation['valid']:
+            return JSONResponse(
+                status_code=422,
+                content={
+                    "success": False,
+                    "message": f"Content fails platform validation: {violation_summary(validation)}",
+                    "validation": validation
+                }
+            )
+        fix_fields = {"validation": validation}
+        if fixes:
+            fix_fields.update({"content": text, "auto_fixes": fixes, "edited_at": datetime.now().isoformat()})
+        content.update(fix_fields)
         
         platform = platform or content.get('platform', '').lower()
         
@@ -330,8 +745,7 @@ async def approve_content_endpoint(content_id: str, request: ApproveContentReque
         if clients_collection is not None:
             client = await clients_collection.find_one({"client_id": content.get('client_id')})
         else:
-            clients_db = getattr(app.state, 'clients_db', [])
-            client = next((c for c in clients_db if c["client_id"] == content.get('client_id')), None)
+            client = memory_store.clients.find_one({"client_id": content.get('client_id')})
         
         # Post to platform if credentials provided
         posting_result = None
@@ -345,11 +759,16 @@ async def approve_content_endpoint(content_id: str, request: ApproveContentReque
             
             # Post to platform using Puppeteer (or SMTP for email)
             # Always await since post_to_platform_puppeteer is async
-            posting_result = await post_to_platform_puppeteer(
-                platform=platform,
-                content=content.get('content', ''),
-                credentials=credentials,
-                image_url=image_url
+            posting_result = await cancel_on_disconnect(
+                http_request,
+                post_to_platform_puppeteer(
+                    platform=platform,
+                    content=content.get('content', ''),
+                    credentials=credentials,
+                    image_url=image_url
+                ),
+                operation="approve",
+                detached=request.detached
             )
             
             # Store credentials for future use (optional - can be removed for security)
@@ -378,6 +797,7 @@ async def approve_content_endpoint(content_id: str, request: ApproveContentReque
         
         # Update status
         update_data = {
+            **fix_fields,
             "status": "approved",
             "approved_at": datetime.now().isoformat()
         }
@@ -385,27 +805,17 @@ async def approve_content_endpoint(content_id: str, request: ApproveContentReque
         if posting_result:
             update_data["posting_result"] = posting_result
         
+        if content_collection is not None:
             await content_collection.update_one(
                 {"id": content_id},
                 {"$set": update_data}
             )
             content.update(update_data)
-            
-            if '_id' in content:
-                content['_id'] = str(content['_id'])
         else:
-            # Fallback to in-memory
-            content_db = getattr(app.state, 'content_db', [])
-            clients_db = getattr(app.state, 'clients_db', [])
-            content = next((c for c in content_db if c.get('id') == content_id), None)
-            if content is None:
-                return JSONResponse(
-                    status_code=404,
-                    content={"success": False, "message": "Content not found"}
-                )
-            
-            content['status'] = 'approved'
-            content['approved_at'] = datetime.now().isoformat()
+            memory_store.content.update_one({"id": content_id}, update_data)
+        if '_id' in content:
+            content['_id'] = str(content['_id'])
+        await stats_counters.content_transition(previous_status, "approved")
         
         return {
             "success": True,
@@ -413,6 +823,11 @@ async def approve_content_endpoint(content_id: str, request: ApproveContentReque
             "data": content,
             "posting_result": posting_result if 'posting_result' in locals() else None
         }
+    except ClientDisconnected as e:
+        return JSONResponse(
+            status_code=499,
+            content={"success": False, "message": str(e)}
+        )
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
@@ -440,21 +855,24 @@ async def edit_content_endpoint(content_id: str, request: dict):
                 content={"success": False, "message": "Content not found"}
             )
         
+        new_content = request.get('content', content['content'])
+        validation = validate_content(content.get('platform'), new_content)
         await content_collection.update_one(
             {"id": content_id},
             {"$set": {
-                "content": request.get('content', content['content']),
-                "edited_at": datetime.now().isoformat()
+                "content": new_content,
+                "edited_at": datetime.now().isoformat(),
+                "validation": validation
             }}
         )
-        content['content'] = request.get('content', content['content'])
+        content['content'] = new_content
         content['edited_at'] = datetime.now().isoformat()
+        content['validation'] = validation
         if '_id' in content:
             content['_id'] = str(content['_id'])
     else:
         # Fallback to in-memory
-        content_db = getattr(app.state, 'content_db', [])
-        content = next((c for c in content_db if c.get('id') == content_id), None)
+        content = memory_store.content.find_one({"id": content_id})
         if content is None:
             return JSONResponse(
                 status_code=404,
@@ -463,6 +881,7 @@ async def edit_content_endpoint(content_id: str, request: dict):
         
         content['content'] = request.get('content', content['content'])
         content['edited_at'] = datetime.now().isoformat()
+        content['validation'] = validate_content(content.get('platform'), content['content'])
     
     return {
         "success": True,
@@ -470,59 +889,205 @@ async def edit_content_endpoint(content_id: str, request: dict):
         "data": content
     }
 
+@app.post("/api/content/validate")
+async def validate_content_endpoint(request: dict):
+    """Check text against a platform's constraints and preview the local auto-fix"""
+    platform = request.get('platform')
+    text = request.get('content') or ''
+    fixed, fixes = auto_fix_content(platform, text)
+    return {
+        "success": True,
+        "validation": validate_content(platform, text),
+        "auto_fix": {"content": fixed, "fixes": fixes}
+    }
+
+@app.post("/api/content/{content_id}/autofix")
+async def autofix_content_endpoint(content_id: str):
+    """Apply local constraint fixes (trimming, hashtag pruning, title extraction) without a model call"""
+    content, _ = await find_content_and_client(content_id)
+    if content is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Content not found"}
+        )
+    
+    fixed, fixes = auto_fix_content(content.get('platform'), content.get('content', ''))
+    if fixes:
+        validation = validate_content(content.get('platform'), fixed)
+        content_collection = get_content_collection()
+        if content_collection is not None:
+            await content_collection.update_one(
+                {"id": content_id},
+                {"$set": {
+                    "content": fixed,
+                    "edited_at": datetime.now().isoformat(),
+                    "auto_fixes": fixes,
+                    "validation": validation
+                }}
+            )
+        content['content'] = fixed
+        content['edited_at'] = datetime.now().isoformat()
+        content['auto_fixes'] = fixes
+        content['validation'] = validation
+    
+    if '_id' in content:
+        content['_id'] = str(content['_id'])
+    return {
+        "success": True,
+        "message": f"Applied fixes: {', '.join(fixes)}" if fixes else "No fixable violations",
+        "data": content
+    }
+
 @app.delete("/api/content/{content_id}")
 async def delete_content_endpoint(content_id: str):
     """Delete content"""
     content_collection = get_content_collection()
     
     if content_collection is not None:
-        result = await content_collection.delete_one({"id": content_id})
-        if result.deleted_count == 0:
+        deleted = await content_collection.find_one_and_delete({"id": content_id}, projection={"status": 1})
+        if deleted is None:
             return JSONResponse(
                 status_code=404,
                 content={"success": False, "message": "Content not found"}
             )
     else:
         # Fallback to in-memory
-        if hasattr(app.state, 'content_db'):
-            app.state.content_db = [c for c in app.state.content_db if c.get('id') != content_id]
+        deleted = memory_store.content.delete_one({"id": content_id})
     
+    if deleted is not None:
+        await stats_counters.content_transition(deleted.get('status'), None)
     return {
         "success": True,
         "message": "Content deleted"
     }
 
-@app.post("/api/content/{content_id}/regenerate")
-async def regenerate_content_endpoint(content_id: str, request: dict):
-    """Regenerate content"""
+async def find_content_and_client(content_id: str):
+    """Look up a content item and the client it belongs to"""
     content_collection = get_content_collection()
     clients_collection = get_clients_collection()
     
     if content_collection is not None:
         content = await content_collection.find_one({"id": content_id})
-        if content is None:
-            return JSONResponse(
-                status_code=404,
-                content={"success": False, "message": "Content not found"}
-            )
-        
-        if clients_collection is not None:
-            client = await clients_collection.find_one({"client_id": content.get('client_id')})
-        else:
-            clients_db = getattr(app.state, 'clients_db', [])
-            client = next((c for c in clients_db if c["client_id"] == content.get('client_id')), None)
     else:
         # Fallback to in-memory
-        content_db = getattr(app.state, 'content_db', [])
-        clients_db = getattr(app.state, 'clients_db', [])
-        content = next((c for c in content_db if c.get('id') == content_id), None)
-        if content is None:
-            return JSONResponse(
-                status_code=404,
-                content={"success": False, "message": "Content not found"}
-            )
-        
-        client = next((c for c in clients_db if c["client_id"] == content.get('client_id')), None)
+        content = memory_store.content.find_one({"id": content_id})
+    
+    if content is None:
+        return None, None
+    
+    if clients_collection is not None:
+        client = await clients_collection.find_one({"client_id": content.get('client_id')})
+    else:
+        client = memory_store.clients.find_one({"client_id": content.get('client_id')})
+    
+    return content, client
+
+async def save_regenerated_content(content_id: str, content: dict, new_content: str) -> dict:
+    """Persist a regenerated version of a content item"""
+    content_collection = get_content_collection()
+    regeneration_count = content.get('regeneration_count', 0) + 1
+    validation = validate_content(content.get('platform'), new_content)
+    
+    if content_collection is not None:
+        await content_collection.update_one(
+            {"id": content_id},
+            {
+                "$set": {
+                    "content": new_content,
+                    "regenerated_at": datetime.now().isoformat(),
+                    "regeneration_count": regeneration_count,
+                    "validation": validation
+                },
+                # Any earlier alternatives were generated from the previous version
+                "$unset": {"candidates": ""}
+            }
+        )
+    
+    content['content'] = new_content
+    content['regenerated_at'] = datetime.now().isoformat()
+    content['regeneration_count'] = regeneration_count
+    content['validation'] = validation
+    content.pop('candidates', None)
+    
+    if '_id' in content:
+        content['_id'] = str(content['_id'])
+    return content
+
+async def save_content_candidates(content_id: str, content: dict, alternatives: List[str]) -> dict:
+    """Store regenerated alternatives as candidates on a content item"""
+    content_collection = get_content_collection()
+    candidates = [
+        {
+            "id": str(uuid.uuid4()),
+            "content": alternative,
+            "created_at": datetime.now().isoformat(),
+            "validation": validate_content(content.get('platform'), alternative)
+        }
+        for alternative in alternatives
+    ]
+    
+    if content_collection is not None:
+        await content_collection.update_one(
+            {"id": content_id},
+            {"$set": {"candidates": candidates}}
+        )
+    
+    content['candidates'] = candidates
+    if '_id' in content:
+        content['_id'] = str(content['_id'])
+    return content
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def parse_variants(value) -> int:
+    """
+    Number of regeneration alternatives requested, clamped to MAX_REGENERATION_VARIANTS
+
+    Raises:
+        ValueError: If the value is not a whole number of at least 1
+    """
+    if value is None or value == '':
+        return 1
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError("variants must be a whole number")
+    try:
+        variants = float(value)
+    except ValueError:
+        raise ValueError("variants must be a whole number")
+    if not variants.is_integer() or variants < 1:
+        raise ValueError("variants must be a whole number of at least 1")
+    return min(int(variants), MAX_REGENERATION_VARIANTS)
+
+def is_plain_regenerate(request: dict, content: dict) -> bool:
+    """True if a regenerate request has no focus or overrides, so a speculative draft can answer it"""
+    return (
+        not request.get('improvement_focus')
+        and parse_variants(request.get('variants')) == 1
+        and request.get('platform', content.get('platform')) == content.get('platform')
+        and request.get('content_type', content.get('content_type')) == content.get('content_type')
+    )
+
+@app.post("/api/content/{content_id}/regenerate")
+async def regenerate_content_endpoint(content_id: str, request: dict, http_request: Request):
+    """
+    Regenerate content
+    
+    With "variants" > 1 in the body, that many alternatives are generated in
+    one API call and stored as candidates on the content item; pick one with
+    POST /api/content/{content_id}/candidates/{candidate_id}/select.
+    The model call is cancelled if the client disconnects, unless "detached"
+    is set in the body.
+    """
+    content, client = await find_content_and_client(content_id)
+    if content is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Content not found"}
+        )
     
     if client is None:
         return JSONResponse(
@@ -531,52 +1096,231 @@ async def regenerate_content_endpoint(content_id: str, request: dict):
         )
     
     try:
-        # Get existing content for regeneration
-        existing_content = content.get('content', '')
-        platform = request.get('platform', content.get('platform'))
-        content_type = request.get('content_type', content.get('content_type'))
-        improvement_focus = request.get('improvement_focus', None)
-        
-        # Regenerate content with improved prompt
-        new_content = regenerate_content(
-            client_data=client,
-            platform=platform,
-            content_type=content_type,
-            existing_content=existing_content,
-            improvement_focus=improvement_focus
+        variants = parse_variants(request.get('variants'))
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
         )
+    
+    try:
+        if variants > 1:
+            alternatives = await cancel_on_disconnect(
+                http_request,
+                regenerate_content_variants_async(
+                    client_data=client,
+                    platform=request.get('platform', content.get('platform')),
+                    content_type=request.get('content_type', content.get('content_type')),
+                    existing_content=content.get('content', ''),
+                    improvement_focus=request.get('improvement_focus', None),
+                    variants=variants
+                ),
+                operation="regenerate",
+                detached=bool(request.get('detached'))
+            )
+            content = await save_content_candidates(content_id, content, alternatives)
+            return {
+                "success": True,
+                "message": f"Generated {len(alternatives)} alternatives",
+                "data": content
+            }
         
-        # Update content with regenerated version
-        regeneration_count = content.get('regeneration_count', 0) + 1
+        # A plain regenerate can be served by an alternative pre-generated while idle
+        draft = None
+        if is_plain_regenerate(request, content):
+            draft = await speculative_generator.take_alternative(content_id, content.get('content', ''))
+        claimed = [draft] if draft is not None else []
         
-        if content_collection is not None:
-            await content_collection.update_one(
-                {"id": content_id},
-                {"$set": {
-                    "content": new_content,
-                    "regenerated_at": datetime.now().isoformat(),
-                    "regeneration_count": regeneration_count
-                }}
+        if draft is not None:
+            new_content = draft['content']
+        else:
+            # Regenerate content with improved prompt
+            new_content = await cancel_on_disconnect(
+                http_request,
+                regenerate_content_async(
+                    client_data=client,
+                    platform=request.get('platform', content.get('platform')),
+                    content_type=request.get('content_type', content.get('content_type')),
+                    existing_content=content.get('content', ''),
+                    improvement_focus=request.get('improvement_focus', None)
+                ),
+                operation="regenerate",
+                detached=bool(request.get('detached'))
             )
         
-        content['content'] = new_content
-        content['regenerated_at'] = datetime.now().isoformat()
-        content['regeneration_count'] = regeneration_count
-        
-        if '_id' in content:
-            content['_id'] = str(content['_id'])
+        # Update content with regenerated version
+        try:
+            content = await save_regenerated_content(content_id, content, new_content)
+        except Exception:
+            await speculative_generator.release(claimed)
+            raise
+        await speculative_generator.confirm(claimed)
         
         return {
             "success": True,
             "message": "Content regenerated successfully",
             "data": content
         }
+    except ClientDisconnected as e:
+        return JSONResponse(
+            status_code=499,
+            content={"success": False, "message": str(e)}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"success": False, "message": f"Error regenerating content: {str(e)}"}
         )
 
+@app.post("/api/content/{content_id}/candidates/{candidate_id}/select")
+async def select_content_candidate_endpoint(content_id: str, candidate_id: str):
+    """Replace content with one of its regenerated candidates (no model call)"""
+    content, _ = await find_content_and_client(content_id)
+    if content is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Content not found"}
+        )
+    
+    candidate = next((c for c in content.get('candidates') or [] if c.get('id') == candidate_id), None)
+    if candidate is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Candidate not found"}
+        )
+    
+    content = await save_regenerated_content(content_id, content, candidate['content'])
+    return {
+        "success": True,
+        "message": "Candidate selected",
+        "data": content
+    }
+
+@app.post("/api/content/{content_id}/regenerate/stream")
+async def regenerate_content_stream_endpoint(content_id: str, request: dict):
+    """
+    Regenerate content, streaming tokens as server-sent events
+    
+    Emits "token" events with {"delta": ...} as text arrives, then a "done"
+    event with the saved content item (or an "error" event).
+    """
+    content, client = await find_content_and_client(content_id)
+    if content is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Content not found"}
+        )
+    
+    if client is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Client not found"}
+        )
+    
+    try:
+        parse_variants(request.get('variants'))
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": str(e)}
+        )
+    
+    async def event_stream():
+        parts = []
+        # A claimed draft is handed back unless the content is saved
+        claimed = []
+        try:
+            draft = None
+            if is_plain_regenerate(request, content):
+                draft = await speculative_generator.take_alternative(content_id, content.get('content', ''))
+            
+            if draft is not None:
+                claimed.append(draft)
+                # Already generated while idle; send it as a single token
+                parts.append(draft['content'])
+                yield sse_event("token", {"delta": draft['content']})
+            else:
+                async for delta in stream_regenerate_content(
+                    client_data=client,
+                    platform=request.get('platform', content.get('platform')),
+                    content_type=request.get('content_type', content.get('content_type')),
+                    existing_content=content.get('content', ''),
+                    improvement_focus=request.get('improvement_focus', None)
+                ):
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+            
+            saved = await save_regenerated_content(content_id, content, ''.join(parts).strip())
+            await speculative_generator.confirm(claimed)
+            claimed = []
+            yield sse_event("done", {"success": True, "data": convert_objectid_to_str(saved)})
+        except Exception as e:
+            yield sse_event("error", {"success": False, "message": f"Error regenerating content: {str(e)}"})
+        finally:
+            await speculative_generator.release(claimed)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/api/content/generate/stream")
+async def generate_content_stream_endpoint(request: dict):
+    """
+    Generate a new content item for a client, streaming tokens as server-sent events
+    
+    Body: client_id, platform, optional content_type and topic. The finished
+    item is saved as pending content and returned in the "done" event.
+    """
+    client_id = request.get('client_id')
+    platform = request.get('platform')
+    if not client_id or not platform:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "message": "client_id and platform are required"}
+        )
+    
+    clients_collection = get_clients_collection()
+    if clients_collection is not None:
+        client = await clients_collection.find_one({"client_id": client_id})
+    else:
+        client = memory_store.clients.find_one({"client_id": client_id})
+    
+    if client is None:
+        return JSONResponse(
+            status_code=404,
+            content={"success": False, "message": "Client not found"}
+        )
+    
+    content_type = request.get('content_type') or PLATFORM_CONTENT_TYPES.get(platform, 'post')
+    
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in stream_generate_content(
+                client_data=client,
+                platform=platform,
+                content_type=content_type,
+                topic=request.get('topic')
+            ):
+                parts.append(delta)
+                yield sse_event("token", {"delta": delta})
+            
+            content_item = build_content_item(client, platform, content_type, ''.join(parts).strip())
+            content_item['id'] = str(uuid.uuid4())
+            content_item['created_at'] = datetime.now().isoformat()
+            
+            content_collection = get_content_collection()
+            if content_collection is not None:
+                await content_collection.insert_one(content_item)
+            else:
+                # Fallback to in-memory
+                memory_store.content.insert_one(content_item)
+            await stats_counters.content_transition(None, content_item.get('status'))
+            
+            yield sse_event("done", {"success": True, "data": convert_objectid_to_str(content_item)})
+        except Exception as e:
+            yield sse_event("error", {"success": False, "message": f"Error generating content: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # Analytics Endpoints
 @app.get("/api/analytics")
 async def get_analytics(time_range: str = Query("7d")):
@@ -610,59 +1354,57 @@ async def get_analytics(time_range: str = Query("7d")):
     }
 
 @app.get("/api/dashboard/stats")
-async def get_dashboard_stats():
-    """Get dashboard statistics"""
-    clients_collection = get_clients_collection()
-    content_collection = get_content_collection()
-    campaigns_collection = get_campaigns_collection()
+async def get_dashboard_stats(refresh: bool = Query(False)):
+    """
+    Get dashboard statistics
     
-    if clients_collection is not None and content_collection is not None and campaigns_collection is not None:
-        total_clients = await clients_collection.count_documents({})
-        pending_content = await content_collection.count_documents({"status": "pending"})
-        approved_content = await content_collection.count_documents({"status": "approved"})
-        active_campaigns = await campaigns_collection.count_documents({"status": "active"})
-    else:
-        # Fallback to in-memory
-        clients_db = getattr(app.state, 'clients_db', [])
-        content_db = getattr(app.state, 'content_db', [])
-        campaigns_db = getattr(app.state, 'campaigns_db', [])
-        total_clients = len(clients_db)
-        pending_content = len([c for c in content_db if c.get('status') == 'pending'])
-        approved_content = len([c for c in content_db if c.get('status') == 'approved'])
-        active_campaigns = len([c for c in campaigns_db if c.get('status') == 'active'])
+    Reads the incrementally maintained counters document; refresh=true
+    recounts the collections first.
+    """
+    try:
+        if refresh:
+            await stats_counters.reconcile()
+        counters = await stats_counters.get()
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Error loading dashboard stats: {str(e)}"}
+        )
     
+    content_counts = counters.get("content") or {}
+    campaign_counts = counters.get("campaigns") or {}
     return {
         "success": True,
-        "totalClients": total_clients,
-        "pendingContent": pending_content,
-        "approvedContent": approved_content,
-        "activeCampaigns": active_campaigns
+        "totalClients": counters.get("clients", 0),
+        "pendingContent": content_counts.get("pending", 0),
+        "approvedContent": content_counts.get("approved", 0),
+        "activeCampaigns": campaign_counts.get("active", 0),
+        "content": content_counts,
+        "campaigns": campaign_counts,
+        "reconciled_at": counters.get("reconciled_at")
     }
 
+@app.get("/api/dashboard/counters")
+async def get_dashboard_counters_status():
+    """Get counter increment/reconcile activity and the last corrected drift"""
+    return {"success": True, **stats_counters.stats()}
+
 # Campaign Endpoints
 @app.get("/api/campaigns")
-async def get_campaigns():
-    """Get all campaigns"""
-    campaigns_collection = get_campaigns_collection()
-    
-    if campaigns_collection is not None:
-        campaigns = await campaigns_collection.find({}).to_list(length=1000)
-        for campaign in campaigns:
-            if '_id' in campaign:
-                campaign['_id'] = str(campaign['_id'])
-        return {
-            "success": True,
-            "count": len(campaigns),
-            "campaigns": campaigns
-        }
-    else:
-        # Fallback to in-memory
-        campaigns_db = getattr(app.state, 'campaigns_db', [])
-        return {
-            "success": True,
-            "count": len(campaigns_db),
-            "campaigns": campaigns_db
-        }
+async def get_campaigns(
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None),
+    include_total: bool = Query(False),
+    stream: bool = Query(False),
+    view: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
+):
+    """Get campaigns, newest first, one page at a time"""
+    return await paginated_response(
+        "campaigns", get_campaigns_collection(), {},
+        memory_store.campaigns,
+        "created_at", "id", cursor, limit, include_total, stream, view, fields
+    )
 
 @app.post("/api/campaigns")
 async def create_campaign_endpoint(campaign: dict):
@@ -678,8 +1420,7 @@ async def create_campaign_endpoint(campaign: dict):
         if client is not None:
             client_name = client.get("company_name", "Unknown")
     else:
-        clients_db = getattr(app.state, 'clients_db', [])
-        client = next((c for c in clients_db if c["client_id"] == campaign.get("client_id")), None)
+        client = memory_store.clients.find_one({"client_id": campaign.get("client_id")})
         if client is not None:
             client_name = client.get("company_name", "Unknown")
     
@@ -705,9 +1446,8 @@ async def create_campaign_endpoint(campaign: dict):
         await campaigns_collection.insert_one(campaign_data)
     else:
         # Fallback to in-memory
-        if not hasattr(app.state, 'campaigns_db'):
-            app.state.campaigns_db = []
-        app.state.campaigns_db.append(campaign_data)
+        memory_store.campaigns.insert_one(campaign_data)
+    await stats_counters.campaign_transition(None, campaign_data["status"])
     
     # Convert ObjectId to string for JSON serialization
     campaign_data_serializable = convert_objectid_to_str(campaign_data)
@@ -734,30 +1474,31 @@ async def update_campaign_endpoint(campaign_id: str, campaign: dict):
         update_data = {k: v for k, v in campaign.items() if k != 'id'}
         update_data['updated_at'] = datetime.now().isoformat()
         
-        await campaigns_collection.update_one(
+        previous = await campaigns_collection.find_one_and_update(
             {"id": campaign_id},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection={"status": 1}
         )
+        previous_status = (previous or campaign_item).get('status')
         
         campaign_item.update(update_data)
         if '_id' in campaign_item:
             campaign_item['_id'] = str(campaign_item['_id'])
     else:
         # Fallback to in-memory
-        campaigns_db = getattr(app.state, 'campaigns_db', [])
-        campaign_item = next((c for c in campaigns_db if c.get('id') == campaign_id), None)
+        campaign_item = memory_store.campaigns.find_one({"id": campaign_id})
         if campaign_item is None:
             return JSONResponse(
                 status_code=404,
                 content={"success": False, "message": "Campaign not found"}
             )
         
-        for key, value in campaign.items():
-            if key != 'id':
-                campaign_item[key] = value
-        
-        campaign_item['updated_at'] = datetime.now().isoformat()
+        previous_status = campaign_item.get('status')
+        update_data = {k: v for k, v in campaign.items() if k != 'id'}
+        update_data['updated_at'] = datetime.now().isoformat()
+        memory_store.campaigns.update_one({"id": campaign_id}, update_data)
     
+    await stats_counters.campaign_transition(previous_status, campaign_item.get('status'))
     return {
         "success": True,
         "message": "Campaign updated",
@@ -770,17 +1511,18 @@ async def delete_campaign_endpoint(campaign_id: str):
     campaigns_collection = get_campaigns_collection()
     
     if campaigns_collection is not None:
-        result = await campaigns_collection.delete_one({"id": campaign_id})
-        if result.deleted_count == 0:
+        deleted = await campaigns_collection.find_one_and_delete({"id": campaign_id}, projection={"status": 1})
+        if deleted is None:
             return JSONResponse(
                 status_code=404,
                 content={"success": False, "message": "Campaign not found"}
             )
     else:
         # Fallback to in-memory
-        if hasattr(app.state, 'campaigns_db'):
-            app.state.campaigns_db = [c for c in app.state.campaigns_db if c.get('id') != campaign_id]
+        deleted = memory_store.campaigns.delete_one({"id": campaign_id})
     
+    if deleted is not None:
+        await stats_counters.campaign_transition(deleted.get('status'), None)
     return {
         "success": True,
         "message": "Campaign deleted"
@@ -0,0 +1,275 @@
+"""
+Indexed in-memory store for the no-MongoDB fallback
+Each collection keeps documents in a dict keyed by primary key, plus
+secondary indexes: for every indexed field value, a sorted list of
+(sort key, primary key). Lookups by primary key are O(1). Filtered,
+newest-first queries and keyset pages start from the smallest matching
+index bucket and bisect to the cursor, so they are O(log n + page) instead
+of a scan of every document.
+
+Documents are returned live, and callers may change non-indexed fields in
+place. Indexed fields (primary key, sort field, secondary index fields) must
+be changed through update_one/update_many so the indexes stay correct.
+"""
+import sys
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from pagination import decode_cursor, encode_cursor, page_size
+
+
+class DuplicateKey(Exception):
+    """Raised when inserting a document whose primary key already exists"""
+
+
+def _compact(value):
+    # Indexed values (statuses, ids, platforms) repeat across many documents
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class MemoryCollection:
+    """One collection: primary-key dict, sort order and secondary indexes"""
+
+    __slots__ = ("name", "primary_key", "sort_field", "index_fields", "_docs", "_order", "_indexes")
+
+    def __init__(self, name: str, primary_key: str, sort_field: str, index_fields: Iterable[str] = ()):
+        self.name = name
+        self.primary_key = primary_key
+        self.sort_field = sort_field
+        self.index_fields = tuple(index_fields)
+        self._docs: Dict[str, Dict] = {}
+        # Every document's (sort key, primary key), ascending
+        self._order: List[Tuple] = []
+        # field -> value -> sorted [(sort key, primary key)]
+        self._indexes: Dict[str, Dict[object, List[Tuple]]] = {field: {} for field in self.index_fields}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # Index maintenance
+
+    def _key(self, document: Dict) -> Tuple:
+        return (document.get(self.sort_field) or '', document.get(self.primary_key) or '')
+
+    def _index(self, document: Dict):
+        key = self._key(document)
+        insort(self._order, key)
+        for field in self.index_fields:
+            insort(self._indexes[field].setdefault(document.get(field), []), key)
+
+    def _unindex(self, document: Dict):
+        key = self._key(document)
+        self._remove(self._order, key)
+        for field in self.index_fields:
+            bucket = self._indexes[field].get(document.get(field))
+            if bucket is not None:
+                self._remove(bucket, key)
+                if not bucket:
+                    del self._indexes[field][document.get(field)]
+
+    @staticmethod
+    def _remove(keys: List[Tuple], key: Tuple):
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+
+    # Query planning
+
+    @staticmethod
+    def _values(condition) -> List:
+        """Values an equality or {"$in": [...]} condition accepts"""
+        if isinstance(condition, dict):
+            if set(condition) != {"$in"}:
+                raise ValueError(f"Unsupported query operator(s): {', '.join(condition)}")
+            return list(condition["$in"])
+        return [condition]
+
+    def _matches(self, document: Dict, query: Dict) -> bool:
+        return all(document.get(field) in self._values(condition) for field, condition in query.items())
+
+    def _candidate_keys(self, query: Dict) -> List[Tuple]:
+        """Smallest sorted list of (sort key, primary key) that covers the query"""
+        if self.primary_key in query:
+            documents = (self._docs.get(pk) for pk in self._values(query[self.primary_key]))
+            return sorted(self._key(document) for document in documents if document is not None)
+        best = self._order
+        for field in self.index_fields:
+            if field not in query:
+                continue
+            buckets = [self._indexes[field].get(_compact(value), []) for value in self._values(query[field])]
+            keys = buckets[0] if len(buckets) == 1 else sorted(key for bucket in buckets for key in bucket)
+            if len(keys) < len(best):
+                best = keys
+        return best
+
+    def _iter_newest(self, query: Dict, before: Optional[Tuple] = None, since=None) -> Iterator[Dict]:
+        keys = self._candidate_keys(query or {})
+        end = bisect_left(keys, before) if before is not None else len(keys)
+        for position in range(end - 1, -1, -1):
+            if since is not None and keys[position][0] < since:
+                break
+            document = self._docs.get(keys[position][1])
+            if document is not None and self._matches(document, query or {}):
+                yield document
+
+    # Query surface (mirrors the MongoDB calls used by the API)
+
+    def insert_one(self, document: Dict) -> Dict:
+        pk = document.get(self.primary_key)
+        if pk in self._docs:
+            raise DuplicateKey(f"Duplicate {self.primary_key} in {self.name}: {pk}")
+        for field in self.index_fields + (self.primary_key,):
+            if field in document:
+                document[field] = _compact(document[field])
+        self._docs[pk] = document
+        self._index(document)
+        return document
+
+    def insert_many(self, documents: Iterable[Dict]) -> Tuple[List[Dict], List]:
+        """
+        Insert each document; duplicates are skipped (like an unordered insert_many)
+
+        Returns:
+            Tuple of (documents inserted, primary keys skipped as duplicates)
+        """
+        inserted, skipped = [], []
+        for document in documents:
+            try:
+                inserted.append(self.insert_one(document))
+            except DuplicateKey:
+                skipped.append(document.get(self.primary_key))
+        return inserted, skipped
+
+    def find_one(self, query: Dict) -> Optional[Dict]:
+        if set(query) == {self.primary_key} and not isinstance(query[self.primary_key], dict):
+            return self._docs.get(query[self.primary_key])
+        return next(self._iter_newest(query), None)
+
+    def find(
+        self,
+        query: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        since=None,
+        where: Optional[Callable[[Dict], bool]] = None
+    ) -> List[Dict]:
+        """
+        Matching documents, newest first
+
+        Args:
+            query: Equality / $in conditions
+            limit: Maximum number of documents
+            since: Only documents whose sort field is >= this value (stops the scan early)
+            where: Extra filter for conditions the query cannot express
+        """
+        results = []
+        for document in self._iter_newest(query or {}, since=since):
+            if where is not None and not where(document):
+                continue
+            results.append(document)
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def count_documents(self, query: Optional[Dict] = None) -> int:
+        if not query:
+            return len(self._docs)
+        if len(query) == 1:
+            field, condition = next(iter(query.items()))
+            if field in self.index_fields:
+                return sum(len(self._indexes[field].get(_compact(value), [])) for value in self._values(condition))
+        return sum(1 for _ in self._iter_newest(query))
+
+    def count_by(self, field: str) -> Dict:
+        """Document count per value of an indexed field"""
+        return {value: len(keys) for value, keys in self._indexes[field].items()}
+
+    def update_one(self, query: Dict, fields: Dict) -> Optional[Dict]:
+        """Apply a $set of fields to the first match; returns the updated document"""
+        document = self.find_one(query)
+        if document is None:
+            return None
+        self._set(document, fields)
+        return document
+
+    def update_many(self, query: Dict, fields: Dict) -> List[Dict]:
+        documents = self.find(query)
+        for document in documents:
+            self._set(document, fields)
+        return documents
+
+    def _set(self, document: Dict, fields: Dict):
+        if self.primary_key in fields and fields[self.primary_key] != document.get(self.primary_key):
+            raise ValueError(f"Cannot change {self.primary_key} of a document in {self.name}")
+        reindex = any(field == self.sort_field or field in self.index_fields for field in fields)
+        if reindex:
+            self._unindex(document)
+        document.update({field: _compact(value) if field in self.index_fields else value for field, value in fields.items()})
+        if reindex:
+            self._index(document)
+
+    def delete_one(self, query: Dict) -> Optional[Dict]:
+        """Delete the first match; returns the deleted document"""
+        document = self.find_one(query)
+        if document is not None:
+            self._unindex(document)
+            del self._docs[document[self.primary_key]]
+        return document
+
+    def delete_many(self, query: Dict) -> List[Dict]:
+        documents = self.find(query)
+        for document in documents:
+            self._unindex(document)
+            del self._docs[document[self.primary_key]]
+        return documents
+
+    def page(self, query: Dict, cursor: Optional[str] = None, limit: Optional[int] = None, include_total: bool = False) -> Dict:
+        """One keyset page, newest first (same result shape as pagination.paginate_collection)"""
+        size = page_size(limit)
+        before = None
+        if cursor:
+            sort_value, id_value = decode_cursor(cursor)
+            before = (sort_value or '', id_value or '')
+        items = []
+        for document in self._iter_newest(query, before):
+            items.append(document)
+            if len(items) > size:
+                break
+        has_more = len(items) > size
+        items = items[:size]
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(items[-1].get(self.sort_field), items[-1].get(self.primary_key)) if has_more else None,
+            "has_more": has_more,
+            "total": self.count_documents(query) if include_total else None
+        }
+
+    def stats(self) -> Dict:
+        """Document count and distinct values per secondary index"""
+        return {
+            "documents": len(self._docs),
+            "indexes": {field: len(values) for field, values in self._indexes.items()}
+        }
+
+
+class MemoryStore:
+    """The collections used when MongoDB is not connected"""
+
+    def __init__(self):
+        self.clients = MemoryCollection("clients", "client_id", "onboarded_at", ("status",))
+        self.content = MemoryCollection("content", "id", "created_at", ("status", "client_id"))
+        self.campaigns = MemoryCollection("campaigns", "id", "created_at", ("status", "client_id"))
+
+    def status_counts(self) -> Dict:
+        """Counts in the shape stats_counters keeps"""
+        return {
+            "clients": len(self.clients),
+            "content": {status or "unknown": n for status, n in self.content.count_by("status").items()},
+            "campaigns": {status or "unknown": n for status, n in self.campaigns.count_by("status").items()}
+        }
+
+    def stats(self) -> Dict:
+        """Per-collection stats (reported by /api/db/indexes when running without MongoDB)"""
+        return {name: getattr(self, name).stats() for name in ("clients", "content", "campaigns")}
+
+
+# Shared fallback store used by main.py and speculation.py
+memory_store = MemoryStore()
@@ -0,0 +1,219 @@
+"""
+Per-platform model routing and output budgets
+Each (platform, content_type) pair resolves to a model, max_tokens and
+temperature. Output budgets come from the platform length limits in
+PLATFORM_GUIDELINES; models and overrides come from the environment, the
+MODEL_ROUTES JSON table or the client's own model_routes.
+"""
+import os
+import re
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+from prompt_templates import PLATFORM_GUIDELINES
+
+DEFAULT_MODEL = os.getenv('DEFAULT_MODEL', 'gpt-4')
+# Model for short-form social posts; point this at a faster, cheaper model to move them
+SHORT_FORM_MODEL = os.getenv('SHORT_FORM_MODEL', DEFAULT_MODEL)
+ROUTE_MAX_TOKENS_CAP = int(os.getenv('ROUTE_MAX_TOKENS_CAP', '2000'))
+ROUTE_MIN_MAX_TOKENS = 128
+# Optional JSON overrides, e.g. {"Twitter:post": {"model": "gpt-4o-mini", "temperature": 0.9}}
+MODEL_ROUTES_OVERRIDES = json.loads(os.getenv('MODEL_ROUTES', '{}') or '{}')
+
+SHORT_FORM_PLATFORMS = {'Twitter', 'LinkedIn', 'Instagram', 'Facebook'}
+
+DEFAULT_TEMPERATURES = {
+    'generate': 0.7,
+    'regenerate': 0.8  # Slightly higher for more creative variations
+}
+
+_LENGTH_RE = re.compile(r'(\d+)\s*(characters|words)')
+
+
+def max_tokens_for_length(max_length: str) -> Optional[int]:
+    """
+    Convert a guideline such as "280 characters" or "2000 words" into an output token budget
+
+    Uses ~4 characters or ~0.75 words per token with 25% headroom, clamped to
+    [ROUTE_MIN_MAX_TOKENS, ROUTE_MAX_TOKENS_CAP].
+    """
+    match = _LENGTH_RE.search(max_length or '')
+    if not match:
+        return None
+    amount, unit = int(match.group(1)), match.group(2)
+    tokens = amount / 4 if unit == 'characters' else amount / 0.75
+    return max(ROUTE_MIN_MAX_TOKENS, min(ROUTE_MAX_TOKENS_CAP, int(tokens * 1.25) + 32))
+
+
+def route_key(platform: Optional[str], content_type: Optional[str]) -> str:
+    """Key identifying a route in tables and metrics"""
+    return f"{platform or '*'}:{content_type or '*'}"
+
+
+def parse_model_routes(raw: Optional[str]) -> Optional[Dict]:
+    """
+    Parse and check a client's model_routes JSON
+
+    Expects an object of route key ("Platform:content_type", with "*"
+    wildcards) to an object of model, max_tokens and/or temperature.
+
+    Raises:
+        ValueError: If the JSON is malformed or has a different shape
+    """
+    if not raw:
+        return None
+    try:
+        routes = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"model_routes is not valid JSON: {str(e)}")
+    if not isinstance(routes, dict):
+        raise ValueError("model_routes must be an object of route key to overrides")
+    for key, override in routes.items():
+        if ':' not in key:
+            raise ValueError(f"model_routes key '{key}' must look like 'Platform:content_type'")
+        if not isinstance(override, dict):
+            raise ValueError(f"model_routes['{key}'] must be an object")
+        unknown = set(override) - {'model', 'max_tokens', 'temperature'}
+        if unknown:
+            raise ValueError(f"model_routes['{key}'] has unknown field(s): {', '.join(sorted(unknown))}")
+        if 'model' in override and not (isinstance(override['model'], str) and override['model']):
+            raise ValueError(f"model_routes['{key}'].model must be a model name")
+        if 'max_tokens' in override and (isinstance(override['max_tokens'], bool) or not isinstance(override['max_tokens'], int) or override['max_tokens'] < 1):
+            raise ValueError(f"model_routes['{key}'].max_tokens must be a positive integer")
+        if 'temperature' in override and (isinstance(override['temperature'], bool) or not isinstance(override['temperature'], (int, float)) or not 0 <= override['temperature'] <= 2):
+            raise ValueError(f"model_routes['{key}'].temperature must be between 0 and 2")
+    return routes
+
+
+def resolve_route(
+    platform: Optional[str],
+    content_type: Optional[str],
+    client_data: Optional[Dict] = None,
+    purpose: str = 'generate'
+) -> Dict:
+    """
+    Pick model, max_tokens and temperature for a generation request
+
+    Args:
+        platform: Target platform
+        content_type: Type of content
+        client_data: Client document; its optional model_routes dict overrides the global table
+        purpose: "generate" or "regenerate"
+
+    Returns:
+        Dict with key, model, max_tokens and temperature
+    """
+    guidelines = PLATFORM_GUIDELINES.get(platform, {})
+    route = {
+        "key": route_key(platform, content_type),
+        "model": SHORT_FORM_MODEL if platform in SHORT_FORM_PLATFORMS and content_type == 'post' else DEFAULT_MODEL,
+        "max_tokens": max_tokens_for_length(guidelines.get('max_length')) or 1000,
+        "temperature": DEFAULT_TEMPERATURES.get(purpose, 0.7)
+    }
+    if purpose == 'regenerate':
+        # Regeneration prompts carry the previous draft; leave room for a fuller rewrite
+        route["max_tokens"] = min(ROUTE_MAX_TOKENS_CAP, int(route["max_tokens"] * 1.5))
+
+    client_routes = (client_data or {}).get('model_routes') or {}
+    for overrides in (MODEL_ROUTES_OVERRIDES, client_routes):
+        for key in ('*:*', route_key(platform, '*'), route["key"]):
+            override = overrides.get(key)
+            if isinstance(override, dict):
+                route.update({k: v for k, v in override.items() if k in ('model', 'max_tokens', 'temperature')})
+    return route
+
+
+class RouteMetrics:
+    """Per-route latency and token counters"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict] = {}
+
+    def record(self, key: str, model: str, latency: float, usage=None, error: bool = False):
+        with self._lock:
+            stats = self._routes.setdefault(key, {
+                "calls": 0,
+                "errors": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "models": {},
+                "latencies": deque(maxlen=self.window)
+            })
+            stats["calls"] += 1
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+            if error:
+                stats["errors"] += 1
+                return
+            stats["latencies"].append(latency)
+            if usage is not None:
+                stats["prompt_tokens"] += getattr(usage, 'prompt_tokens', 0) or 0
+                stats["completion_tokens"] += getattr(usage, 'completion_tokens', 0) or 0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            routes = {}
+            for key, stats in self._routes.items():
+                latencies = sorted(stats["latencies"])
+                successes = stats["calls"] - stats["errors"]
+
+                def percentile(p):
+                    return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+                routes[key] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "models": dict(stats["models"]),
+                    "latency_p50": percentile(0.5),
+                    "latency_p95": percentile(0.95),
+                    "avg_prompt_tokens": round(stats["prompt_tokens"] / successes, 1) if successes else 0,
+                    "avg_completion_tokens": round(stats["completion_tokens"] / successes, 1) if successes else 0
+                }
+            return routes
+
+
+route_metrics = RouteMetrics()
+
+
+@contextmanager
+def timed_route(key: Optional[str], model: str):
+    """
+    Record latency (and usage, if the caller sets record["usage"]) for a routed call
+    
+    Yields:
+        Dict the caller can put the response usage into
+    """
+    record = {"usage": None}
+    started = time.monotonic()
+    try:
+        yield record
+    except BaseException:
+        if key:
+            route_metrics.record(key, model, time.monotonic() - started, error=True)
+        raise
+    if key:
+        route_metrics.record(key, model, time.monotonic() - started, record["usage"])
+
+
+def get_routing_table(platform_content_types: Dict[str, str]) -> Dict:
+    """
+    Resolved routes for each platform's default content type, plus per-route metrics
+
+    Args:
+        platform_content_types: Mapping of platform to its default content type
+    """
+    table = {}
+    for platform, content_type in platform_content_types.items():
+        route = resolve_route(platform, content_type)
+        table[route["key"]] = {k: v for k, v in route.items() if k != 'key'}
+    return {
+        "default_model": DEFAULT_MODEL,
+        "short_form_model": SHORT_FORM_MODEL,
+        "overrides": MODEL_ROUTES_OVERRIDES,
+        "routes": table,
+        "metrics": route_metrics.snapshot()
+    }
@@ -0,0 +1,117 @@
+"""
+Keyset pagination for list endpoints
+Pages are ordered newest first on a (timestamp, id) key and continue from an
+opaque cursor that encodes the last key served. Each page is a range scan on
+an index instead of skip/limit, and MongoDB cursors are consumed one batch at
+a time, so memory stays bounded by the page size.
+"""
+import os
+import json
+import base64
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', '50'))
+PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', '200'))
+
+
+class InvalidCursor(Exception):
+    """Raised for a cursor that was not issued by this API"""
+
+
+def encode_cursor(sort_value, id_value) -> str:
+    """Opaque cursor for the position after (sort_value, id_value)"""
+    raw = json.dumps([sort_value, id_value], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, id_value = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort_value, id_value
+    except Exception:
+        raise InvalidCursor("Invalid pagination cursor")
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to 1..PAGE_SIZE_MAX"""
+    return max(1, min(limit or PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX))
+
+
+def keyset_query(query: Dict, sort_field: str, id_field: str, cursor: Optional[str]) -> Dict:
+    """Add the "after this cursor" condition (descending order) to a MongoDB query"""
+    if not cursor:
+        return query
+    sort_value, id_value = decode_cursor(cursor)
+    after = {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, id_field: {"$lt": id_value}}
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+async def paginate_collection(
+    collection,
+    query: Dict,
+    sort_field: str,
+    id_field: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    include_total: bool = False,
+    projection: Optional[Dict] = None
+) -> Dict:
+    """
+    Fetch one page of a MongoDB collection, newest first
+
+    Args:
+        collection: Motor collection
+        query: Filter for the listed documents
+        sort_field: Timestamp field to order by (e.g. "created_at")
+        id_field: Unique tie-breaker field (e.g. "id")
+        cursor: next_cursor from the previous page
+        limit: Page size (clamped to PAGE_SIZE_MAX)
+        include_total: Also count all matching documents (an extra query)
+        projection: Optional MongoDB projection
+
+    Returns:
+        Dict with "items", "next_cursor", "has_more" and "total" (None unless requested)
+    """
+    size = page_size(limit)
+    mongo_cursor = (
+        collection.find(keyset_query(query, sort_field, id_field, cursor), projection)
+        .sort([(sort_field, -1), (id_field, -1)])
+        .limit(size + 1)
+        .batch_size(size + 1)
+    )
+    items = []
+    async for document in mongo_cursor:
+        if '_id' in document:
+            document['_id'] = str(document['_id'])
+        items.append(document)
+
+    has_more = len(items) > size
+    items = items[:size]
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1].get(sort_field), items[-1].get(id_field)) if has_more else None,
+        "has_more": has_more,
+        "total": await collection.count_documents(query) if include_total else None
+    }
+
+
+async def stream_ndjson(
+    collection,
+    query: Dict,
+    sort_field: str,
+    id_field: str,
+    projection: Optional[Dict] = None,
+    transform: Optional[Callable[[Dict], Dict]] = None
+) -> AsyncIterator[str]:
+    """Yield every matching document as a JSON line, reading the cursor in batches"""
+    mongo_cursor = collection.find(query, projection).sort([(sort_field, -1), (id_field, -1)]).batch_size(PAGE_SIZE_MAX)
+    async for document in mongo_cursor:
+        if '_id' in document:
+            document['_id'] = str(document['_id'])
+        if transform is not None:
+            document = transform(document)
+        yield json.dumps(document, default=str) + "\n"
@@ -0,0 +1,157 @@
+"""
+Field projection and summary views for list endpoints
+List endpoints accept either fields=a,b,c or view=summary. Both are pushed
+down to MongoDB as a projection, so large fields (post bodies, scripts,
+posting results, image lists, brand material) never leave the database.
+The summary view returns a short preview of the body plus the small fields
+the approval UI renders; full documents come from the per-item endpoints.
+"""
+import os
+import re
+from typing import Dict, List, Optional
+
+PREVIEW_CHARS = int(os.getenv('LIST_PREVIEW_CHARS', '280'))
+
+VIEW_FULL = 'full'
+VIEW_SUMMARY = 'summary'
+
+_FIELD_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+# Plain fields returned by the summary view of each list
+SUMMARY_FIELDS = {
+    "content": [
+        "id", "platform", "content_type", "client_id", "client_name", "status", "created_at",
+        "regenerated_at", "regeneration_count", "generated_image_url", "uploaded_images", "validation"
+    ],
+    "clients": [
+        "client_id", "company_name", "industry", "brand_tone", "target_audience", "primary_channels",
+        "status", "onboarded_at"
+    ],
+    "campaigns": [
+        "id", "name", "client_id", "client_name", "platform", "status", "budget", "start_date", "end_date", "created_at"
+    ],
+}
+
+# Fields derived in the projection (MongoDB 4.4+ aggregation expressions in find)
+SUMMARY_COMPUTED = {
+    "content": {
+        # One extra character tells finish_document whether the body was cut
+        "preview": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, PREVIEW_CHARS + 1]},
+        "content_length": {"$strLenCP": {"$ifNull": ["$content", ""]}},
+        "candidate_count": {"$size": {"$ifNull": ["$candidates", []]}},
+    },
+}
+
+# The same derived fields computed in Python (in-memory fallback)
+COMPUTED_IN_MEMORY = {
+    "content": {
+        "preview": lambda document: (document.get('content') or '')[:PREVIEW_CHARS + 1],
+        "content_length": lambda document: len(document.get('content') or ''),
+        "candidate_count": lambda document: len(document.get('candidates') or []),
+    },
+}
+
+
+class InvalidProjection(Exception):
+    """Raised for an unknown view, malformed field name or overlapping field paths"""
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split and validate a comma-separated fields parameter"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    invalid = [name for name in names if not _FIELD_RE.match(name)]
+    if invalid:
+        raise InvalidProjection(f"Invalid field name(s): {', '.join(invalid)}")
+    return names
+
+
+def _check_overlaps(paths: List[str]):
+    """MongoDB rejects a projection with both a path and one of its sub-paths (path collision)"""
+    ordered = sorted(paths)
+    overlapping = [
+        f"{parent} and {child}"
+        for i, parent in enumerate(ordered)
+        for child in ordered[i + 1:]
+        if child.startswith(parent + '.')
+    ]
+    if overlapping:
+        raise InvalidProjection(f"Overlapping field paths: {', '.join(overlapping)} (request the parent field only)")
+
+
+def build_projection(list_name: str, view: Optional[str], fields: Optional[List[str]], required: List[str]) -> Optional[Dict]:
+    """
+    MongoDB projection for a list request
+
+    Args:
+        list_name: "content", "clients" or "campaigns"
+        view: "full" (default) or "summary"
+        fields: Explicit fields (overrides view)
+        required: Fields always included (e.g. the pagination sort key)
+
+    Returns:
+        Projection dict, or None for whole documents
+    """
+    if fields:
+        paths = list(dict.fromkeys(fields + required))
+        _check_overlaps(paths)
+        # Derived fields (e.g. preview) are computed by MongoDB, as in the summary view
+        computed = SUMMARY_COMPUTED.get(list_name, {})
+        return {"_id": 0, **{name: computed.get(name, 1) for name in paths}}
+    if not view or view == VIEW_FULL:
+        return None
+    if view != VIEW_SUMMARY:
+        raise InvalidProjection(f"Unknown view '{view}' (use 'full' or 'summary')")
+    projection = {"_id": 0, **{name: 1 for name in dict.fromkeys(SUMMARY_FIELDS[list_name] + required)}}
+    projection.update(SUMMARY_COMPUTED.get(list_name, {}))
+    return projection
+
+
+def _get_path(document: Dict, path: str):
+    value = document
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None, False
+        value = value[part]
+    return value, True
+
+
+def _set_path(document: Dict, path: str, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def project_document(list_name: str, document: Dict, projection: Optional[Dict]) -> Dict:
+    """Apply a projection from build_projection in Python (in-memory fallback)"""
+    if projection is None:
+        return document
+    projected = {}
+    for path, spec in projection.items():
+        if spec == 0:
+            continue
+        if spec == 1:
+            value, found = _get_path(document, path)
+            if found:
+                _set_path(projected, path, value)
+        elif isinstance(spec, dict):
+            projected[path] = COMPUTED_IN_MEMORY[list_name][path](document)
+    return projected
+
+
+def finish_document(document: Dict) -> Dict:
+    """Cut a projected preview at a word boundary and flag whether it was truncated"""
+    preview = document.get('preview')
+    if preview is None:
+        return document
+    truncated = len(preview) > PREVIEW_CHARS
+    if truncated:
+        preview = preview[:PREVIEW_CHARS]
+        if ' ' in preview:
+            preview = preview[:preview.rindex(' ')]
+        preview = preview.rstrip(' ,;:-') + '…'
+    document['preview'] = preview
+    document['preview_truncated'] = truncated
+    return document
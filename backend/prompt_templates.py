@@ -0,0 +1,386 @@
+"""
+Versioned prompt template registry
+Every chat prompt is rendered as a shared system prompt followed by the
+client's brand context, with the request-specific task last. All prompts for
+a client therefore share a long identical prefix, which lets provider-side
+prompt caching apply across platforms, regenerations and request types.
+"""
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+from token_counter import count_tokens, truncate_to_tokens
+
+# Bump when any template text changes (also invalidates the generation cache)
+PROMPT_TEMPLATE_VERSION = 3
+
+# Tokens of brand voice material (digest or past examples) in every prompt
+BRAND_MATERIAL_TOKEN_BUDGET = int(os.getenv('BRAND_MATERIAL_TOKEN_BUDGET', '400'))
+# Upper bound on the input tokens of any rendered prompt
+PROMPT_INPUT_TOKEN_BUDGET = int(os.getenv('PROMPT_INPUT_TOKEN_BUDGET', '6000'))
+
+# Client fields holding raw brand material, condensed into brand_digest at onboarding
+BRAND_MATERIAL_FIELDS = ('past_examples', 'texts')
+
+SYSTEM_PROMPT = (
+    "You are an expert marketing content writer specializing in creating engaging, brand-aligned "
+    "content for various platforms, and in regenerating and improving existing content while "
+    "maintaining brand consistency and increasing engagement."
+)
+
+# Platform-specific instructions for initial generation
+PLATFORM_PROMPTS = {
+    'LinkedIn': 'Create a professional LinkedIn post',
+    'Twitter': 'Create an engaging Twitter post (280 characters max)',
+    'Instagram': 'Create an Instagram post with engaging copy',
+    'Facebook': 'Create a Facebook post that encourages engagement',
+    'Reddit': 'Create a Reddit post that follows community guidelines and encourages discussion',
+    'Email': 'Create an email newsletter content',
+    'Website': 'Create a blog post or website content',
+    'YouTube': 'Create a video script for YouTube'
+}
+
+CONTENT_TYPE_PROMPTS = {
+    'post': 'social media post',
+    'blog': 'blog post (500-800 words)',
+    'newsletter': 'email newsletter content',
+    'ad_copy': 'advertising copy',
+    'video_script': 'video script with scene descriptions'
+}
+
+# Platform-specific guidelines
+PLATFORM_GUIDELINES = {
+    'LinkedIn': {
+        'max_length': '1300 characters',
+        'style': 'professional, thought-provoking, industry insights',
+        'format': 'paragraphs with clear structure'
+    },
+    'Twitter': {
+        'max_length': '280 characters',
+        'style': 'concise, engaging, hashtag-friendly',
+        'format': 'short sentences, can include hashtags'
+    },
+    'Instagram': {
+        'max_length': '2200 characters',
+        'style': 'visual, engaging, authentic, emoji-friendly',
+        'format': 'short paragraphs, can include emojis and line breaks'
+    },
+    'Facebook': {
+        'max_length': '5000 characters',
+        'style': 'conversational, community-focused, engaging',
+        'format': 'paragraphs with questions to encourage engagement'
+    },
+    'Reddit': {
+        'max_length': '40000 characters',
+        'style': 'informative, authentic, discussion-provoking, follows Reddit etiquette',
+        'format': 'well-structured post with engaging body text, clear formatting, and questions to spark conversation'
+    },
+    'Email': {
+        'max_length': '2000 characters',
+        'style': 'clear, actionable, value-driven',
+        'format': 'structured with clear sections and CTA'
+    },
+    'Website': {
+        'max_length': '2000 words',
+        'style': 'informative, SEO-friendly, comprehensive',
+        'format': 'structured with headings and subheadings'
+    },
+    'YouTube': {
+        'max_length': '5000 words',
+        'style': 'conversational, engaging, storytelling',
+        'format': 'script format with scene descriptions and dialogue'
+    }
+}
+
+DEFAULT_GUIDELINES = {
+    'max_length': 'appropriate length',
+    'style': 'engaging and professional',
+    'format': 'well-structured'
+}
+
+# Platform-specific image style guidance
+PLATFORM_STYLES = {
+    'LinkedIn': 'professional, corporate, business-focused',
+    'Twitter': 'vibrant, engaging, social media optimized',
+    'Instagram': 'aesthetic, visually appealing, modern design',
+    'Facebook': 'friendly, community-oriented, engaging',
+    'Reddit': 'authentic, community-focused, discussion-worthy',
+    'Email': 'clean, professional, email-friendly format',
+    'Website': 'professional, brand-aligned, web-optimized',
+    'YouTube': 'eye-catching thumbnail style, video-friendly'
+}
+
+
+def render_brand_material(client_data: Dict) -> str:
+    """All of the client's raw brand material (past examples and pasted texts)"""
+    return "\n\n".join(str(client_data[field]).strip() for field in BRAND_MATERIAL_FIELDS if client_data.get(field))
+
+
+def render_brand_context(client_data: Dict, material_budget: int = BRAND_MATERIAL_TOKEN_BUDGET) -> str:
+    """
+    Render the client's brand context block
+
+    The output depends only on the client's brand fields, so it is identical
+    for every prompt sent on behalf of that client. Brand voice comes from the
+    condensed brand_digest when the client has one, otherwise from the raw
+    past examples, cut to material_budget tokens either way.
+    """
+    brand_tone = client_data.get('brand_tone') or 'Professional'
+    industry = client_data.get('industry') or 'General'
+    target_audience = client_data.get('target_audience') or 'General audience'
+    marketing_goals = client_data.get('marketing_goals') or 'Brand awareness'
+    content_preferences = client_data.get('content_preferences') or 'Educational'
+    if client_data.get('brand_digest'):
+        brand_voice_line = f"\n- Brand Voice: {truncate_to_tokens(client_data['brand_digest'], material_budget)}"
+    elif client_data.get('past_examples'):
+        brand_voice_line = f"\n- Past Examples: {truncate_to_tokens(client_data['past_examples'], material_budget)}"
+    else:
+        brand_voice_line = ""
+
+    return f"""CLIENT BRAND CONTEXT:
+- Company: {client_data.get('company_name') or 'Unknown'}
+- Industry: {industry}
+- Brand Tone: {brand_tone}
+- Target Audience: {target_audience}
+- Marketing Goals: {marketing_goals}
+- Content Preferences: {content_preferences}{brand_voice_line}
+
+BRAND REQUIREMENTS:
+- Match the brand tone: {brand_tone}
+- Appeal to target audience: {target_audience}
+- Align with marketing goals: {marketing_goals}
+- Follow content preferences: {content_preferences}
+- Be engaging and professional
+- Include a clear call-to-action if appropriate"""
+
+
+class PromptTemplate:
+    """A named, versioned task template rendered after the shared brand prefix"""
+
+    def __init__(self, name: str, version: int, render_task: Callable[..., str], input_budget: Optional[int] = PROMPT_INPUT_TOKEN_BUDGET):
+        self.name = name
+        self.version = version
+        self.render_task = render_task
+        self.input_budget = input_budget
+
+    def render(self, client_data: Dict, **variables) -> List[Dict]:
+        """
+        Render chat messages: stable system + brand prefix first, task last
+
+        If the prompt would exceed the template's input budget, the brand
+        material is cut further to make room for the task.
+        """
+        task = self.render_task(**variables)
+        system = f"{SYSTEM_PROMPT}\n\n{render_brand_context(client_data)}"
+        overflow = count_tokens(system) + count_tokens(task) - self.input_budget if self.input_budget else 0
+        if overflow > 0:
+            _count_budget_trim(self.name)
+            system = f"{SYSTEM_PROMPT}\n\n{render_brand_context(client_data, max(0, BRAND_MATERIAL_TOKEN_BUDGET - overflow))}"
+        return [
+            {
+                "role": "system",
+                "content": system
+            },
+            {
+                "role": "user",
+                "content": task
+            }
+        ]
+
+
+TEMPLATES: Dict[str, PromptTemplate] = {}
+
+
+def register_template(name: str, version: int = PROMPT_TEMPLATE_VERSION, input_budget: Optional[int] = PROMPT_INPUT_TOKEN_BUDGET):
+    """Decorator registering a task renderer as a prompt template"""
+    def decorator(render_task: Callable[..., str]):
+        TEMPLATES[name] = PromptTemplate(name, version, render_task, input_budget)
+        return render_task
+    return decorator
+
+
+def get_template(name: str) -> PromptTemplate:
+    """Look up a registered template"""
+    if name not in TEMPLATES:
+        raise Exception(f"Unknown prompt template: {name}")
+    return TEMPLATES[name]
+
+
+def render_messages(name: str, client_data: Dict, **variables) -> List[Dict]:
+    """Render chat messages for a registered template"""
+    return get_template(name).render(client_data, **variables)
+
+
+@register_template("content")
+def _content_task(platform: str, content_type: str, topic: Optional[str] = None) -> str:
+    base_prompt = PLATFORM_PROMPTS.get(platform, 'Create marketing content')
+    type_prompt = CONTENT_TYPE_PROMPTS.get(content_type, 'content')
+    topic_line = f"Topic: {topic}\n" if topic else ""
+    return f"""{base_prompt} as a {type_prompt}, following the brand context above.
+{topic_line}
+Generate the content now:"""
+
+
+@register_template("structured")
+def _structured_task(platform_types: Dict[str, str]) -> str:
+    platform_lines = "\n".join(
+        f"- {platform}: {PLATFORM_PROMPTS.get(platform, 'Create marketing content')} as a {CONTENT_TYPE_PROMPTS.get(content_type, 'content')}"
+        for platform, content_type in platform_types.items()
+    )
+    example_keys = ", ".join(f'"{platform}": {{"content": "..."}}' for platform in platform_types)
+    return f"""Create content for each of the following platforms, following the brand context above and each platform's format and length conventions:
+{platform_lines}
+
+Respond with only a JSON object of the form {{"platforms": {{{example_keys}}}}}"""
+
+
+@register_template("regenerate")
+def _regenerate_task(
+    platform: str,
+    content_type: str,
+    existing_content: str,
+    improvement_focus: Optional[str] = None
+) -> str:
+    guidelines = PLATFORM_GUIDELINES.get(platform, DEFAULT_GUIDELINES)
+
+    if improvement_focus:
+        improvement_instruction = f"IMPORTANT: Focus on improving: {improvement_focus}"
+    else:
+        improvement_instruction = "IMPORTANT: Improve the content while maintaining brand consistency - make it more engaging, compelling, and aligned with the brand voice."
+
+    return f"""Your task is to REGENERATE and IMPROVE the content below for {platform}.
+
+PLATFORM REQUIREMENTS:
+- Platform: {platform}
+- Content Type: {content_type}
+- Maximum Length: {guidelines['max_length']}
+- Style: {guidelines['style']}
+- Format: {guidelines['format']}
+
+REGENERATION GUIDELINES:
+1. Maintain the core message and intent of the original content
+2. Keep the brand tone and audience from the brand context
+3. Improve engagement, clarity, and impact
+4. Make it more compelling while staying authentic to the brand
+5. Ensure it fits the {platform} platform format and best practices
+6. Include a strong call-to-action if appropriate for the platform
+7. Optimize for the target audience's interests and pain points
+
+{improvement_instruction}
+
+CURRENT CONTENT TO REGENERATE:
+---
+{existing_content}
+---
+
+Generate the REGENERATED and IMPROVED content now. Make it better than the original while maintaining brand consistency:"""
+
+
+@register_template("adapt")
+def _adapt_task(platform: str, content_type: str, draft: str, source_company: Optional[str] = None) -> str:
+    source_line = f" for {source_company}" if source_company else ""
+    return f"""Below is a {CONTENT_TYPE_PROMPTS.get(content_type, 'content')} for {platform} written{source_line}, a brand with a very similar profile.
+Adapt it for the client in the brand context above: replace the company name and any company-specific details, adjust the wording to the brand tone, and keep the structure, length and format.
+
+DRAFT TO ADAPT:
+---
+{draft}
+---
+
+Write only the adapted content:"""
+
+
+# The material is the whole point of this prompt; services.py caps it with BRAND_DIGEST_INPUT_MAX_TOKENS
+@register_template("brand_digest", input_budget=None)
+def _brand_digest_task(material: str, max_words: int) -> str:
+    return f"""Condense the client's past content and brand material below into a brand voice digest of at most {max_words} words.
+Describe the voice, recurring themes, vocabulary, formatting habits and calls-to-action, and quote two or three short signature phrases.
+Do not summarize individual posts.
+
+BRAND MATERIAL:
+---
+{material}
+---
+
+Write the digest now:"""
+
+
+def render_image_prompt(client_data: Dict, platform: str) -> str:
+    """Render the DALL-E prompt for a platform image"""
+    company_name = client_data.get('company_name') or 'Company'
+    industry = client_data.get('industry') or 'Business'
+    brand_tone = client_data.get('brand_tone') or 'Professional'
+    target_audience = client_data.get('target_audience') or 'General audience'
+    marketing_goals = client_data.get('marketing_goals') or 'Brand awareness'
+    style_guide = PLATFORM_STYLES.get(platform, 'professional and engaging')
+
+    return f"""Create a high-quality marketing image for {company_name}, a {industry} company.
+
+Brand Details:
+- Brand Tone: {brand_tone}
+- Target Audience: {target_audience}
+- Marketing Goal: {marketing_goals}
+- Platform: {platform}
+
+Image Requirements:
+- Style: {style_guide}
+- Professional quality, suitable for {platform} marketing
+- Visually appealing and brand-appropriate
+- No text overlays (text will be added separately)
+- High resolution, modern design aesthetic
+
+Create an image that represents {company_name}'s brand identity and appeals to {target_audience}."""
+
+
+# Provider-side prompt cache accounting, per template
+_usage_lock = threading.Lock()
+_prompt_usage: Dict[str, Dict] = {}
+_budget_trims: Dict[str, int] = {}
+
+
+def _count_budget_trim(template_name: str) -> None:
+    with _usage_lock:
+        _budget_trims[template_name] = _budget_trims.get(template_name, 0) + 1
+
+
+def record_prompt_usage(template_name: Optional[str], usage) -> None:
+    """
+    Record prompt and cached-prompt token counts from a completion's usage
+
+    Args:
+        template_name: Template the prompt was rendered from
+        usage: The response's usage object (may be None)
+    """
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', None) or 0
+    prompt_tokens = getattr(usage, 'prompt_tokens', None) or 0
+
+    with _usage_lock:
+        stats = _prompt_usage.setdefault(template_name or 'untemplated', {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0
+        })
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+
+
+def get_prompt_cache_stats() -> Dict:
+    """Cached-token totals and hit ratio per template"""
+    with _usage_lock:
+        templates = {name: dict(stats) for name, stats in _prompt_usage.items()}
+        budget_trims = dict(_budget_trims)
+    for stats in templates.values():
+        stats["cached_ratio"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0
+    return {
+        "version": PROMPT_TEMPLATE_VERSION,
+        "templates": templates,
+        "input_budget": {
+            "prompt_input_token_budget": PROMPT_INPUT_TOKEN_BUDGET,
+            "brand_material_token_budget": BRAND_MATERIAL_TOKEN_BUDGET,
+            # Prompts whose brand material was cut further to fit the budget (breaks prefix caching for that call)
+            "budget_trims": budget_trims
+        }
+    }
@@ -12,6 +12,18 @@ from email.mime.image import MIMEImage
 import requests
 import time
 
+
+async def _close_browser(browser):
+    """Close a browser left behind by a cancelled posting flow"""
+    if browser is None:
+        return
+    try:
+        await browser.close()
+        print("Browser closed - posting was cancelled")
+    except Exception:
+        pass
+
+
 async def post_to_linkedin_puppeteer(content: str, credentials: Dict, image_url: Optional[str] = None) -> Dict:
     """
     Post content to LinkedIn using Puppeteer
@@ -311,7 +323,7 @@ async def post_to_linkedin_puppeteer(content: str, credentials: Dict, image_url:
                         if focused:
                             input_focused = True
                             print("✅ Input field found using Strategy 5!")
-                    except:
+                    except Exception:
                         pass
                 
                 if not input_focused:
@@ -759,7 +771,7 @@ async def post_to_linkedin_puppeteer(content: str, credentials: Dict, image_url:
                         await asyncio.sleep(2)
                         await browser.close()
                         print("✅ Browser closed - post completed successfully")
-                    except:
+                    except Exception:
                         pass
                     
                     return {
@@ -786,6 +798,10 @@ async def post_to_linkedin_puppeteer(content: str, credentials: Dict, image_url:
             # Otherwise keep it open for manual verification
             pass  # Browser closing is handled in the main flow
             
+    except asyncio.CancelledError:
+        # The request was abandoned; don't leave a browser session running
+        await _close_browser(browser)
+        raise
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
@@ -809,6 +825,7 @@ async def post_to_reddit_puppeteer(content: str, credentials: Dict, image_url: O
     Returns:
         Response dict with success status
     """
+    browser = None
     try:
         username = credentials.get('email')  # Can be username or email
         password = credentials.get('password')
@@ -1215,6 +1232,10 @@ async def post_to_reddit_puppeteer(content: str, credentials: Dict, image_url: O
             print("Browser will remain open. Close it manually when done.")
             # await browser.close()  # Commented out so user can see what happened
             
+    except asyncio.CancelledError:
+        # The request was abandoned; don't leave a browser session running
+        await _close_browser(browser)
+        raise
     except Exception as e:
         return {
             'success': False,
@@ -0,0 +1,225 @@
+"""
+Token-bucket rate limiting for OpenAI calls
+Each limiter tracks two buckets, requests per minute and tokens per minute.
+Callers wait in line until both have room instead of failing with 429s.
+State lives in memory, or in a locked JSON file so every uvicorn worker on
+the host shares the same budget.
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '500'))
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '40000'))
+OPENAI_IMAGES_PER_MINUTE = int(os.getenv('OPENAI_IMAGES_PER_MINUTE', '5'))
+# "memory" (per process) or "file" (shared by all workers on the host)
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_STATE_DIR = os.getenv('RATE_LIMIT_STATE_DIR', '.ratelimit')
+
+
+def estimate_tokens(request_params: Dict) -> int:
+    """
+    Estimate the tokens a chat completion will consume
+
+    Uses roughly 4 characters per token for the prompt plus the full output
+    budget (max_tokens for each of n choices).
+    """
+    prompt_chars = sum(len(str(message.get('content') or '')) for message in request_params.get('messages', []))
+    completion_tokens = request_params.get('max_tokens') or 1000
+    return prompt_chars // 4 + completion_tokens * (request_params.get('n') or 1)
+
+
+def _refill(state: Dict, rpm: int, tpm: int, now: float) -> Dict:
+    """Add back capacity for the time elapsed since the last update"""
+    elapsed = max(0.0, now - state['updated_at'])
+    state['requests'] = min(rpm, state['requests'] + elapsed * rpm / 60.0)
+    state['tokens'] = min(tpm, state['tokens'] + elapsed * tpm / 60.0)
+    state['updated_at'] = now
+    return state
+
+
+def _try_consume(state: Dict, rpm: int, tpm: int, tokens: int, now: float) -> float:
+    """Consume one request and the given tokens, or return seconds to wait"""
+    _refill(state, rpm, tpm, now)
+    if state['requests'] >= 1 and state['tokens'] >= tokens:
+        state['requests'] -= 1
+        state['tokens'] -= tokens
+        return 0.0
+    request_wait = max(0.0, (1 - state['requests']) * 60.0 / rpm)
+    token_wait = max(0.0, (tokens - state['tokens']) * 60.0 / tpm) if tpm else 0.0
+    return max(request_wait, token_wait, 0.01)
+
+
+class MemoryBucketBackend:
+    """Bucket state held in this process"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._state = None
+
+    async def aupdate(self, rpm: int, tpm: int, fn) -> float:
+        # Only touched from the event loop, and fn never awaits, so no lock is needed
+        if self._state is None:
+            self._state = {'requests': float(rpm), 'tokens': float(tpm), 'updated_at': time.time()}
+        return fn(self._state)
+
+
+class FileBucketBackend:
+    """Bucket state in a JSON file guarded by an OS file lock"""
+
+    def __init__(self, name: str, state_dir: str = RATE_LIMIT_STATE_DIR):
+        self.name = name
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, f"{name}.json")
+        self._thread_lock = threading.Lock()
+
+    def _update(self, rpm: int, tpm: int, fn) -> float:
+        # Runs in a worker thread (see aupdate)
+        with self._thread_lock, open(self.path, 'a+') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else None
+                except json.JSONDecodeError:
+                    state = None
+                if state is None:
+                    state = {'requests': float(rpm), 'tokens': float(tpm), 'updated_at': time.time()}
+                result = fn(state)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    async def aupdate(self, rpm: int, tpm: int, fn) -> float:
+        # The file lock can block on other workers and the read/write is disk I/O;
+        # run both off the event loop
+        return await asyncio.to_thread(self._update, rpm, tpm, fn)
+
+
+class TokenBucketRateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter with FIFO waiting"""
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int, backend: Optional[str] = None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        backend = backend or RATE_LIMIT_BACKEND
+        self.backend = FileBucketBackend(name) if backend == 'file' else MemoryBucketBackend(name)
+        # One waiting line per event loop (asyncio.Lock wakes waiters in FIFO order)
+        self._async_locks = weakref.WeakKeyDictionary()
+        self.waiting = 0
+        self.total_wait_seconds = 0.0
+        self.acquired = 0
+
+    def _cap(self, tokens: int) -> int:
+        # A request larger than the whole bucket would never fit; let it through at full capacity
+        return min(max(0, int(tokens)), self.tokens_per_minute)
+
+    def _consumer(self, tokens: int):
+        return lambda state: _try_consume(state, self.requests_per_minute, self.tokens_per_minute, tokens, time.time())
+
+    async def _aconsume(self, tokens: int) -> float:
+        return await self.backend.aupdate(self.requests_per_minute, self.tokens_per_minute, self._consumer(tokens))
+
+    def _async_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        lock = self._async_locks.get(loop)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._async_locks[loop] = lock
+        return lock
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until one request and the given tokens are available"""
+        tokens = self._cap(tokens)
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._async_lock():
+                while True:
+                    wait = await self._aconsume(tokens)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+        finally:
+            self.waiting -= 1
+        self.acquired += 1
+        self.total_wait_seconds += time.monotonic() - started
+
+    async def try_acquire(self, tokens: int = 0) -> bool:
+        """
+        Take one request and the given tokens only if available right now
+
+        Never waits and never jumps the queue: returns False while other
+        callers are waiting, so optional extra requests (hedges) only use
+        spare headroom.
+        """
+        tokens = self._cap(tokens)
+        if self.waiting:
+            return False
+        if await self._aconsume(tokens) > 0:
+            return False
+        self.acquired += 1
+        return True
+
+    async def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Return unused tokens once the real usage is known"""
+        if actual_tokens is None:
+            return
+        refund = self._cap(estimated_tokens) - actual_tokens
+        if refund <= 0:
+            return
+
+        def credit(state):
+            _refill(state, self.requests_per_minute, self.tokens_per_minute, time.time())
+            state['tokens'] = min(self.tokens_per_minute, state['tokens'] + refund)
+            return 0.0
+
+        await self.backend.aupdate(self.requests_per_minute, self.tokens_per_minute, credit)
+
+    async def headroom(self) -> Dict:
+        """Current available requests/tokens and queue statistics"""
+        def peek(state):
+            _refill(state, self.requests_per_minute, self.tokens_per_minute, time.time())
+            return dict(state)
+
+        state = await self.backend.aupdate(self.requests_per_minute, self.tokens_per_minute, peek)
+        return {
+            "name": self.name,
+            "backend": type(self.backend).__name__,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "available_requests": round(state['requests'], 2),
+            "available_tokens": int(state['tokens']),
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "avg_wait_seconds": round(self.total_wait_seconds / self.acquired, 4) if self.acquired else 0.0
+        }
+
+
+# Shared limiters used by services.py
+chat_rate_limiter = TokenBucketRateLimiter("openai_chat", OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT)
+image_rate_limiter = TokenBucketRateLimiter("openai_images", OPENAI_IMAGES_PER_MINUTE, 0)
@@ -0,0 +1,251 @@
+"""
+Resilience layer for LLM calls: hedged requests and a circuit breaker
+A hedge is a duplicate request sent once the primary has been slower than a
+configured latency percentile; whichever finishes first wins and the other is
+cancelled. The circuit breaker opens after consecutive failures so later calls
+fail fast (callers fall back to cached output) instead of each waiting out the
+full timeout.
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'true').lower() == 'true'
+# Send the hedge once the primary is slower than this share of recent calls
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '0.95'))
+# Latency samples needed before hedging starts
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half_open -> closed)"""
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open after {self.consecutive_failures} consecutive failures")
+                self.state = "half_open"
+            if self.state == "half_open":
+                # Let a single trial call probe the upstream
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open, waiting on a trial call")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Forget an in-flight trial call that was cancelled before finishing"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.state == "open" else None
+            }
+
+
+class Hedger:
+    """Sends a duplicate request when the first one is slower than usual"""
+
+    def __init__(self, name: str, percentile: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES, window: int = 200):
+        self.name = name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedges_skipped = 0
+        self.hedge_wins = 0
+        self.primary_wins_after_hedge = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if there is not enough history"""
+        if not HEDGE_ENABLED or len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    async def run(self, attempt: Callable[[], Awaitable], hedge_gate: Optional[Callable[[], Awaitable[bool]]] = None):
+        """
+        Run attempt(), hedging with a second attempt() after hedge_delay()
+
+        Args:
+            attempt: Factory returning a new awaitable for each try; it should
+                cover only the upstream call (acquire rate-limit tokens first),
+                since its duration feeds the hedge delay
+            hedge_gate: Called before sending a hedge; returning False skips it
+                (e.g. no rate-limit headroom for a second request)
+
+        Returns:
+            Result of the first attempt to succeed
+        """
+        self.calls += 1
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(attempt())
+        tasks = {primary}
+        hedge = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if hedge_gate is None or await hedge_gate():
+                        hedge = asyncio.ensure_future(attempt())
+                        tasks.add(hedge)
+                        self.hedges_sent += 1
+                    else:
+                        self.hedges_skipped += 1
+
+            last_error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if hedge is not None:
+                            if task is hedge:
+                                self.hedge_wins += 1
+                            else:
+                                self.primary_wins_after_hedge += 1
+                        # Time since the primary was sent (attempt() holds no limiter wait)
+                        self.latencies.append(time.monotonic() - started)
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            # Cancel the loser (or everything, if we were cancelled ourselves)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict:
+        delay = self.hedge_delay()
+        return {
+            "name": self.name,
+            "enabled": HEDGE_ENABLED,
+            "percentile": self.percentile,
+            "hedge_delay_seconds": round(delay, 3) if delay is not None else None,
+            "samples": len(self.latencies),
+            "calls": self.calls,
+            "hedges_sent": self.hedges_sent,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins_after_hedge": self.primary_wins_after_hedge,
+            "hedge_win_rate": round(self.hedge_wins / self.hedges_sent, 4) if self.hedges_sent else 0.0
+        }
+
+
+def _counts_as_failure(error: Exception) -> bool:
+    """Request errors caused by our own input should not trip the breaker"""
+    status_code = getattr(error, 'status_code', None)
+    return not (status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429))
+
+
+async def resilient_call(
+    breaker: CircuitBreaker,
+    attempt: Callable[[], Awaitable],
+    hedger: Optional[Hedger] = None,
+    hedge_gate: Optional[Callable[[], Awaitable[bool]]] = None
+):
+    """
+    Call through the circuit breaker, optionally hedged
+
+    Args:
+        breaker: Circuit breaker guarding the upstream
+        attempt: Factory returning a new awaitable for each try
+        hedger: Hedger to use, or None for a single attempt
+        hedge_gate: Passed to Hedger.run (decides whether a hedge may be sent)
+    """
+    breaker.allow()
+    try:
+        result = await (hedger.run(attempt, hedge_gate) if hedger is not None else attempt())
+    except asyncio.CancelledError:
+        breaker.release_trial()
+        raise
+    except Exception as e:
+        if _counts_as_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
+# Shared breaker (one upstream) used by services.py
+openai_breaker = CircuitBreaker("openai")
+
+# One hedger per model route, since a tweet and a blog post have very different latencies
+_chat_hedgers: Dict[str, Hedger] = {}
+
+
+def get_chat_hedger(route: Optional[str]) -> Hedger:
+    """Get or create the hedger for a model route"""
+    key = route or 'default'
+    if key not in _chat_hedgers:
+        _chat_hedgers[key] = Hedger(key)
+    return _chat_hedgers[key]
+
+
+def get_resilience_status() -> Dict:
+    """Breaker state and hedge statistics for monitoring"""
+    hedgers = [hedger.stats() for hedger in _chat_hedgers.values()]
+    hedges_sent = sum(h["hedges_sent"] for h in hedgers)
+    hedge_wins = sum(h["hedge_wins"] for h in hedgers)
+    return {
+        "circuit_breaker": openai_breaker.status(),
+        "hedging": {
+            "enabled": HEDGE_ENABLED,
+            "hedges_sent": hedges_sent,
+            "hedge_wins": hedge_wins,
+            "hedge_win_rate": round(hedge_wins / hedges_sent, 4) if hedges_sent else 0.0,
+            "routes": hedgers
+        }
+    }
@@ -0,0 +1,259 @@
+"""
+Weighted fair-share scheduling for model calls
+All upstream calls share SCHEDULER_MAX_CONCURRENCY slots. Waiting calls sit
+in one of two lanes: "interactive" (a reviewer is waiting, e.g. regenerate)
+is always served before "background" (onboarding and bulk generation).
+Within a lane, clients are served by weighted fair queuing on estimated
+token cost, so one client's large batch cannot starve the others.
+
+A call may also pass an admission step (e.g. waiting for rate-limit tokens).
+It runs once the call's turn comes, one call per gate at a time and without
+holding a slot, so the rate limiter serves calls in the scheduler's order
+instead of first come, first served.
+"""
+import os
+import json
+import heapq
+import time
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv('SCHEDULER_MAX_CONCURRENCY', '8'))
+# Optional per-client weights, e.g. {"<client_id>": 3}; clients can also carry scheduling_weight
+CLIENT_WEIGHTS = json.loads(os.getenv('CLIENT_WEIGHTS', '{}') or '{}')
+
+LANE_INTERACTIVE = 'interactive'
+LANE_BACKGROUND = 'background'
+# Highest priority first
+LANES = (LANE_INTERACTIVE, LANE_BACKGROUND)
+
+
+def client_weight(client_data: Optional[Dict]) -> float:
+    """Scheduling weight for a client (CLIENT_WEIGHTS wins over the client's own field)"""
+    client_data = client_data or {}
+    weight = CLIENT_WEIGHTS.get(client_data.get('client_id')) or client_data.get('scheduling_weight') or 1
+    try:
+        return max(0.01, float(weight))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class _Lane:
+    def __init__(self, name: str, window: int = 500):
+        self.name = name
+        self.heap = []
+        self.virtual_time = 0.0
+        self.client_finish: Dict[str, float] = {}
+        self.queued_by_client: Dict[str, int] = {}
+        self.waits = deque(maxlen=window)
+        self.dispatched = 0
+        self.cancelled = 0
+
+
+class FairShareScheduler:
+    """Weighted fair queue with strict-priority lanes in front of a fixed number of slots"""
+
+    def __init__(self, max_concurrency: int = SCHEDULER_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._lanes = {name: _Lane(name) for name in LANES}
+        self._sequence = itertools.count()
+        # Gates with a call in its admission step
+        self._admitting = set()
+        # Admitted calls waiting for a slot; served before either lane
+        self._ready = deque()
+
+    async def acquire(
+        self,
+        client_id: Optional[str],
+        lane: str = LANE_BACKGROUND,
+        weight: float = 1.0,
+        cost: float = 1.0,
+        admit: Optional[Callable[[], Awaitable]] = None,
+        gate: str = 'default'
+    ):
+        """
+        Wait for a slot
+
+        Args:
+            client_id: Client the call is made for (None shares one anonymous queue)
+            lane: "interactive" or "background"
+            weight: Client's share relative to others in the lane
+            cost: Estimated size of the call (tokens)
+            admit: Awaited when the call's turn comes, before it takes a slot
+                (e.g. rate-limit acquire)
+            gate: Admission steps with the same gate run one at a time
+        """
+        queue = self._lanes.get(lane) or self._lanes[LANE_BACKGROUND]
+        client_key = client_id or 'anonymous'
+
+        # Start-time fair queuing: a client's next call finishes cost/weight after its previous one
+        finish = max(queue.virtual_time, queue.client_finish.get(client_key, 0.0)) + max(cost, 1.0) / weight
+        queue.client_finish[client_key] = finish
+        waiter = asyncio.get_running_loop().create_future()
+        entry = [finish, next(self._sequence), client_key, waiter, time.monotonic(), gate if admit is not None else None]
+        heapq.heappush(queue.heap, entry)
+        queue.queued_by_client[client_key] = queue.queued_by_client.get(client_key, 0) + 1
+        self._dispatch()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted our turn just as we were cancelled; hand it on
+                self._abandon_turn(entry)
+            else:
+                queue.cancelled += 1
+                self._discard(queue, entry)
+            raise
+
+        if admit is None:
+            return
+        try:
+            await admit()
+        except BaseException:
+            self._admitting.discard(gate)
+            self._dispatch()
+            raise
+        self._admitting.discard(gate)
+        await self._take_admitted_slot()
+
+    async def _take_admitted_slot(self):
+        """Slot for a call that passed admission (ahead of both lanes)"""
+        if self.in_flight < self.max_concurrency and not self._ready:
+            self.in_flight += 1
+            self._dispatch()
+            return
+        ready = asyncio.get_running_loop().create_future()
+        self._ready.append(ready)
+        self._dispatch()
+        try:
+            await ready
+        except asyncio.CancelledError:
+            if ready.done() and not ready.cancelled():
+                self.release()
+            elif ready in self._ready:
+                self._ready.remove(ready)
+                self._dispatch()
+            raise
+
+    def _abandon_turn(self, entry: list):
+        gate = entry[5]
+        if gate is None:
+            self.release()
+        else:
+            self._admitting.discard(gate)
+            self._dispatch()
+
+    def _discard(self, queue: _Lane, entry: list):
+        """Drop a cancelled waiter from its lane"""
+        if entry in queue.heap:
+            queue.heap.remove(entry)
+            heapq.heapify(queue.heap)
+            self._dequeued(queue, entry[2])
+
+    def _dequeued(self, queue: _Lane, client_key: str):
+        remaining = queue.queued_by_client.get(client_key, 1) - 1
+        if remaining > 0:
+            queue.queued_by_client[client_key] = remaining
+        else:
+            queue.queued_by_client.pop(client_key, None)
+
+    def release(self):
+        """Free a slot and hand it to the next waiter"""
+        self.in_flight = max(0, self.in_flight - 1)
+        self._dispatch()
+
+    def _next_entry(self) -> Optional[Tuple[_Lane, list]]:
+        """Highest-priority waiter whose gate is free (calls behind a busy gate are skipped)"""
+        for name in LANES:
+            queue = self._lanes[name]
+            if not queue.heap:
+                continue
+            gate = queue.heap[0][5]
+            if gate is None or gate not in self._admitting:
+                return queue, heapq.heappop(queue.heap)
+            for entry in sorted(queue.heap):
+                if entry[5] is None or entry[5] not in self._admitting:
+                    queue.heap.remove(entry)
+                    heapq.heapify(queue.heap)
+                    return queue, entry
+        return None
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrency:
+            if self._ready:
+                ready = self._ready.popleft()
+                if not ready.done():
+                    self.in_flight += 1
+                    ready.set_result(None)
+                continue
+            picked = self._next_entry()
+            if picked is None:
+                return
+            queue, (finish, _, client_key, waiter, enqueued_at, gate) = picked
+            self._dequeued(queue, client_key)
+            if waiter.done():
+                continue
+            queue.virtual_time = max(queue.virtual_time, finish)
+            if not queue.heap:
+                # Lane drained; idle clients should not bank credit
+                queue.client_finish.clear()
+            if gate is None:
+                self.in_flight += 1
+            else:
+                # The admission step runs without a slot; it takes one when it finishes
+                self._admitting.add(gate)
+            queue.dispatched += 1
+            queue.waits.append(time.monotonic() - enqueued_at)
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        client_id: Optional[str],
+        lane: str = LANE_BACKGROUND,
+        weight: float = 1.0,
+        cost: float = 1.0,
+        admit: Optional[Callable[[], Awaitable]] = None,
+        gate: str = 'default'
+    ):
+        """Hold a slot for the duration of the block (see acquire)"""
+        await self.acquire(client_id, lane, weight, cost, admit, gate)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        """Queue depth and wait times per lane"""
+        lanes = {}
+        for name, queue in self._lanes.items():
+            waits = sorted(queue.waits)
+
+            def percentile(p):
+                return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+            lanes[name] = {
+                "queue_depth": len(queue.heap),
+                "queued_by_client": dict(queue.queued_by_client),
+                "dispatched": queue.dispatched,
+                "cancelled": queue.cancelled,
+                "wait_avg_seconds": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "wait_p95_seconds": percentile(0.95),
+                "wait_max_seconds": round(waits[-1], 4) if waits else 0.0
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "admitting": sorted(self._admitting),
+            "admitted_waiting": len(self._ready),
+            "lanes": lanes
+        }
+
+
+# Shared scheduler used by services.py
+model_call_scheduler = FairShareScheduler()
@@ -0,0 +1,193 @@
+"""
+Semantic near-match index over generated content
+Many clients share an industry, tone and audience, so their generation
+prompts are near-identical. Each generated post is indexed under a
+fingerprint of the prompt inputs that shape it (brand profile, platform,
+content type, topic). The fingerprint is embedded locally as signed, hashed
+word and character n-grams, using NumPy and no external service. A new
+request within SEMANTIC_CACHE_THRESHOLD cosine similarity of an indexed
+prompt can then "start from similar": the model adapts the existing draft
+instead of writing from scratch.
+"""
+import os
+import re
+import time
+import zlib
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true' and np is not None
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.85'))
+SEMANTIC_CACHE_DIM = int(os.getenv('SEMANTIC_CACHE_DIM', '1024'))
+# Entries kept per (platform, content type, model) partition; oldest are evicted first
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '2000'))
+
+# Brand fields that shape the output; the company name is deliberately left out
+FINGERPRINT_FIELDS = ('industry', 'brand_tone', 'target_audience', 'marketing_goals', 'content_preferences')
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def prompt_fingerprint(client_data: Dict, topic: Optional[str] = None) -> str:
+    """Text describing the inputs of a generation request, minus the company identity"""
+    parts = [f"{field}: {client_data.get(field) or ''}" for field in FINGERPRINT_FIELDS]
+    voice = client_data.get('brand_digest') or client_data.get('past_examples') or ''
+    parts.append(f"voice: {str(voice)[:600]}")
+    parts.append(f"topic: {topic or ''}")
+    return "\n".join(parts).lower()
+
+
+def _features(text: str) -> List[str]:
+    """Word unigrams and bigrams plus character 4-grams"""
+    words = _WORD_RE.findall(text.lower())
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    joined = f" {' '.join(words)} "
+    features += [f"#{joined[i:i + 4]}" for i in range(len(joined) - 3)]
+    return features
+
+
+def embed(text: str, dim: int = SEMANTIC_CACHE_DIM):
+    """L2-normalized signed feature-hashing embedding of text"""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(text):
+        # crc32 is stable across processes, unlike hash()
+        hashed = zlib.crc32(feature.encode('utf-8'))
+        vector[hashed % dim] += 1.0 if (hashed >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Partition:
+    """
+    Ring buffer of up to `capacity` vectors and their entries
+
+    Rows are written in place. The matrix doubles in size until it reaches
+    capacity (so small partitions stay small), then the oldest row is
+    overwritten; inserts never copy the whole index once it is full.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.capacity = capacity
+        self.vectors = np.zeros((min(capacity, 64), dim), dtype=np.float32)
+        self.entries: List[Optional[Dict]] = [None] * len(self.vectors)
+        self.size = 0
+        self._next = 0
+
+    def add(self, vector, entry: Dict):
+        if self._next == len(self.vectors) and len(self.vectors) < self.capacity:
+            grown = np.zeros((min(self.capacity, 2 * len(self.vectors)), self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+            self.entries += [None] * (len(grown) - len(self.entries))
+        self._next %= len(self.vectors)
+        self.vectors[self._next] = vector
+        self.entries[self._next] = entry
+        self._next += 1
+        self.size = min(self.size + 1, len(self.vectors))
+
+
+class SemanticCache:
+    """In-process vector index of generated content keyed by prompt fingerprint"""
+
+    def __init__(self, dim: int = SEMANTIC_CACHE_DIM, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.dim = dim
+        self.threshold = threshold
+        self._partitions: Dict[tuple, _Partition] = {}
+        self._lock = threading.Lock()
+        self._lookup_ms = deque(maxlen=1000)
+        self.lookups = 0
+        self.hits = 0
+        self.hit_similarities = deque(maxlen=1000)
+        self.adapted = 0
+        self.adapted_valid = 0
+        self.source_name_leaks = 0
+
+    def add(self, platform: str, content_type: str, model: str, fingerprint: str, content: str, client_data: Dict):
+        """Index a freshly generated post"""
+        if not SEMANTIC_CACHE_ENABLED or not content:
+            return
+        vector = embed(fingerprint, self.dim)
+        entry = {
+            "content": content,
+            "client_id": client_data.get('client_id'),
+            "company_name": client_data.get('company_name'),
+            "created_at": datetime.now().isoformat()
+        }
+        with self._lock:
+            partition = self._partitions.get((platform, content_type, model))
+            if partition is None:
+                partition = self._partitions[(platform, content_type, model)] = _Partition(self.dim, SEMANTIC_CACHE_MAX_ENTRIES)
+            partition.add(vector, entry)
+
+    def lookup(self, platform: str, content_type: str, model: str, fingerprint: str) -> Optional[Dict]:
+        """
+        Find the most similar indexed post for the same platform, content type and model
+
+        Returns:
+            The entry plus its "similarity", or None below the threshold
+        """
+        if not SEMANTIC_CACHE_ENABLED:
+            return None
+        started = time.monotonic()
+        query = embed(fingerprint, self.dim)
+        with self._lock:
+            partition = self._partitions.get((platform, content_type, model))
+            best = None
+            if partition is not None and partition.size:
+                similarities = partition.vectors[:partition.size] @ query
+                index = int(np.argmax(similarities))
+                best = {**partition.entries[index], "similarity": float(similarities[index])}
+            self.lookups += 1
+            self._lookup_ms.append((time.monotonic() - started) * 1000)
+            if best is None or best["similarity"] < self.threshold:
+                return None
+            self.hits += 1
+            self.hit_similarities.append(best["similarity"])
+        return best
+
+    def record_adaptation(self, source: Dict, adapted: str, valid: bool):
+        """Track the quality of an adapted draft (validity and leftover source company names)"""
+        with self._lock:
+            self.adapted += 1
+            self.adapted_valid += 1 if valid else 0
+            name = (source.get('company_name') or '').strip().lower()
+            if name and name in adapted.lower():
+                self.source_name_leaks += 1
+
+    def stats(self) -> Dict:
+        """Index size, lookup latency and hit quality"""
+        with self._lock:
+            entries = sum(p.size for p in self._partitions.values())
+            lookup_ms = sorted(self._lookup_ms)
+            similarities = list(self.hit_similarities)
+            return {
+                "enabled": SEMANTIC_CACHE_ENABLED,
+                "numpy_available": np is not None,
+                "threshold": self.threshold,
+                "dim": self.dim,
+                "partitions": len(self._partitions),
+                "entries": entries,
+                "index_bytes": sum(p.vectors.nbytes for p in self._partitions.values()),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "lookup_ms_avg": round(sum(lookup_ms) / len(lookup_ms), 3) if lookup_ms else 0.0,
+                "lookup_ms_p95": round(lookup_ms[min(len(lookup_ms) - 1, int(0.95 * len(lookup_ms)))], 3) if lookup_ms else 0.0,
+                "hit_similarity_avg": round(sum(similarities) / len(similarities), 4) if similarities else 0.0,
+                "hit_similarity_min": round(min(similarities), 4) if similarities else 0.0,
+                "adapted": self.adapted,
+                "adapted_valid_rate": round(self.adapted_valid / self.adapted, 4) if self.adapted else 0.0,
+                "source_name_leaks": self.source_name_leaks
+            }
+
+
+# Shared index used by services.py
+semantic_cache = SemanticCache()
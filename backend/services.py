@@ -3,44 +3,345 @@ Service layer for CampaignForge backend
 Handles OpenAI integration, content generation, and n8n integration
 """
 import os
-from openai import OpenAI
+import json
+import asyncio
 from dotenv import load_dotenv
 import requests
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from generation_cache import generation_cache, make_cache_key, IMAGE_CACHE_TTL_SECONDS
+from rate_limiter import chat_rate_limiter, image_rate_limiter, estimate_tokens
+from prompt_templates import (
+    PROMPT_TEMPLATE_VERSION, BRAND_MATERIAL_FIELDS, BRAND_MATERIAL_TOKEN_BUDGET,
+    render_messages, render_image_prompt, render_brand_material, record_prompt_usage
+)
+from token_counter import count_tokens, truncate_to_tokens
+from model_routing import DEFAULT_MODEL, resolve_route, timed_route, get_routing_table
+from llm_providers import get_llm_provider
+from content_validation import validate_content
+from scheduler import LANE_INTERACTIVE, LANE_BACKGROUND, model_call_scheduler, client_weight
+from singleflight import chat_singleflight, image_singleflight
+from resilience import CircuitOpenError, openai_breaker, get_chat_hedger, resilient_call
+from usage_ledger import usage_ledger
+from semantic_cache import semantic_cache, prompt_fingerprint
 
 load_dotenv()
 
-# Initialize OpenAI client (lazy initialization to handle missing API key)
-openai_client = None
-
-def get_openai_client():
-    """Get or initialize OpenAI client"""
-    global openai_client
-    if openai_client is None:
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key or api_key == 'your_openai_api_key_here':
-            raise Exception("OpenAI API key not configured. Please set OPENAI_API_KEY in .env file")
-        # Initialize with minimal configuration to avoid proxy issues
-        try:
-            openai_client = OpenAI(
-                api_key=api_key,
-                timeout=60.0,
-                max_retries=3
-            )
-        except Exception as e:
-            raise Exception(f"Failed to initialize OpenAI client: {str(e)}")
-    return openai_client
+# Maximum number of OpenAI requests (text + image) in flight per onboarding
+GENERATION_CONCURRENCY = int(os.getenv('GENERATION_CONCURRENCY', '4'))
+
+# Upper bound for alternatives produced by one multi-variant regeneration
+MAX_REGENERATION_VARIANTS = int(os.getenv('MAX_REGENERATION_VARIANTS', '5'))
+
+# "per_platform" (one completion per platform) or "structured" (one JSON completion for all platforms)
+CONTENT_GENERATION_MODE = os.getenv('CONTENT_GENERATION_MODE', 'per_platform')
+# Structured mode needs a model that supports JSON output
+STRUCTURED_GENERATION_MODEL = os.getenv('STRUCTURED_GENERATION_MODEL', 'gpt-4o')
+
+# One-time condensation of past_examples/texts into a brand voice digest at onboarding
+BRAND_DIGEST_MODEL = os.getenv('BRAND_DIGEST_MODEL', DEFAULT_MODEL)
+BRAND_DIGEST_MAX_TOKENS = int(os.getenv('BRAND_DIGEST_MAX_TOKENS', str(BRAND_MATERIAL_TOKEN_BUDGET)))
+# Most brand material sent to the summarizer itself
+BRAND_DIGEST_INPUT_MAX_TOKENS = int(os.getenv('BRAND_DIGEST_INPUT_MAX_TOKENS', '12000'))
+
+
+def _total_tokens(response) -> Optional[int]:
+    """Total tokens reported by a completion response, if any"""
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', None) if usage is not None else None
+
+
+def _call_context(client_data: Optional[Dict], template: str, route: str, lane: str) -> Dict:
+    """Call metadata for accounting, routing metrics and scheduling"""
+    return {
+        "template": template,
+        "route": route,
+        "lane": lane,
+        "client_id": (client_data or {}).get('client_id'),
+        "weight": client_weight(client_data)
+    }
+
+
+def _scheduled(context: Dict, cost: float, limiter, tokens: int = 0, on_admitted: Optional[Callable[[], None]] = None):
+    """
+    Fair-share scheduler slot for an async model call
+
+    The rate-limit tokens are acquired in the scheduler's admission step, so
+    calls get them in lane/weight order and do not hold a slot while waiting.
+    on_admitted is called once the tokens are taken.
+    """
+    async def admit():
+        await limiter.acquire(tokens)
+        if on_admitted is not None:
+            on_admitted()
+
+    return model_call_scheduler.slot(
+        context.get('client_id'),
+        context.get('lane', LANE_BACKGROUND),
+        context.get('weight', 1.0),
+        cost,
+        admit,
+        limiter.name
+    )
+
+
+async def _achat_completion(request_params: Dict, context: Optional[Dict] = None):
+    """
+    Create a chat completion through the rate limiter, scheduler and circuit
+    breaker, hedged against slow responses
+    
+    Concurrent calls with identical parameters share one upstream request.
+    
+    Args:
+        request_params: Chat completion parameters
+        context: Call metadata from _call_context - "template" (for cached-token
+            accounting), "route" (for per-route latency/token metrics and hedging)
+            and "lane"/"client_id"/"weight" (for the fair-share scheduler)
+    """
+    key = make_cache_key("chat", **request_params)
+    return await chat_singleflight.do(key, lambda: _achat_completion_once(request_params, context))
+
+
+async def _achat_completion_once(request_params: Dict, context: Optional[Dict] = None):
+    context = context or {}
+    estimated = estimate_tokens(request_params)
+    
+    ledger_entry = None
+    response = None
+    # Requests paid for with the limiter (the primary, plus a hedge if one is sent)
+    charges = 0
+    
+    def charged():
+        nonlocal charges
+        charges += 1
+    
+    async def attempt():
+        # Only the upstream call: its duration drives the hedge delay
+        ledger_entry['attempts'] += 1
+        return await get_llm_provider().achat_completion(request_params)
+    
+    async def hedge_gate():
+        # A hedge only uses spare headroom; it never queues behind other callers
+        if not await chat_rate_limiter.try_acquire(estimated):
+            return False
+        charged()
+        return True
+    
+    try:
+        async with _scheduled(context, estimated, chat_rate_limiter, estimated, charged):
+            with usage_ledger.track(context, request_params['model'], "chat") as ledger_entry, \
+                    timed_route(context.get('route'), request_params['model']) as record:
+                response = await resilient_call(openai_breaker, attempt, get_chat_hedger(context.get('route')), hedge_gate)
+                record['usage'] = ledger_entry['usage'] = getattr(response, 'usage', None)
+    finally:
+        # The losing hedge was sent too; count it at the winner's usage.
+        # A failed call refunds its whole estimate.
+        actual_tokens = _total_tokens(response) if response is not None else 0
+        for _ in range(charges):
+            await chat_rate_limiter.settle(estimated, actual_tokens)
+    record_prompt_usage(context.get('template'), record['usage'])
+    return response
+
+
+async def _stream_chat_completion(request_params: Dict, context: Optional[Dict] = None) -> AsyncIterator[str]:
+    """Yield content deltas from a streaming chat completion"""
+    context = context or {}
+    estimated = estimate_tokens(request_params)
+    
+    ledger_entry = None
+    # Set once tokens are taken; cleared once the model starts answering
+    refundable = False
+    
+    def charged():
+        nonlocal refundable
+        refundable = True
+    
+    async def attempt():
+        ledger_entry['attempts'] += 1
+        return await get_llm_provider().astream_chat_completion(request_params)
+    
+    try:
+        async with _scheduled(context, estimated, chat_rate_limiter, estimated, charged):
+            with usage_ledger.track(context, request_params['model'], "stream") as ledger_entry, \
+                    timed_route(context.get('route'), request_params['model']) as record:
+                stream = await resilient_call(openai_breaker, attempt)
+                try:
+                    async for chunk in stream:
+                        refundable = False
+                        if getattr(chunk, 'usage', None) is not None:
+                            record['usage'] = ledger_entry['usage'] = chunk.usage
+                            await chat_rate_limiter.settle(estimated, chunk.usage.total_tokens)
+                            record_prompt_usage(context.get('template'), chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                finally:
+                    await stream.close()
+    except BaseException:
+        if refundable:
+            # Failed before the model produced anything; refund the estimate
+            await chat_rate_limiter.settle(estimated, 0)
+        raise
+
+
+async def _aimage_generation(prompt: str, context: Optional[Dict] = None):
+    """Generate an image through the shared image rate limiter and circuit breaker (identical concurrent prompts share one request)"""
+    context = context or {}
+    
+    ledger_entry = None
+    
+    async def attempt():
+        ledger_entry['attempts'] += 1
+        return await get_llm_provider().agenerate_image(prompt, **IMAGE_MODEL_PARAMS)
+    
+    async def scheduled_call():
+        nonlocal ledger_entry
+        async with _scheduled(context, IMAGE_SCHEDULING_COST, image_rate_limiter):
+            with usage_ledger.track(context, IMAGE_MODEL_PARAMS['model'], "image") as ledger_entry:
+                response = await resilient_call(openai_breaker, attempt)
+                ledger_entry['images'] = len(response.data or [])
+                return response
+    
+    key = make_cache_key("image", prompt=prompt, **IMAGE_MODEL_PARAMS)
+    return await image_singleflight.do(key, scheduled_call)
+
+
+def get_model_routes() -> Dict:
+    """Resolved model routes for each platform and their latency/token metrics"""
+    return get_routing_table(PLATFORM_CONTENT_TYPES)
+
+
+def get_llm_provider_info() -> Dict:
+    """Active LLM provider and its settings"""
+    return get_llm_provider().describe()
+
+
+async def get_rate_limit_headroom() -> Dict:
+    """Current headroom of the OpenAI rate limiters"""
+    return {
+        "chat": await chat_rate_limiter.headroom(),
+        "images": await image_rate_limiter.headroom()
+    }
+
+
+async def generate_brand_digest_async(client_data: Dict, use_cache: bool = True) -> Optional[Dict]:
+    """
+    Condense a client's past examples and pasted texts into a brand voice digest
+    
+    Material that already fits BRAND_MATERIAL_TOKEN_BUDGET is kept verbatim
+    without a model call. Digests are cached by material hash, so onboarding
+    the same brand material twice summarizes it once.
+    
+    Args:
+        client_data: Client information dictionary
+        use_cache: Whether to use the generation cache
+    
+    Returns:
+        Fields to store on the client document, or None if there is no material
+    """
+    material = render_brand_material(client_data)
+    if not material:
+        return None
+    
+    material_tokens = count_tokens(material)
+    if material_tokens <= BRAND_MATERIAL_TOKEN_BUDGET:
+        digest = material
+    else:
+        brand_fields = {key: value for key, value in client_data.items() if key not in BRAND_MATERIAL_FIELDS and key != 'brand_digest'}
+        request_params = {
+            "model": BRAND_DIGEST_MODEL,
+            "messages": render_messages(
+                "brand_digest",
+                brand_fields,
+                material=truncate_to_tokens(material, BRAND_DIGEST_INPUT_MAX_TOKENS),
+                max_words=int(BRAND_DIGEST_MAX_TOKENS * 0.7)
+            ),
+            "max_tokens": BRAND_DIGEST_MAX_TOKENS,
+            "temperature": 0.3
+        }
+        cache_key = make_cache_key("brand_digest", template_version=PROMPT_TEMPLATE_VERSION, **request_params)
+        context = _call_context(client_data, "brand_digest", "*:brand_digest", LANE_BACKGROUND)
+        digest = await generation_cache.aget(cache_key) if use_cache else None
+        if digest is None:
+            response = await _achat_completion(request_params, context)
+            digest = response.choices[0].message.content.strip()
+            await generation_cache.aset(cache_key, digest, kind="brand_digest")
+        else:
+            usage_ledger.record(context, request_params['model'], "chat", cache_hit=True)
+    
+    return {
+        "brand_digest": digest,
+        "brand_digest_tokens": count_tokens(digest),
+        "brand_material_tokens": material_tokens,
+        "brand_digest_version": PROMPT_TEMPLATE_VERSION
+    }
+
+
+# "Start from similar": model used to adapt a near-matching draft (empty uses the route's model)
+SEMANTIC_ADAPT_MODEL = os.getenv('SEMANTIC_ADAPT_MODEL', '')
+
 
 # n8n configuration
 N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL', 'http://localhost:5678/webhook')
 N8N_API_KEY = os.getenv('N8N_API_KEY', '')
 
 
-def generate_content(
+# Default content type per platform for initial generation
+PLATFORM_CONTENT_TYPES = {
+    'LinkedIn': 'post',
+    'Twitter': 'post',
+    'Instagram': 'post',
+    'Facebook': 'post',
+    'Reddit': 'post',
+    'Email': 'newsletter',
+    'Website': 'blog',
+    'YouTube': 'video_script'
+}
+
+def _content_request(
+    client_data: Dict,
+    platform: str,
+    content_type: str,
+    topic: Optional[str] = None,
+    lane: str = LANE_BACKGROUND
+):
+    """Build the chat completion parameters and call context for generating content"""
+    route = resolve_route(platform, content_type, client_data, purpose='generate')
+    request_params = {
+        "model": route["model"],
+        "messages": render_messages("content", client_data, platform=platform, content_type=content_type, topic=topic),
+        "temperature": route["temperature"],
+        "max_tokens": route["max_tokens"]
+    }
+    return request_params, _call_context(client_data, "content", route["key"], lane)
+
+
+def _adapt_request(
+    client_data: Dict,
+    platform: str,
+    content_type: str,
+    similar: Dict,
+    lane: str = LANE_BACKGROUND
+):
+    """Build the parameters and call context for adapting a near-matching draft"""
+    route = resolve_route(platform, content_type, client_data, purpose='generate')
+    request_params = {
+        "model": SEMANTIC_ADAPT_MODEL or route["model"],
+        "messages": render_messages(
+            "adapt", client_data,
+            platform=platform, content_type=content_type, draft=similar["content"], source_company=similar.get("company_name")
+        ),
+        "temperature": 0.4,
+        "max_tokens": route["max_tokens"]
+    }
+    return request_params, _call_context(client_data, "adapt", route["key"], lane)
+
+
+async def generate_content_async(
     client_data: Dict,
     platform: str,
     content_type: str,
-    topic: Optional[str] = None
+    topic: Optional[str] = None,
+    use_cache: bool = True,
+    lane: str = LANE_BACKGROUND
 ) -> str:
     """
     Generate marketing content using OpenAI based on client data
@@ -50,95 +351,163 @@ def generate_content(
         platform: Target platform (LinkedIn, Twitter, Instagram, etc.)
         content_type: Type of content (post, blog, newsletter, ad_copy, video_script)
         topic: Optional topic or theme for the content
+        use_cache: Serve/store the result from the generation cache
+        lane: Scheduler lane, "interactive" when a reviewer is waiting or "background"
     
     Returns:
         Generated content string
     """
     try:
-        # Build context from client data
-        brand_tone = client_data.get('brand_tone', 'Professional')
-        industry = client_data.get('industry', 'General')
-        target_audience = client_data.get('target_audience', 'General audience')
-        marketing_goals = client_data.get('marketing_goals', 'Brand awareness')
-        content_preferences = client_data.get('content_preferences', 'Educational')
-        past_examples = client_data.get('past_examples', '')
-        
-        # Create platform-specific prompts
-        platform_prompts = {
-            'LinkedIn': 'Create a professional LinkedIn post',
-            'Twitter': 'Create an engaging Twitter post (280 characters max)',
-            'Instagram': 'Create an Instagram post with engaging copy',
-            'Facebook': 'Create a Facebook post that encourages engagement',
-            'Reddit': 'Create a Reddit post that follows community guidelines and encourages discussion',
-            'Email': 'Create an email newsletter content',
-            'Website': 'Create a blog post or website content',
-            'YouTube': 'Create a video script for YouTube'
-        }
-        
-        content_type_prompts = {
-            'post': 'social media post',
-            'blog': 'blog post (500-800 words)',
-            'newsletter': 'email newsletter content',
-            'ad_copy': 'advertising copy',
-            'video_script': 'video script with scene descriptions'
-        }
-        
-        base_prompt = platform_prompts.get(platform, 'Create marketing content')
-        type_prompt = content_type_prompts.get(content_type, 'content')
-        
-        # Construct the full prompt
-        prompt = f"""You are an expert marketing content writer. {base_prompt} as a {type_prompt}.
-
-Client Information:
-- Company: {client_data.get('company_name', 'Unknown')}
-- Industry: {industry}
-- Brand Tone: {brand_tone}
-- Target Audience: {target_audience}
-- Marketing Goals: {marketing_goals}
-- Content Preferences: {content_preferences}
-{f"- Past Examples: {past_examples}" if past_examples else ""}
-{f"- Topic: {topic}" if topic else ""}
-
-Requirements:
-- Match the brand tone: {brand_tone}
-- Appeal to target audience: {target_audience}
-- Align with marketing goals: {marketing_goals}
-- Follow content preferences: {content_preferences}
-- Be engaging and professional
-- Include a clear call-to-action if appropriate
-
-Generate the content now:"""
-
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert marketing content writer specializing in creating engaging, brand-aligned content for various platforms."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
+        request_params, context = _content_request(client_data, platform, content_type, topic, lane)
+        cache_key = make_cache_key("content", template_version=PROMPT_TEMPLATE_VERSION, **request_params)
+        if use_cache:
+            cached = await generation_cache.aget(cache_key)
+            if cached is not None:
+                usage_ledger.record(context, request_params['model'], "chat", cache_hit=True)
+                return cached
+        else:
+            generation_cache.record_bypass()
+
+        # Start from a near-identical prompt's draft when there is one
+        fingerprint = prompt_fingerprint(client_data, topic)
+        similar = semantic_cache.lookup(platform, content_type, request_params['model'], fingerprint) if use_cache else None
+        try:
+            if similar is not None:
+                response = await _achat_completion(*_adapt_request(client_data, platform, content_type, similar, lane))
+            else:
+                response = await _achat_completion(request_params, context)
+        except CircuitOpenError:
+            # Upstream is failing; a cached draft beats an error even if a fresh one was asked for
+            cached = None if use_cache else await generation_cache.aget(cache_key)
+            if cached is None:
+                raise
+            return cached
         
         generated_content = response.choices[0].message.content.strip()
+        if similar is not None:
+            semantic_cache.record_adaptation(similar, generated_content, validate_content(platform, generated_content)["valid"])
+        else:
+            # Only drafts written from scratch are indexed, so adaptations don't drift
+            semantic_cache.add(platform, content_type, request_params['model'], fingerprint, generated_content, client_data)
+        await generation_cache.aset(cache_key, generated_content, kind="content")
         return generated_content
         
     except Exception as e:
         raise Exception(f"Error generating content: {str(e)}")
 
 
-def regenerate_content(
+def _parse_structured_content(raw: str, platforms: List[str]) -> Dict[str, str]:
+    """
+    Validate a structured multi-platform response
+    
+    Args:
+        raw: Raw model output, expected to be {"platforms": {"<platform>": {"content": "..."}}}
+        platforms: Platforms that were requested
+    
+    Returns:
+        Mapping of platform to content for the platforms that passed validation
+    """
+    start, end = raw.find('{'), raw.rfind('}')
+    if start == -1 or end == -1:
+        return {}
+    try:
+        data = json.loads(raw[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    
+    entries = data.get('platforms') if isinstance(data, dict) else None
+    if not isinstance(entries, dict):
+        return {}
+    
+    valid = {}
+    for platform in platforms:
+        entry = entries.get(platform)
+        content = entry.get('content') if isinstance(entry, dict) else entry
+        if isinstance(content, str) and content.strip():
+            valid[platform] = content.strip()
+    return valid
+
+
+async def generate_structured_content_async(
+    client_data: Dict,
+    platforms: List[str],
+    use_cache: bool = True,
+    lane: str = LANE_BACKGROUND
+) -> Dict[str, str]:
+    """
+    Generate content for several platforms with a single JSON-mode completion
+    
+    Platforms missing from the response or failing validation are left out of
+    the result so callers can fall back to per-platform generation for them.
+    
+    Args:
+        client_data: Client onboarding data
+        platforms: Platforms to generate content for
+        use_cache: Serve/store the result from the generation cache
+        lane: Scheduler lane, "interactive" when a reviewer is waiting or "background"
+    
+    Returns:
+        Mapping of platform to generated content
+    """
+    platform_types = {platform: PLATFORM_CONTENT_TYPES.get(platform, 'post') for platform in platforms}
+    request_params = {
+        "model": STRUCTURED_GENERATION_MODEL,
+        "messages": render_messages("structured", client_data, platform_types=platform_types),
+        "temperature": 0.7,
+        "max_tokens": min(4096, 1000 * len(platforms)),
+        "response_format": {"type": "json_object"}
+    }
+    cache_key = make_cache_key("structured", template_version=PROMPT_TEMPLATE_VERSION, **request_params)
+    
+    context = _call_context(client_data, "structured", "*:structured", lane)
+    raw = await generation_cache.aget(cache_key) if use_cache else None
+    if raw is None:
+        if not use_cache:
+            generation_cache.record_bypass()
+        response = await _achat_completion(request_params, context)
+        raw = response.choices[0].message.content or ''
+    else:
+        usage_ledger.record(context, request_params['model'], "chat", cache_hit=True)
+    
+    valid = _parse_structured_content(raw, platforms)
+    if len(valid) == len(platforms):
+        await generation_cache.aset(cache_key, raw, kind="structured")
+    return valid
+
+
+def _regenerate_request(
     client_data: Dict,
     platform: str,
     content_type: str,
     existing_content: str,
-    improvement_focus: Optional[str] = None
+    improvement_focus: Optional[str] = None,
+    lane: str = LANE_INTERACTIVE
+):
+    """Build the chat completion parameters and call context for regenerating content"""
+    route = resolve_route(platform, content_type, client_data, purpose='regenerate')
+    request_params = {
+        "model": route["model"],
+        "messages": render_messages(
+            "regenerate",
+            client_data,
+            platform=platform,
+            content_type=content_type,
+            existing_content=existing_content,
+            improvement_focus=improvement_focus
+        ),
+        "temperature": route["temperature"],
+        "max_tokens": route["max_tokens"]
+    }
+    return request_params, _call_context(client_data, "regenerate", route["key"], lane)
+
+
+async def regenerate_content_async(
+    client_data: Dict,
+    platform: str,
+    content_type: str,
+    existing_content: str,
+    improvement_focus: Optional[str] = None,
+    lane: str = LANE_INTERACTIVE
 ) -> str:
     """
     Regenerate existing content using OpenAI with focus on improvement
@@ -148,130 +517,17 @@ def regenerate_content(
         platform: Target platform (LinkedIn, Twitter, Instagram, etc.)
         content_type: Type of content (post, blog, newsletter, ad_copy, video_script)
         existing_content: The current content that needs to be regenerated
-        improvement_focus: Optional focus area for improvement (e.g., "more engaging", "better CTA", "shorter")
+        improvement_focus: Optional focus area for improvement
+        lane: Scheduler lane, "interactive" when a reviewer is waiting or "background"
     
     Returns:
         Regenerated content string
     """
     try:
-        # Build context from client data
-        brand_tone = client_data.get('brand_tone', 'Professional')
-        industry = client_data.get('industry', 'General')
-        target_audience = client_data.get('target_audience', 'General audience')
-        marketing_goals = client_data.get('marketing_goals', 'Brand awareness')
-        content_preferences = client_data.get('content_preferences', 'Educational')
-        company_name = client_data.get('company_name', 'Unknown')
-        
-        # Platform-specific guidelines
-        platform_guidelines = {
-            'LinkedIn': {
-                'max_length': '1300 characters',
-                'style': 'professional, thought-provoking, industry insights',
-                'format': 'paragraphs with clear structure'
-            },
-            'Twitter': {
-                'max_length': '280 characters',
-                'style': 'concise, engaging, hashtag-friendly',
-                'format': 'short sentences, can include hashtags'
-            },
-            'Instagram': {
-                'max_length': '2200 characters',
-                'style': 'visual, engaging, authentic, emoji-friendly',
-                'format': 'short paragraphs, can include emojis and line breaks'
-            },
-            'Facebook': {
-                'max_length': '5000 characters',
-                'style': 'conversational, community-focused, engaging',
-                'format': 'paragraphs with questions to encourage engagement'
-            },
-            'Reddit': {
-                'max_length': '40000 characters',
-                'style': 'informative, authentic, discussion-provoking, follows Reddit etiquette',
-                'format': 'well-structured post with engaging body text, clear formatting, and questions to spark conversation'
-            },
-            'Email': {
-                'max_length': '2000 characters',
-                'style': 'clear, actionable, value-driven',
-                'format': 'structured with clear sections and CTA'
-            },
-            'Website': {
-                'max_length': '2000 words',
-                'style': 'informative, SEO-friendly, comprehensive',
-                'format': 'structured with headings and subheadings'
-            },
-            'YouTube': {
-                'max_length': '5000 words',
-                'style': 'conversational, engaging, storytelling',
-                'format': 'script format with scene descriptions and dialogue'
-            }
-        }
-        
-        guidelines = platform_guidelines.get(platform, {
-            'max_length': 'appropriate length',
-            'style': 'engaging and professional',
-            'format': 'well-structured'
-        })
-        
-        # Build the regeneration prompt
-        improvement_instruction = ""
-        if improvement_focus:
-            improvement_instruction = f"\n\nIMPORTANT: Focus on improving: {improvement_focus}"
-        else:
-            improvement_instruction = "\n\nIMPORTANT: Improve the content while maintaining brand consistency - make it more engaging, compelling, and aligned with the brand voice."
-        
-        prompt = f"""You are an expert marketing content writer. Your task is to REGENERATE and IMPROVE the following content for {platform}.
-
-CURRENT CONTENT TO REGENERATE:
----
-{existing_content}
----
-
-CLIENT BRAND CONTEXT:
-- Company: {company_name}
-- Industry: {industry}
-- Brand Tone: {brand_tone}
-- Target Audience: {target_audience}
-- Marketing Goals: {marketing_goals}
-- Content Preferences: {content_preferences}
-
-PLATFORM REQUIREMENTS:
-- Platform: {platform}
-- Content Type: {content_type}
-- Maximum Length: {guidelines['max_length']}
-- Style: {guidelines['style']}
-- Format: {guidelines['format']}
-{improvement_instruction}
-
-REGENERATION GUIDELINES:
-1. Maintain the core message and intent of the original content
-2. Keep the brand tone consistent: {brand_tone}
-3. Ensure it appeals to: {target_audience}
-4. Align with marketing goals: {marketing_goals}
-5. Follow content preferences: {content_preferences}
-6. Improve engagement, clarity, and impact
-7. Make it more compelling while staying authentic to the brand
-8. Ensure it fits the {platform} platform format and best practices
-9. Include a strong call-to-action if appropriate for the platform
-10. Optimize for the target audience's interests and pain points
-
-Generate the REGENERATED and IMPROVED content now. Make it better than the original while maintaining brand consistency:"""
-
-        client = get_openai_client()
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert marketing content writer specializing in regenerating and improving existing content while maintaining brand consistency and increasing engagement."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.8,  # Slightly higher for more creative variations
-            max_tokens=1500  # Increased for better regeneration
-        )
+        request_params, context = _regenerate_request(client_data, platform, content_type, existing_content, improvement_focus, lane)
+
+        generation_cache.record_bypass()
+        response = await _achat_completion(request_params, context)
         
         regenerated_content = response.choices[0].message.content.strip()
         return regenerated_content
@@ -280,6 +536,110 @@ Generate the REGENERATED and IMPROVED content now. Make it better than the origi
         raise Exception(f"Error regenerating content: {str(e)}")
 
 
+async def regenerate_content_variants_async(
+    client_data: Dict,
+    platform: str,
+    content_type: str,
+    existing_content: str,
+    improvement_focus: Optional[str] = None,
+    variants: int = 2,
+    lane: str = LANE_INTERACTIVE
+) -> List[str]:
+    """
+    Regenerate several alternative versions of content in a single API call
+    
+    Args:
+        client_data: Client onboarding data
+        platform: Target platform (LinkedIn, Twitter, Instagram, etc.)
+        content_type: Type of content (post, blog, newsletter, ad_copy, video_script)
+        existing_content: The current content that needs to be regenerated
+        improvement_focus: Optional focus area for improvement
+        variants: Number of alternatives to generate (capped at MAX_REGENERATION_VARIANTS)
+        lane: Scheduler lane, "interactive" when a reviewer is waiting or "background"
+    
+    Returns:
+        List of regenerated content strings
+    """
+    try:
+        request_params, context = _regenerate_request(client_data, platform, content_type, existing_content, improvement_focus, lane)
+        request_params["n"] = max(1, min(int(variants), MAX_REGENERATION_VARIANTS))
+
+        generation_cache.record_bypass()
+        response = await _achat_completion(request_params, context)
+        
+        return [choice.message.content.strip() for choice in response.choices if choice.message.content]
+        
+    except Exception as e:
+        raise Exception(f"Error regenerating content: {str(e)}")
+
+
+async def stream_generate_content(
+    client_data: Dict,
+    platform: str,
+    content_type: str,
+    topic: Optional[str] = None,
+    use_cache: bool = True
+) -> AsyncIterator[str]:
+    """
+    Stream generated content token by token
+    
+    A cache hit is yielded as a single chunk. The complete text is written to
+    the generation cache once the stream finishes.
+    
+    Args:
+        client_data: Client onboarding data
+        platform: Target platform (LinkedIn, Twitter, Instagram, etc.)
+        content_type: Type of content (post, blog, newsletter, ad_copy, video_script)
+        topic: Optional topic or theme for the content
+        use_cache: Serve/store the result from the generation cache
+    
+    Yields:
+        Content text deltas
+    """
+    request_params, context = _content_request(client_data, platform, content_type, topic, LANE_INTERACTIVE)
+    cache_key = make_cache_key("content", template_version=PROMPT_TEMPLATE_VERSION, **request_params)
+    if use_cache:
+        cached = await generation_cache.aget(cache_key)
+        if cached is not None:
+            usage_ledger.record(context, request_params['model'], "stream", cache_hit=True)
+            yield cached
+            return
+    else:
+        generation_cache.record_bypass()
+    
+    parts = []
+    async for delta in _stream_chat_completion(request_params, context):
+        parts.append(delta)
+        yield delta
+    await generation_cache.aset(cache_key, ''.join(parts).strip(), kind="content")
+
+
+async def stream_regenerate_content(
+    client_data: Dict,
+    platform: str,
+    content_type: str,
+    existing_content: str,
+    improvement_focus: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Stream regenerated content token by token
+    
+    Args:
+        client_data: Client onboarding data
+        platform: Target platform (LinkedIn, Twitter, Instagram, etc.)
+        content_type: Type of content (post, blog, newsletter, ad_copy, video_script)
+        existing_content: The current content that needs to be regenerated
+        improvement_focus: Optional focus area for improvement
+    
+    Yields:
+        Content text deltas
+    """
+    request_params, context = _regenerate_request(client_data, platform, content_type, existing_content, improvement_focus)
+    generation_cache.record_bypass()
+    async for delta in _stream_chat_completion(request_params, context):
+        yield delta
+
+
 def post_to_n8n(platform: str, content: str, client_data: Dict) -> Dict:
     """
     Send content to n8n webhook for automated posting
@@ -335,68 +695,51 @@ def post_to_n8n(platform: str, content: str, client_data: Dict) -> Dict:
         }
 
 
-def generate_ai_image(client_data: Dict, platform: str) -> Optional[str]:
+# Scheduler cost of one image, in chat-token equivalents
+IMAGE_SCHEDULING_COST = 1000
+
+IMAGE_MODEL_PARAMS = {
+    "model": "dall-e-3",
+    "size": "1024x1024",
+    "quality": "standard",
+    "n": 1
+}
+
+
+async def generate_ai_image_async(
+    client_data: Dict,
+    platform: str,
+    use_cache: bool = True,
+    lane: str = LANE_BACKGROUND
+) -> Optional[str]:
     """
     Generate an AI image using DALL-E based on client data and platform
     
     Args:
         client_data: Client onboarding data
         platform: Target platform for the image
+        use_cache: Serve/store the image URL from the generation cache
+        lane: Scheduler lane, "interactive" when a reviewer is waiting or "background"
     
     Returns:
         Image URL or None if generation fails
     """
     try:
-        client = get_openai_client()
-        
-        # Build image generation prompt
-        company_name = client_data.get('company_name', 'Company')
-        industry = client_data.get('industry', 'Business')
-        brand_tone = client_data.get('brand_tone', 'Professional')
-        target_audience = client_data.get('target_audience', 'General audience')
-        marketing_goals = client_data.get('marketing_goals', 'Brand awareness')
-        
-        # Platform-specific image style guidance
-        platform_styles = {
-            'LinkedIn': 'professional, corporate, business-focused',
-            'Twitter': 'vibrant, engaging, social media optimized',
-            'Instagram': 'aesthetic, visually appealing, modern design',
-            'Facebook': 'friendly, community-oriented, engaging',
-            'Reddit': 'authentic, community-focused, discussion-worthy',
-            'Email': 'clean, professional, email-friendly format',
-            'Website': 'professional, brand-aligned, web-optimized',
-            'YouTube': 'eye-catching thumbnail style, video-friendly'
-        }
-        
-        style_guide = platform_styles.get(platform, 'professional and engaging')
-        
-        prompt = f"""Create a high-quality marketing image for {company_name}, a {industry} company.
-
-Brand Details:
-- Brand Tone: {brand_tone}
-- Target Audience: {target_audience}
-- Marketing Goal: {marketing_goals}
-- Platform: {platform}
-
-Image Requirements:
-- Style: {style_guide}
-- Professional quality, suitable for {platform} marketing
-- Visually appealing and brand-appropriate
-- No text overlays (text will be added separately)
-- High resolution, modern design aesthetic
-
-Create an image that represents {company_name}'s brand identity and appeals to {target_audience}."""
+        prompt = render_image_prompt(client_data, platform)
+        context = _call_context(client_data, "image", f"{platform}:image", lane)
+        cache_key = make_cache_key("image", template_version=PROMPT_TEMPLATE_VERSION, prompt=prompt, **IMAGE_MODEL_PARAMS)
+        if use_cache:
+            cached = await generation_cache.aget(cache_key)
+            if cached is not None:
+                usage_ledger.record(context, IMAGE_MODEL_PARAMS['model'], "image", cache_hit=True)
+                return cached
+        else:
+            generation_cache.record_bypass()
         
-        # Generate image using DALL-E
-        response = client.images.generate(
-            model="dall-e-3",
-            prompt=prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1
-        )
+        response = await _aimage_generation(prompt, context)
         
         if response.data and len(response.data) > 0:
+            await generation_cache.aset(cache_key, response.data[0].url, kind="image", ttl_seconds=IMAGE_CACHE_TTL_SECONDS)
             return response.data[0].url
         else:
             print("No image URL returned from DALL-E")
@@ -407,82 +750,150 @@ Create an image that represents {company_name}'s brand identity and appeals to {
         return None
 
 
-def generate_content_for_all_platforms(client_data: Dict) -> List[Dict]:
+def get_target_platforms(client_data: Dict) -> List[str]:
+    """Parse the client's primary_channels into a list of platform names"""
+    platforms = [p.strip() for p in (client_data.get('primary_channels') or '').split(', ')]
+    platforms = [p for p in platforms if p]
+    if not platforms:
+        platforms = ['LinkedIn', 'Twitter', 'Instagram']  # Default platforms
+    return platforms
+
+
+def _wants_generated_images(client_data: Dict) -> bool:
+    """Check if image generation is requested for this client"""
+    return client_data.get('generate_images', False) or str(client_data.get('generate_images', '')).lower() == 'true'
+
+
+def build_content_item(client_data: Dict, platform: str, content_type: str, content: str) -> Dict:
+    """Build the pending content document for a generated platform post"""
+    content_item = {
+        'platform': platform,
+        'content_type': content_type,
+        'content': content,
+        'client_id': client_data.get('client_id'),
+        'client_name': client_data.get('company_name'),
+        'status': 'pending',
+        'validation': validate_content(platform, content)
+    }
+    
+    # Add uploaded images to content item
+    uploaded_images = client_data.get('images', [])
+    uploaded_image_urls = [img.get('url') for img in uploaded_images if img.get('url')]
+    if uploaded_image_urls:
+        content_item['uploaded_images'] = uploaded_image_urls
+        content_item['has_uploaded_images'] = True
+    
+    return content_item
+
+
+async def generate_content_for_all_platforms_async(
+    client_data: Dict,
+    max_concurrency: Optional[int] = None,
+    on_progress: Optional[Callable[..., Awaitable]] = None,
+    use_cache: bool = True,
+    mode: Optional[str] = None,
+    lane: str = LANE_BACKGROUND
+) -> List[Dict]:
     """
-    Generate content for all platforms specified in client's primary_channels
+    Generate content for all platforms concurrently
+    
+    Text and image requests for every platform are fanned out at once, with at
+    most max_concurrency OpenAI requests in flight. A failure on one platform
+    only drops that platform.
     
     Args:
         client_data: Client onboarding data
+        max_concurrency: Maximum concurrent OpenAI requests (defaults to GENERATION_CONCURRENCY)
+        on_progress: Optional async callback called as on_progress(platform, status, **details)
+            with status "running", "completed" or "failed"
+        use_cache: Serve/store results from the generation cache
+        mode: "per_platform" or "structured" (defaults to the client's generation_mode,
+            then CONTENT_GENERATION_MODE). In structured mode all platform texts come
+            from one completion; platforms that fail validation fall back to per-platform calls.
+        lane: Scheduler lane for every call (background by default)
     
     Returns:
-        List of generated content items
+        List of generated content items, in primary_channels order
     """
-    platforms = client_data.get('primary_channels', '').split(', ')
-    if not platforms or platforms == ['']:
-        platforms = ['LinkedIn', 'Twitter', 'Instagram']  # Default platforms
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or GENERATION_CONCURRENCY))
+    generate_images = _wants_generated_images(client_data)
+    platforms = get_target_platforms(client_data)
+    mode = mode or client_data.get('generation_mode') or CONTENT_GENERATION_MODE
     
-    content_types = {
-        'LinkedIn': 'post',
-        'Twitter': 'post',
-        'Instagram': 'post',
-        'Facebook': 'post',
-        'Reddit': 'post',
-        'Email': 'newsletter',
-        'Website': 'blog',
-        'YouTube': 'video_script'
-    }
+    async def limited(make_coro: Callable[[], Awaitable]):
+        # Create the coroutine only once a slot is free, so cancelling a waiting
+        # task never leaves a coroutine that was never awaited
+        async with semaphore:
+            return await make_coro()
     
-    # Check if image generation is requested
-    generate_images = client_data.get('generate_images', False) or str(client_data.get('generate_images', '')).lower() == 'true'
+    async def report(platform: str, status: str, **details):
+        if on_progress is None:
+            return
+        try:
+            await on_progress(platform, status, **details)
+        except Exception as e:
+            print(f"Warning: progress callback failed for {platform}: {str(e)}")
     
-    # Get uploaded images
-    uploaded_images = client_data.get('images', [])
-    uploaded_image_urls = [img.get('url') for img in uploaded_images if img.get('url')]
+    async def generate_structured() -> Dict[str, str]:
+        try:
+            structured = await limited(lambda: generate_structured_content_async(client_data, platforms, use_cache=use_cache, lane=lane))
+        except Exception as e:
+            print(f"Structured generation failed, falling back to per-platform: {str(e)}")
+            return {}
+        missing = [platform for platform in platforms if platform not in structured]
+        if missing:
+            print(f"Structured generation invalid for {', '.join(missing)}, falling back to per-platform")
+        return structured
     
-    generated_content = []
+    structured_task = None
+    if mode == 'structured' and len(platforms) > 1:
+        structured_task = asyncio.ensure_future(generate_structured())
     
-    for platform in platforms:
-        platform = platform.strip()
-        if not platform:
-            continue
-            
-        content_type = content_types.get(platform, 'post')
+    async def generate_text(platform: str, content_type: str) -> str:
+        if structured_task is not None:
+            structured = await structured_task
+            if platform in structured:
+                return structured[platform]
+        return await limited(lambda: generate_content_async(
+            client_data=client_data,
+            platform=platform,
+            content_type=content_type,
+            use_cache=use_cache,
+            lane=lane
+        ))
+    
+    async def generate_for_platform(platform: str) -> Optional[Dict]:
+        content_type = PLATFORM_CONTENT_TYPES.get(platform, 'post')
+        await report(platform, "running")
+        
+        text_task = asyncio.ensure_future(generate_text(platform, content_type))
+        image_task = None
+        if generate_images:
+            image_task = asyncio.ensure_future(limited(lambda: generate_ai_image_async(client_data, platform, use_cache=use_cache, lane=lane)))
         
         try:
-            content = generate_content(
-                client_data=client_data,
-                platform=platform,
-                content_type=content_type
-            )
-            
-            content_item = {
-                'platform': platform,
-                'content_type': content_type,
-                'content': content,
-                'client_id': client_data.get('client_id'),
-                'client_name': client_data.get('company_name'),
-                'status': 'pending'
-            }
-            
-            # Add uploaded images to content item
-            if uploaded_image_urls:
-                content_item['uploaded_images'] = uploaded_image_urls
-                content_item['has_uploaded_images'] = True
-            
-            # Generate AI image if requested
-            if generate_images:
-                try:
-                    image_url = generate_ai_image(client_data, platform)
-                    if image_url:
-                        content_item['generated_image_url'] = image_url
-                        content_item['has_image'] = True
-                except Exception as e:
-                    print(f"Error generating image for {platform}: {str(e)}")
-                    content_item['has_image'] = False
-            
-            generated_content.append(content_item)
+            content = await text_task
         except Exception as e:
             print(f"Error generating content for {platform}: {str(e)}")
-            continue
+            if image_task is not None:
+                image_task.cancel()
+            await report(platform, "failed", error=str(e))
+            return None
+        
+        content_item = build_content_item(client_data, platform, content_type, content)
+        
+        if image_task is not None:
+            try:
+                image_url = await image_task
+                if image_url:
+                    content_item['generated_image_url'] = image_url
+                    content_item['has_image'] = True
+            except Exception as e:
+                print(f"Error generating image for {platform}: {str(e)}")
+                content_item['has_image'] = False
+        
+        await report(platform, "completed")
+        return content_item
     
-    return generated_content
+    results = await asyncio.gather(*(generate_for_platform(platform) for platform in platforms))
+    return [item for item in results if item is not None]
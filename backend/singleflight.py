@@ -0,0 +1,88 @@
+"""
+In-flight deduplication (singleflight) for identical upstream calls
+Concurrent callers with the same key share one call: the first starts it,
+the rest await its result. The shared call is only cancelled once every
+caller waiting on it has gone away.
+"""
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """
+        Run fn() once for all concurrent callers with the same key
+
+        Args:
+            key: Identity of the call (e.g. a hash of the rendered prompt and parameters)
+            fn: Factory returning the awaitable to run if no identical call is in flight
+
+        Returns:
+            Result of the shared call (exceptions are raised to every caller)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                self.calls += 1
+                flight = _Flight(asyncio.ensure_future(fn()))
+                self._flights[key] = flight
+                flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            else:
+                self.coalesced += 1
+            flight.waiters += 1
+
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            with self._lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0
+            if abandoned and not flight.task.done():
+                flight.task.cancel()
+            raise
+
+    def _forget(self, key: str, flight: _Flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._flights)
+        total = self.calls + self.coalesced
+        return {
+            "name": self.name,
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0
+        }
+
+
+# Shared instances used by services.py
+chat_singleflight = SingleFlight("chat")
+image_singleflight = SingleFlight("images")
+
+
+def get_singleflight_stats() -> Dict:
+    """Coalescing counters for chat and image calls"""
+    return {
+        "chat": chat_singleflight.stats(),
+        "images": image_singleflight.stats()
+    }
@@ -0,0 +1,473 @@
+"""
+Speculative pre-generation during idle capacity
+A background worker watches the rate limiter and scheduler. While there is
+spare headroom it pre-generates drafts: the next post for each active client
+channel, and an alternative for pending items that look likely to be
+rejected. Drafts stay hidden (in their own collection) until a request can
+use one, at which point it is promoted instantly instead of waiting for the
+model. A request claims the drafts it uses and deletes them once its
+content is saved, or hands them back if it fails. Drafts that expire or go
+stale count as wasted tokens and are deleted.
+
+Each tick reads bounded, indexed candidate sets (risky pending items, active
+clients, newest hidden drafts) rather than every client, item and draft.
+"""
+import os
+import uuid
+import asyncio
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from database import get_clients_collection, get_content_collection, get_drafts_collection
+from memory_store import memory_store
+from rate_limiter import chat_rate_limiter
+from scheduler import LANE_BACKGROUND, model_call_scheduler
+from token_counter import count_tokens
+from services import (
+    PLATFORM_CONTENT_TYPES, get_target_platforms, generate_content_async, regenerate_content_async
+)
+
+SPECULATION_ENABLED = os.getenv('SPECULATION_ENABLED', 'false').lower() == 'true'
+SPECULATION_INTERVAL_SECONDS = float(os.getenv('SPECULATION_INTERVAL_SECONDS', '15'))
+# Share of the tokens-per-minute budget that must be free before speculating
+SPECULATION_MIN_HEADROOM = float(os.getenv('SPECULATION_MIN_HEADROOM', '0.5'))
+SPECULATION_MAX_PER_TICK = int(os.getenv('SPECULATION_MAX_PER_TICK', '2'))
+SPECULATION_DRAFT_TTL_SECONDS = int(os.getenv('SPECULATION_DRAFT_TTL_SECONDS', str(24 * 3600)))
+# Clients with content created within this window count as active
+SPECULATION_ACTIVE_DAYS = int(os.getenv('SPECULATION_ACTIVE_DAYS', '7'))
+# Minimum rejection risk score before an alternative is pre-generated
+SPECULATION_RISK_THRESHOLD = int(os.getenv('SPECULATION_RISK_THRESHOLD', '1'))
+# Most pending items / active clients considered per tick
+SPECULATION_CANDIDATE_LIMIT = int(os.getenv('SPECULATION_CANDIDATE_LIMIT', '50'))
+SPECULATION_CLIENT_LIMIT = int(os.getenv('SPECULATION_CLIENT_LIMIT', '50'))
+# Drafts left behind (e.g. by a stopped worker) are removed by a TTL index this long after expiring
+DRAFT_TTL_GRACE_SECONDS = 3600
+# Claimed drafts whose request never confirmed or released them (e.g. a crashed worker) are hidden again after this
+DRAFT_CLAIM_TIMEOUT_SECONDS = 600
+
+KIND_NEXT_POST = 'next_post'
+KIND_ALTERNATIVE = 'alternative'
+
+# Hidden drafts when MongoDB is not connected
+drafts_db: Dict[str, Dict] = {}
+
+
+def rejection_risk(content: Dict) -> int:
+    """
+    Heuristic likelihood that a pending item gets regenerated
+
+    Failing platform validation and earlier regenerations both suggest the
+    reviewer is not happy with it yet.
+    """
+    validation = content.get('validation') or {}
+    risk = 0
+    if validation and not validation.get('valid', True):
+        risk += 2
+    elif validation.get('violations'):
+        risk += 1
+    risk += min(2, content.get('regeneration_count', 0))
+    return risk
+
+
+# Query for pending items with a rejection risk of at least 1 (see rejection_risk)
+RISKY_PENDING_QUERY = {
+    "status": "pending",
+    "$or": [
+        {"validation.valid": False},
+        {"validation.violations.0": {"$exists": True}},
+        {"regeneration_count": {"$gte": 1}}
+    ]
+}
+
+CANDIDATE_PROJECTION = {
+    "_id": 0, "id": 1, "client_id": 1, "platform": 1, "content_type": 1, "content": 1,
+    "validation": 1, "regeneration_count": 1, "created_at": 1
+}
+
+
+def _matches(draft: Dict, query: Dict) -> bool:
+    return all(draft.get(key) == value for key, value in query.items())
+
+
+def _draft_scan_limit() -> int:
+    """Most drafts the worker keeps: one alternative per candidate plus one next post per active channel"""
+    return SPECULATION_CANDIDATE_LIMIT + SPECULATION_CLIENT_LIMIT * len(PLATFORM_CONTENT_TYPES)
+
+
+class SpeculativeGenerator:
+    """Background worker that pre-generates hidden drafts while capacity is idle"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {
+            "drafts_generated": 0,
+            "drafts_promoted": 0,
+            "drafts_wasted": 0,
+            "hits": 0,
+            "misses": 0,
+            "tokens_generated": 0,
+            "tokens_promoted": 0,
+            "tokens_wasted": 0,
+            "idle_ticks": 0,
+            "busy_ticks": 0,
+            "errors": 0
+        }
+
+    # Draft storage (MongoDB when connected, otherwise in memory)
+
+    async def _store(self, draft: Dict):
+        collection = get_drafts_collection()
+        if collection is not None:
+            # TTL index backstop (db_indexes.py); _expire normally deletes it first
+            expires_at = datetime.now() + timedelta(seconds=SPECULATION_DRAFT_TTL_SECONDS + DRAFT_TTL_GRACE_SECONDS)
+            await collection.insert_one({**draft, "expires_at": expires_at})
+        else:
+            drafts_db[draft["id"]] = draft
+
+    async def _find_hidden(self, query: Dict) -> List[Dict]:
+        """Newest hidden drafts without their text (only _claim needs it), at most _draft_scan_limit()"""
+        query = {**query, "status": "hidden"}
+        limit = _draft_scan_limit()
+        collection = get_drafts_collection()
+        if collection is not None:
+            cursor = collection.find(query, {"_id": 0, "content": 0}).sort("created_at", -1).limit(limit)
+            return await cursor.to_list(length=limit)
+        drafts = sorted((d for d in drafts_db.values() if _matches(d, query)), key=lambda d: d["created_at"], reverse=True)
+        return drafts[:limit]
+
+    async def _claim(self, query: Dict) -> Optional[Dict]:
+        """Atomically mark one hidden draft claimed (see confirm/release)"""
+        query = {**query, "status": "hidden"}
+        claim = {"status": "claimed", "claimed_at": datetime.now().isoformat()}
+        collection = get_drafts_collection()
+        if collection is not None:
+            return await collection.find_one_and_update(
+                query, {"$set": claim}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+        draft = next((d for d in drafts_db.values() if _matches(d, query)), None)
+        if draft is not None:
+            draft.update(claim)
+        return draft
+
+    async def confirm(self, drafts: List[Dict]):
+        """Delete claimed drafts once the content made from them is saved"""
+        if not drafts:
+            return
+        ids = [draft["id"] for draft in drafts]
+        collection = get_drafts_collection()
+        if collection is not None:
+            await collection.delete_many({"id": {"$in": ids}, "status": "claimed"})
+        else:
+            for draft_id in ids:
+                drafts_db.pop(draft_id, None)
+        for draft in drafts:
+            self.counters["drafts_promoted"] += 1
+            self.counters["tokens_promoted"] += draft.get("tokens", 0)
+
+    async def release(self, drafts: List[Dict]):
+        """Hide claimed drafts again when the request that took them failed"""
+        if not drafts:
+            return
+        ids = [draft["id"] for draft in drafts]
+        collection = get_drafts_collection()
+        if collection is not None:
+            await collection.update_many(
+                {"id": {"$in": ids}, "status": "claimed"},
+                {"$set": {"status": "hidden"}, "$unset": {"claimed_at": ""}}
+            )
+        else:
+            for draft_id in ids:
+                draft = drafts_db.get(draft_id)
+                if draft is not None and draft["status"] == "claimed":
+                    draft["status"] = "hidden"
+                    draft.pop("claimed_at", None)
+
+    async def _discard(self, drafts: List[Dict]):
+        """Delete expired/stale hidden drafts and count their tokens as wasted"""
+        if not drafts:
+            return
+        ids = [draft["id"] for draft in drafts]
+        collection = get_drafts_collection()
+        if collection is not None:
+            await collection.delete_many({"id": {"$in": ids}, "status": "hidden"})
+        else:
+            for draft_id in ids:
+                if drafts_db.get(draft_id, {}).get("status") == "hidden":
+                    del drafts_db[draft_id]
+        for draft in drafts:
+            self.counters["drafts_wasted"] += 1
+            self.counters["tokens_wasted"] += draft.get("tokens", 0)
+
+    async def _expire(self):
+        """Discard the oldest expired drafts and release abandoned claims"""
+        cutoff = (datetime.now() - timedelta(seconds=SPECULATION_DRAFT_TTL_SECONDS)).isoformat()
+        claim_cutoff = (datetime.now() - timedelta(seconds=DRAFT_CLAIM_TIMEOUT_SECONDS)).isoformat()
+        limit = _draft_scan_limit()
+        collection = get_drafts_collection()
+        if collection is not None:
+            cursor = collection.find(
+                {"status": "hidden", "created_at": {"$lt": cutoff}}, {"_id": 0, "id": 1, "tokens": 1}
+            ).sort("created_at", 1).limit(limit)
+            expired = await cursor.to_list(length=limit)
+            await collection.update_many(
+                {"status": "claimed", "claimed_at": {"$lt": claim_cutoff}},
+                {"$set": {"status": "hidden"}, "$unset": {"claimed_at": ""}}
+            )
+        else:
+            expired = sorted(
+                (d for d in drafts_db.values() if d["status"] == "hidden" and d["created_at"] < cutoff),
+                key=lambda d: d["created_at"]
+            )[:limit]
+            await self.release([d for d in drafts_db.values() if d["status"] == "claimed" and d["claimed_at"] < claim_cutoff])
+        await self._discard(expired)
+
+    # Candidate reads (bounded and index-backed)
+
+    async def _risky_pending(self, exclude_ids: List[str]) -> List[Dict]:
+        """Newest pending items likely to be rejected, skipping those that already have an alternative"""
+        limit = SPECULATION_CANDIDATE_LIMIT
+        collection = get_content_collection()
+        if collection is not None:
+            query = dict(RISKY_PENDING_QUERY) if SPECULATION_RISK_THRESHOLD > 0 else {"status": "pending"}
+            if exclude_ids:
+                query["id"] = {"$nin": exclude_ids}
+            cursor = collection.find(query, CANDIDATE_PROJECTION).sort("created_at", -1).limit(limit)
+            items = await cursor.to_list(length=limit)
+        else:
+            excluded = set(exclude_ids)
+            items = memory_store.content.find(
+                {"status": "pending"},
+                limit=limit,
+                where=lambda item: item.get("id") not in excluded and rejection_risk(item) >= SPECULATION_RISK_THRESHOLD
+            )
+        return [item for item in items if rejection_risk(item) >= SPECULATION_RISK_THRESHOLD]
+
+    async def _current_pending_text(self, content_ids: List[str]) -> Dict[str, str]:
+        """id -> text of the given items that are still pending"""
+        if not content_ids:
+            return {}
+        collection = get_content_collection()
+        if collection is not None:
+            cursor = collection.find({"id": {"$in": content_ids}, "status": "pending"}, {"_id": 0, "id": 1, "content": 1})
+            items = await cursor.to_list(length=len(content_ids))
+        else:
+            items = memory_store.content.find({"id": {"$in": content_ids}, "status": "pending"})
+        return {item["id"]: item.get("content") for item in items}
+
+    async def _clients(self, client_ids: List[str], active_since: str) -> Tuple[Dict[str, Dict], Set[str]]:
+        """
+        Clients that own the given items or are active
+
+        Returns:
+            (client_id -> client, ids of active clients: recently onboarded
+            or with recent pending content)
+        """
+        limit = SPECULATION_CLIENT_LIMIT
+        content_collection = get_content_collection()
+        clients_collection = get_clients_collection()
+        # Owners of the newest pending items (not every recent item)
+        if clients_collection is not None and content_collection is not None:
+            cursor = content_collection.find(
+                {"status": "pending", "created_at": {"$gte": active_since}}, {"_id": 0, "client_id": 1}
+            ).sort("created_at", -1).limit(SPECULATION_CANDIDATE_LIMIT)
+            recent_pending = {item.get("client_id") for item in await cursor.to_list(length=SPECULATION_CANDIDATE_LIMIT)}
+            cursor = clients_collection.find(
+                {"$or": [
+                    {"client_id": {"$in": sorted(recent_pending | set(client_ids))}},
+                    {"onboarded_at": {"$gte": active_since}}
+                ]},
+                {"_id": 0}
+            ).sort("onboarded_at", -1).limit(limit + len(client_ids))
+            clients = await cursor.to_list(length=limit + len(client_ids))
+        else:
+            recent_pending = {
+                item.get("client_id")
+                for item in memory_store.content.find({"status": "pending"}, limit=SPECULATION_CANDIDATE_LIMIT, since=active_since)
+            }
+            clients = memory_store.clients.find({"client_id": {"$in": sorted(recent_pending | set(client_ids))}}, limit=limit + len(client_ids))
+            clients += memory_store.clients.find(limit=limit, since=active_since)
+        by_id = {client["client_id"]: client for client in clients if client.get("client_id")}
+        active = {
+            client_id for client_id, client in by_id.items()
+            if client_id in recent_pending or (client.get("onboarded_at") or '') >= active_since
+        }
+        return by_id, active
+
+    # Promotion
+
+    async def take_alternative(self, content_id: str, current_content: str) -> Optional[Dict]:
+        """
+        Claim a pre-generated alternative for a content item, if one matches its current text
+
+        The caller confirms the draft once the new text is saved, or releases it.
+
+        Returns:
+            The claimed draft (its text is draft["content"]), or None (a miss)
+        """
+        if not SPECULATION_ENABLED:
+            return None
+        stale = [
+            draft for draft in await self._find_hidden({"kind": KIND_ALTERNATIVE, "content_id": content_id})
+            if draft.get("source_content") != current_content
+        ]
+        await self._discard(stale)
+
+        draft = await self._claim({"kind": KIND_ALTERNATIVE, "content_id": content_id, "source_content": current_content})
+        self.counters["hits" if draft else "misses"] += 1
+        return draft
+
+    async def take_next_posts(self, client_id: str, platforms: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Claim pre-generated next posts for a client
+
+        The caller confirms the drafts once their content is saved, or releases them.
+
+        Args:
+            client_id: Client to take drafts for
+            platforms: Platforms wanted (all of the client's drafts if None)
+
+        Returns:
+            Claimed drafts; platforms without a draft count as misses
+        """
+        if not SPECULATION_ENABLED:
+            return []
+        if platforms is None:
+            platforms = sorted({draft["platform"] for draft in await self._find_hidden({"kind": KIND_NEXT_POST, "client_id": client_id})})
+        claimed = []
+        for platform in platforms:
+            draft = await self._claim({"kind": KIND_NEXT_POST, "client_id": client_id, "platform": platform})
+            self.counters["hits" if draft else "misses"] += 1
+            if draft:
+                claimed.append(draft)
+        return claimed
+
+    # Worker
+
+    async def is_idle(self) -> bool:
+        """True when the rate limiter has spare headroom and nothing is queued"""
+        headroom = await chat_rate_limiter.headroom()
+        if headroom["available_tokens"] < SPECULATION_MIN_HEADROOM * headroom["tokens_per_minute"]:
+            return False
+        scheduler = model_call_scheduler.stats()
+        if any(lane["queue_depth"] for lane in scheduler["lanes"].values()):
+            return False
+        return scheduler["in_flight"] < max(1, scheduler["max_concurrency"] // 2)
+
+    async def _save_draft(self, kind: str, client: Dict, platform: str, content_type: str, content: str, **fields):
+        tokens = count_tokens(content)
+        await self._store({
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "client_id": client.get("client_id"),
+            "platform": platform,
+            "content_type": content_type,
+            "content": content,
+            "tokens": tokens,
+            "status": "hidden",
+            "created_at": datetime.now().isoformat(),
+            **fields
+        })
+        self.counters["drafts_generated"] += 1
+        self.counters["tokens_generated"] += tokens
+
+    async def _plan(self) -> List[Callable[[], Awaitable]]:
+        """Pending work, most valuable first: alternatives for risky items, then next posts"""
+        hidden = await self._find_hidden({})
+
+        # Alternatives for items that were approved, deleted or edited since can never be used
+        alternatives = [draft for draft in hidden if draft["kind"] == KIND_ALTERNATIVE]
+        current = await self._current_pending_text(sorted({draft.get("content_id") for draft in alternatives}))
+        stale = [draft for draft in alternatives if current.get(draft.get("content_id")) != draft.get("source_content")]
+        await self._discard(stale)
+        stale_ids = {draft["id"] for draft in stale}
+        hidden = [draft for draft in hidden if draft["id"] not in stale_ids]
+
+        covered_items = {draft.get("content_id") for draft in hidden if draft["kind"] == KIND_ALTERNATIVE}
+        covered_channels = {(draft["client_id"], draft["platform"]) for draft in hidden if draft["kind"] == KIND_NEXT_POST}
+
+        pending = await self._risky_pending(sorted(covered_items))
+        active_since = (datetime.now() - timedelta(days=SPECULATION_ACTIVE_DAYS)).isoformat()
+        clients, active_clients = await self._clients(sorted({item.get("client_id") for item in pending if item.get("client_id")}), active_since)
+
+        work = []
+        risky = sorted((item for item in pending if item.get("client_id") in clients), key=rejection_risk, reverse=True)
+        for item in risky:
+            work.append(lambda item=item: self._generate_alternative(clients[item["client_id"]], item))
+
+        for client_id in sorted(active_clients)[:SPECULATION_CLIENT_LIMIT]:
+            for platform in get_target_platforms(clients[client_id]):
+                if (client_id, platform) not in covered_channels:
+                    work.append(lambda client=clients[client_id], platform=platform: self._generate_next_post(client, platform))
+        return work
+
+    async def _generate_alternative(self, client: Dict, item: Dict):
+        alternative = await regenerate_content_async(
+            client, item["platform"], item.get("content_type", "post"), item["content"], lane=LANE_BACKGROUND
+        )
+        await self._save_draft(
+            KIND_ALTERNATIVE, client, item["platform"], item.get("content_type", "post"), alternative,
+            content_id=item["id"], source_content=item["content"]
+        )
+
+    async def _generate_next_post(self, client: Dict, platform: str):
+        content_type = PLATFORM_CONTENT_TYPES.get(platform, 'post')
+        # Bypass the cache: the cached post for this prompt is the one the client already has
+        content = await generate_content_async(client, platform, content_type, use_cache=False, lane=LANE_BACKGROUND)
+        await self._save_draft(KIND_NEXT_POST, client, platform, content_type, content)
+
+    async def tick(self):
+        """Expire old drafts and, if capacity is idle, generate up to SPECULATION_MAX_PER_TICK drafts"""
+        await self._expire()
+        if not await self.is_idle():
+            self.counters["busy_ticks"] += 1
+            return
+        self.counters["idle_ticks"] += 1
+        for job in (await self._plan())[:SPECULATION_MAX_PER_TICK]:
+            if not await self.is_idle():
+                break
+            try:
+                await job()
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"⚠️ Warning: Speculative generation failed: {str(e)}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"⚠️ Warning: Speculation worker error: {str(e)}")
+            await asyncio.sleep(SPECULATION_INTERVAL_SECONDS)
+
+    def start(self):
+        """Start the worker (no-op unless SPECULATION_ENABLED)"""
+        if SPECULATION_ENABLED and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def stats(self) -> Dict:
+        """Hit rate and generated/promoted/wasted token counts"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        settled = self.counters["tokens_promoted"] + self.counters["tokens_wasted"]
+        return {
+            "enabled": SPECULATION_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "idle": await self.is_idle(),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            # Share of settled (promoted or discarded) draft tokens that were thrown away
+            "waste_rate": round(self.counters["tokens_wasted"] / settled, 4) if settled else 0.0,
+            **self.counters
+        }
+
+
+# Shared worker started by main.py
+speculative_generator = SpeculativeGenerator()
@@ -0,0 +1,219 @@
+"""
+Incrementally maintained dashboard counters
+Client, content-by-status and campaign-by-status counts live in a single
+counters document. Every state transition (create, approve, delete, status
+edit) applies an atomic $inc to it, so the dashboard reads one document by
+_id instead of counting collections. A periodic reconcile recounts
+everything in one aggregation ($unionWith + $facet) and corrects any drift,
+e.g. from writes made outside the API.
+"""
+import os
+import asyncio
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from database import get_database, get_counters_collection
+
+# Seconds between full recounts (0 disables the periodic reconcile)
+STATS_RECONCILE_SECONDS = float(os.getenv('STATS_RECONCILE_SECONDS', '900'))
+
+COUNTERS_ID = "dashboard"
+
+
+def _status(value: Optional[str]) -> str:
+    return value or "unknown"
+
+
+def _empty() -> Dict:
+    return {"clients": 0, "content": {}, "campaigns": {}}
+
+
+class StatsCounters:
+    """Dashboard counters updated with $inc and reconciled by a single aggregation"""
+
+    def __init__(self):
+        self._memory = _empty()
+        self._memory_source: Optional[Callable[[], Dict]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.increments = 0
+        self.increment_errors = 0
+        self.reconciles = 0
+        self.last_reconciled_at: Optional[str] = None
+        self.last_drift: Dict = {}
+
+    async def _inc(self, changes: Dict[str, int]):
+        changes = {key: value for key, value in changes.items() if value}
+        if not changes:
+            return
+        collection = get_counters_collection()
+        self.increments += 1
+        if collection is None:
+            for key, value in changes.items():
+                if key == "clients":
+                    self._memory["clients"] += value
+                else:
+                    group, status = key.split(".", 1)
+                    self._memory[group][status] = self._memory[group].get(status, 0) + value
+            return
+        try:
+            await collection.update_one(
+                {"_id": COUNTERS_ID},
+                {"$inc": changes, "$set": {"updated_at": datetime.now().isoformat()}},
+                upsert=True
+            )
+        except Exception as e:
+            # The next reconcile repairs the count
+            self.increment_errors += 1
+            print(f"⚠️ Warning: Could not update dashboard counters: {str(e)}")
+
+    async def client_added(self, count: int = 1):
+        await self._inc({"clients": count})
+
+    async def content_transition(self, old_status: Optional[str], new_status: Optional[str], count: int = 1):
+        """
+        Move content between status counters
+
+        Args:
+            old_status: Previous status (None for newly created items)
+            new_status: New status (None for deleted items)
+            count: Number of items that made this transition
+        """
+        await self._transition("content", old_status, new_status, count)
+
+    async def campaign_transition(self, old_status: Optional[str], new_status: Optional[str], count: int = 1):
+        """Move campaigns between status counters (None = created / deleted)"""
+        await self._transition("campaigns", old_status, new_status, count)
+
+    async def _transition(self, group: str, old_status: Optional[str], new_status: Optional[str], count: int):
+        if count <= 0 or (old_status is not None and new_status is not None and old_status == new_status):
+            return
+        changes = {}
+        if old_status is not None:
+            changes[f"{group}.{_status(old_status)}"] = -count
+        if new_status is not None:
+            changes[f"{group}.{_status(new_status)}"] = count
+        await self._inc(changes)
+
+    async def _recount(self) -> Dict:
+        """Exact counts from the collections in one aggregation (or from memory)"""
+        db = get_database()
+        if db is None:
+            return self._memory_source() if self._memory_source else _empty()
+
+        def tagged(kind):
+            return [{"$project": {"_id": 0, "kind": {"$literal": kind}, "status": 1}}]
+
+        pipeline = tagged("clients") + [
+            {"$unionWith": {"coll": "content", "pipeline": tagged("content")}},
+            {"$unionWith": {"coll": "campaigns", "pipeline": tagged("campaigns")}},
+            {"$facet": {
+                "clients": [{"$match": {"kind": "clients"}}, {"$count": "n"}],
+                "content": [{"$match": {"kind": "content"}}, {"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+                "campaigns": [{"$match": {"kind": "campaigns"}}, {"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+            }}
+        ]
+        result = await db.clients.aggregate(pipeline).to_list(length=1)
+        facets = result[0] if result else {}
+        counts = _empty()
+        counts["clients"] = facets.get("clients", [{}])[0].get("n", 0) if facets.get("clients") else 0
+        for group in ("content", "campaigns"):
+            counts[group] = {_status(row["_id"]): row["n"] for row in facets.get(group, [])}
+        return counts
+
+    @staticmethod
+    def _drift(stored: Dict, actual: Dict) -> Dict:
+        drift = {}
+        if stored.get("clients", 0) != actual["clients"]:
+            drift["clients"] = actual["clients"] - stored.get("clients", 0)
+        for group in ("content", "campaigns"):
+            stored_group = stored.get(group) or {}
+            for status in set(stored_group) | set(actual[group]):
+                delta = actual[group].get(status, 0) - stored_group.get(status, 0)
+                if delta:
+                    drift[f"{group}.{status}"] = delta
+        return drift
+
+    async def reconcile(self) -> Dict:
+        """
+        Recount everything and overwrite the counters
+
+        Returns:
+            The drift that was corrected ({"content.pending": -2, ...})
+        """
+        actual = await self._recount()
+        collection = get_counters_collection()
+        now = datetime.now().isoformat()
+        if collection is None:
+            stored = self._memory
+            self._memory = actual
+        else:
+            stored = await collection.find_one({"_id": COUNTERS_ID})
+            # An $inc racing this write can be lost or counted twice; the next
+            # reconcile corrects it
+            await collection.update_one(
+                {"_id": COUNTERS_ID},
+                {"$set": {**actual, "reconciled_at": now, "updated_at": now}},
+                upsert=True
+            )
+        # The first count is not drift
+        drift = self._drift(stored, actual) if stored is not None else {}
+        self.reconciles += 1
+        self.last_reconciled_at = now
+        self.last_drift = drift
+        if drift:
+            print(f"⚠️ Warning: Dashboard counters drifted, corrected: {drift}")
+        return drift
+
+    async def get(self) -> Dict:
+        """Current counters (one read by _id; recounted first if the document does not exist yet)"""
+        collection = get_counters_collection()
+        if collection is None:
+            return {**self._memory, "reconciled_at": self.last_reconciled_at}
+        counters = await collection.find_one({"_id": COUNTERS_ID})
+        if counters is None:
+            await self.reconcile()
+            counters = await collection.find_one({"_id": COUNTERS_ID}) or _empty()
+        counters.pop("_id", None)
+        return counters
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                print(f"⚠️ Warning: Could not reconcile dashboard counters: {str(e)}")
+            await asyncio.sleep(STATS_RECONCILE_SECONDS)
+
+    def start(self, memory_source: Callable[[], Dict]):
+        """
+        Start the periodic reconcile (the first one runs immediately)
+
+        Args:
+            memory_source: Returns exact counts for the in-memory fallback,
+                {"clients": n, "content": {status: n}, "campaigns": {status: n}}
+        """
+        self._memory_source = memory_source
+        if STATS_RECONCILE_SECONDS > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "reconcile_seconds": STATS_RECONCILE_SECONDS,
+            "increments": self.increments,
+            "increment_errors": self.increment_errors,
+            "reconciles": self.reconciles,
+            "last_reconciled_at": self.last_reconciled_at,
+            "last_drift": self.last_drift
+        }
+
+
+# Shared counters used by main.py and content_batch.py
+stats_counters = StatsCounters()
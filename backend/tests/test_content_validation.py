@@ -0,0 +1,76 @@
+from content_validation import auto_fix_content, check_for_approval, find_violations, validate_content
+
+
+def _rules(platform, content):
+    return {v["rule"] for v in find_violations(platform, content)}
+
+
+def test_clean_post_is_valid():
+    result = validate_content('Twitter', 'Launching our new planner today. #productivity')
+    assert result["valid"] is True
+    assert result["violations"] == []
+
+
+def test_empty_content_is_an_unfixable_error():
+    [violation] = find_violations('Twitter', '   ')
+    assert violation["rule"] == "empty"
+    assert violation["fixable"] is False
+    assert auto_fix_content('Twitter', '   ')[1] == []
+
+
+def test_overlong_tweet_is_an_error():
+    result = validate_content('Twitter', 'word ' * 100)
+    assert result["valid"] is False
+    assert [v["rule"] for v in result["violations"]] == ["length"]
+
+
+def test_soft_limit_is_only_a_warning():
+    result = validate_content('Facebook', 'x' * 6000)
+    assert result["valid"] is True
+    assert result["violations"][0]["severity"] == "warning"
+
+
+def test_auto_fix_trims_to_the_limit_and_keeps_hashtags():
+    content = 'Big news from the team. ' * 20 + '#launch'
+    fixed, applied = auto_fix_content('Twitter', content)
+    assert applied == ["length"]
+    assert len(fixed) <= 280
+    assert fixed.endswith('#launch')
+    assert validate_content('Twitter', fixed)["valid"] is True
+
+
+def test_auto_fix_removes_preamble_forbidden_phrases_and_extra_hashtags():
+    content = "Here is the post:\nWe ship today. As an AI I love it. Try it now. #a #b #c #d #e"
+    assert _rules('Twitter', content) == {"preamble", "forbidden_phrase", "hashtags"}
+    fixed, applied = auto_fix_content('Twitter', content)
+    assert applied == ["preamble", "forbidden_phrase", "hashtags"]
+    assert not fixed.lower().startswith('here is')
+    assert 'as an ai' not in fixed.lower()
+    assert 'Try it now.' in fixed
+    assert fixed.count('#') == 3
+    assert find_violations('Twitter', fixed) == []
+
+
+def test_reddit_title_is_extracted_without_repeating_text():
+    content = 'A' * 350 + ' and the rest of the story.'
+    assert "title_length" in _rules('Reddit', content)
+    fixed, applied = auto_fix_content('Reddit', content)
+    assert "title" in applied
+    title, body = fixed.split('\n', 1)
+    assert len(title) <= 300
+    assert validate_content('Reddit', fixed)["valid"] is True
+    assert fixed.count('and the rest of the story.') == 1
+
+
+def test_check_for_approval_fixes_only_when_needed():
+    text, fixes, validation = check_for_approval('Twitter', 'Short and sweet.')
+    assert (text, fixes, validation["valid"]) == ('Short and sweet.', [], True)
+
+    text, fixes, validation = check_for_approval('Twitter', 'word ' * 100)
+    assert fixes == ["length"]
+    assert validation["valid"] is True
+
+    text, fixes, validation = check_for_approval('Twitter', 'word ' * 100, auto_fix=False)
+    assert text == 'word ' * 100
+    assert fixes == []
+    assert validation["valid"] is False
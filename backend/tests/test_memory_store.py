@@ -0,0 +1,96 @@
+import pytest
+
+from memory_store import DuplicateKey, MemoryCollection
+
+
+def _collection(count=10):
+    content = MemoryCollection("content", "id", "created_at", ("status", "client_id"))
+    for i in range(count):
+        content.insert_one({
+            "id": f"c{i}",
+            "created_at": f"2025-01-{i + 1:02d}",
+            "status": "pending" if i % 2 else "approved",
+            "client_id": f"client-{i % 3}",
+        })
+    return content
+
+
+def _assert_indexes_consistent(collection):
+    """Every index holds exactly the keys a full scan of the documents would give"""
+    documents = list(collection._docs.values())
+    assert collection._order == sorted(collection._key(document) for document in documents)
+    for field in collection.index_fields:
+        expected = {}
+        for document in documents:
+            expected.setdefault(document.get(field), []).append(collection._key(document))
+        assert collection._indexes[field] == {value: sorted(keys) for value, keys in expected.items()}
+
+
+def test_update_one_moves_the_document_between_index_buckets():
+    content = _collection()
+    content.update_one({"id": "c1"}, {"status": "approved", "client_id": "client-9"})
+    _assert_indexes_consistent(content)
+    assert content.count_documents({"status": "pending"}) == 4
+    assert [d["id"] for d in content.find({"client_id": "client-9"})] == ["c1"]
+
+
+def test_update_of_the_sort_field_reorders():
+    content = _collection()
+    content.update_one({"id": "c0"}, {"created_at": "2025-02-01"})
+    _assert_indexes_consistent(content)
+    assert content.find({}, limit=1)[0]["id"] == "c0"
+
+
+def test_update_of_a_plain_field_keeps_indexes():
+    content = _collection()
+    content.update_one({"id": "c3"}, {"content": "new body"})
+    _assert_indexes_consistent(content)
+    assert content.find_one({"id": "c3"})["content"] == "new body"
+
+
+def test_update_many_and_delete_many_keep_indexes_consistent():
+    content = _collection()
+    updated = content.update_many({"status": "pending"}, {"status": "scheduled"})
+    assert len(updated) == 5
+    _assert_indexes_consistent(content)
+
+    deleted = content.delete_many({"client_id": {"$in": ["client-0", "client-1"]}})
+    assert {d["client_id"] for d in deleted} == {"client-0", "client-1"}
+    _assert_indexes_consistent(content)
+    assert len(content) == 10 - len(deleted)
+    assert "client-0" not in content._indexes["client_id"]
+    assert content.count_documents({"client_id": "client-0"}) == 0
+    assert all(d["client_id"] == "client-2" for d in content.find())
+
+
+def test_delete_one_then_reinsert():
+    content = _collection()
+    content.delete_one({"id": "c4"})
+    _assert_indexes_consistent(content)
+    assert content.find_one({"id": "c4"}) is None
+    content.insert_one({"id": "c4", "created_at": "2025-03-01", "status": "pending", "client_id": "client-1"})
+    _assert_indexes_consistent(content)
+
+
+def test_primary_key_cannot_change_or_repeat():
+    content = _collection()
+    with pytest.raises(ValueError):
+        content.update_one({"id": "c1"}, {"id": "c2"})
+    with pytest.raises(DuplicateKey):
+        content.insert_one({"id": "c1", "created_at": "2025-04-01"})
+    _assert_indexes_consistent(content)
+
+
+def test_pages_cover_every_match_once_after_updates():
+    content = _collection(25)
+    content.update_many({"client_id": "client-1"}, {"status": "pending"})
+    expected = [d["id"] for d in content.find({"status": "pending"})]
+
+    seen, cursor = [], None
+    while True:
+        page = content.page({"status": "pending"}, cursor=cursor, limit=4)
+        seen.extend(d["id"] for d in page["items"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+    assert seen == expected
@@ -0,0 +1,41 @@
+import pytest
+
+from pagination import PAGE_SIZE_MAX, InvalidCursor, decode_cursor, encode_cursor, keyset_query, page_size
+
+
+@pytest.mark.parametrize("sort_value, id_value", [
+    ("2025-01-02T03:04:05.123456", "abc-123"),
+    ("", ""),
+    (None, "only-id"),
+    ("ünïcödé ✓", "id/with+chars="),
+    (1700000000, 42),
+])
+def test_cursor_round_trip(sort_value, id_value):
+    cursor = encode_cursor(sort_value, id_value)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (sort_value, id_value)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", "!!!!", encode_cursor("a", "b")[:-3]])
+def test_foreign_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_keyset_query_continues_after_the_cursor():
+    cursor = encode_cursor("2025-01-02", "id-5")
+    assert keyset_query({"status": "pending"}, "created_at", "id", cursor) == {"$and": [
+        {"status": "pending"},
+        {"$or": [
+            {"created_at": {"$lt": "2025-01-02"}},
+            {"created_at": "2025-01-02", "id": {"$lt": "id-5"}}
+        ]}
+    ]}
+    assert keyset_query({"status": "pending"}, "created_at", "id", None) == {"status": "pending"}
+
+
+def test_page_size_is_clamped():
+    assert page_size(None) >= 1
+    assert page_size(-5) == 1
+    assert page_size(10) == 10
+    assert page_size(10 ** 6) == PAGE_SIZE_MAX
@@ -0,0 +1,62 @@
+import pytest
+
+from projections import (
+    PREVIEW_CHARS, InvalidProjection, build_projection, finish_document, parse_fields, project_document
+)
+
+
+def test_parse_fields_rejects_malformed_names():
+    assert parse_fields('id, status,,platform') == ['id', 'status', 'platform']
+    assert parse_fields(None) is None
+    with pytest.raises(InvalidProjection):
+        parse_fields('id,$where')
+    with pytest.raises(InvalidProjection):
+        parse_fields('posting_result..url')
+
+
+@pytest.mark.parametrize("fields", [
+    ['posting_result', 'posting_result.url'],
+    ['a.b.c', 'a.b'],
+    ['created_at.date'],
+])
+def test_overlapping_paths_are_rejected(fields):
+    with pytest.raises(InvalidProjection):
+        build_projection('content', None, fields, ['created_at', 'id'])
+
+
+def test_sibling_paths_with_a_shared_prefix_are_allowed():
+    projection = build_projection('content', None, ['status', 'status_note', 'posting_result.url'], ['created_at', 'id'])
+    assert projection == {
+        "_id": 0, "status": 1, "status_note": 1, "posting_result.url": 1, "created_at": 1, "id": 1
+    }
+
+
+def test_unknown_view_is_rejected():
+    with pytest.raises(InvalidProjection):
+        build_projection('content', 'compact', None, ['created_at', 'id'])
+    assert build_projection('content', 'full', None, ['created_at', 'id']) is None
+
+
+def test_requested_preview_is_computed_like_the_summary_view():
+    summary = build_projection('content', 'summary', None, ['created_at', 'id'])
+    explicit = build_projection('content', None, ['preview', 'content_length'], ['created_at', 'id'])
+    assert explicit["preview"] == summary["preview"]
+    assert explicit["content_length"] == summary["content_length"]
+
+
+def test_in_memory_projection_matches_the_requested_shape():
+    document = {
+        "id": "c1", "created_at": "2025-01-01", "content": "word " * 100, "candidates": [{}, {}],
+        "posting_result": {"url": "https://example.com/p/1", "raw": "x" * 1000},
+    }
+    projection = build_projection('content', None, ['preview', 'posting_result.url'], ['created_at', 'id'])
+    projected = finish_document(project_document('content', document, projection))
+    assert set(projected) == {"id", "created_at", "preview", "preview_truncated", "posting_result"}
+    assert projected["posting_result"] == {"url": "https://example.com/p/1"}
+    assert projected["preview_truncated"] is True
+    assert len(projected["preview"]) <= PREVIEW_CHARS + 1
+
+    summary = project_document('content', document, build_projection('content', 'summary', None, ['created_at', 'id']))
+    assert "content" not in summary
+    assert summary["content_length"] == 500
+    assert summary["candidate_count"] == 2
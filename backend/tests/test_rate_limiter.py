@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import TokenBucketRateLimiter, _refill, _try_consume
+
+
+def _state(requests, tokens, updated_at=0.0):
+    return {'requests': float(requests), 'tokens': float(tokens), 'updated_at': updated_at}
+
+
+def test_refill_is_proportional_to_elapsed_time():
+    state = _refill(_state(0, 0), rpm=60, tpm=6000, now=30.0)
+    assert state['requests'] == pytest.approx(30)
+    assert state['tokens'] == pytest.approx(3000)
+    assert state['updated_at'] == 30.0
+
+
+def test_refill_is_capped_at_the_bucket_size():
+    state = _refill(_state(50, 5000), rpm=60, tpm=6000, now=600.0)
+    assert state['requests'] == 60
+    assert state['tokens'] == 6000
+
+
+def test_refill_ignores_clock_going_backwards():
+    state = _refill(_state(10, 100, updated_at=50.0), rpm=60, tpm=6000, now=40.0)
+    assert state['requests'] == 10
+    assert state['tokens'] == 100
+
+
+def test_consume_takes_a_request_and_tokens():
+    state = _state(10, 1000, updated_at=5.0)
+    assert _try_consume(state, rpm=60, tpm=6000, tokens=400, now=5.0) == 0.0
+    assert state['requests'] == 9
+    assert state['tokens'] == 600
+
+
+def test_consume_returns_the_wait_until_tokens_refill():
+    state = _state(10, 100, updated_at=5.0)
+    wait = _try_consume(state, rpm=60, tpm=6000, tokens=400, now=5.0)
+    # 300 missing tokens at 100 tokens/second
+    assert wait == pytest.approx(3.0)
+    assert state['requests'] == 10
+    assert state['tokens'] == 100
+
+
+def test_settle_refunds_unused_tokens():
+    async def run():
+        limiter = TokenBucketRateLimiter('test', requests_per_minute=600, tokens_per_minute=10000, backend='memory')
+        await limiter.acquire(4000)
+        after_acquire = (await limiter.headroom())['available_tokens']
+        await limiter.settle(4000, 1000)
+        after_settle = (await limiter.headroom())['available_tokens']
+        return after_acquire, after_settle
+
+    after_acquire, after_settle = asyncio.run(run())
+    assert 6000 <= after_acquire < 6100
+    assert after_settle - after_acquire == pytest.approx(3000, abs=50)
+
+
+def test_settle_without_usage_or_over_estimate_changes_nothing():
+    async def run():
+        limiter = TokenBucketRateLimiter('test', requests_per_minute=600, tokens_per_minute=10000, backend='memory')
+        await limiter.acquire(4000)
+        before = (await limiter.headroom())['available_tokens']
+        await limiter.settle(4000, None)
+        await limiter.settle(4000, 5000)
+        return before, (await limiter.headroom())['available_tokens']
+
+    before, after = asyncio.run(run())
+    assert after - before < 50
+
+
+def test_settle_never_overfills_the_bucket():
+    async def run():
+        limiter = TokenBucketRateLimiter('test', requests_per_minute=600, tokens_per_minute=10000, backend='memory')
+        await limiter.acquire(100)
+        await limiter.settle(20000, 0)
+        return (await limiter.headroom())['available_tokens']
+
+    assert asyncio.run(run()) == 10000
+
+
+def test_try_acquire_refuses_without_headroom():
+    async def run():
+        limiter = TokenBucketRateLimiter('test', requests_per_minute=600, tokens_per_minute=10000, backend='memory')
+        await limiter.acquire(9000)
+        return await limiter.try_acquire(5000), await limiter.try_acquire(500)
+
+    assert asyncio.run(run()) == (False, True)
@@ -0,0 +1,85 @@
+import asyncio
+
+from scheduler import LANE_BACKGROUND, LANE_INTERACTIVE, FairShareScheduler
+
+
+async def _serve(scheduler, calls):
+    """Queue calls behind one held slot, then record the order they are granted"""
+    order = []
+    await scheduler.acquire('blocker')
+
+    async def call(client_id, lane, weight, cost):
+        async with scheduler.slot(client_id, lane, weight, cost):
+            order.append(client_id)
+
+    tasks = [asyncio.create_task(call(*args)) for args in calls]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_clients_are_interleaved_within_a_lane():
+    scheduler = FairShareScheduler(max_concurrency=1)
+    calls = [('a', LANE_BACKGROUND, 1, 100)] * 3 + [('b', LANE_BACKGROUND, 1, 100)] * 3
+    assert asyncio.run(_serve(scheduler, calls)) == ['a', 'b', 'a', 'b', 'a', 'b']
+
+
+def test_weight_gives_a_larger_share():
+    scheduler = FairShareScheduler(max_concurrency=1)
+    calls = [('a', LANE_BACKGROUND, 2, 100)] * 4 + [('b', LANE_BACKGROUND, 1, 100)] * 2
+    assert asyncio.run(_serve(scheduler, calls)) == ['a', 'a', 'b', 'a', 'a', 'b']
+
+
+def test_interactive_lane_is_served_first():
+    scheduler = FairShareScheduler(max_concurrency=1)
+    calls = [('bulk', LANE_BACKGROUND, 1, 1)] * 3 + [('reviewer', LANE_INTERACTIVE, 1, 1000)]
+    assert asyncio.run(_serve(scheduler, calls))[0] == 'reviewer'
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        scheduler = FairShareScheduler(max_concurrency=1)
+        await scheduler.acquire('blocker')
+        waiting = asyncio.create_task(scheduler.acquire('a'))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        scheduler.release()
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["in_flight"] == 0
+    assert stats["lanes"][LANE_BACKGROUND]["queue_depth"] == 0
+    assert stats["lanes"][LANE_BACKGROUND]["cancelled"] == 1
+
+
+def test_admission_runs_in_scheduler_order_one_per_gate():
+    async def run():
+        scheduler = FairShareScheduler(max_concurrency=4)
+        admitted = []
+        active = []
+
+        def admit_for(name):
+            async def admit():
+                active.append(name)
+                assert len(active) == 1
+                await asyncio.sleep(0)
+                admitted.append(name)
+                active.remove(name)
+            return admit
+
+        async def call(client_id, lane):
+            async with scheduler.slot(client_id, lane, admit=admit_for(client_id), gate='openai'):
+                pass
+
+        tasks = [asyncio.create_task(call('bulk', LANE_BACKGROUND)) for _ in range(2)]
+        tasks.append(asyncio.create_task(call('reviewer', LANE_INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        return admitted, scheduler.stats()
+
+    admitted, stats = asyncio.run(run())
+    # The first background call was admitted before the reviewer arrived; the reviewer goes next
+    assert admitted == ['bulk', 'reviewer', 'bulk']
+    assert stats["in_flight"] == 0
+    assert stats["admitting"] == []
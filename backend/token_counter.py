@@ -0,0 +1,65 @@
+"""
+Local token counting for prompt budgets
+Uses tiktoken when it is installed, otherwise a word/punctuation heuristic
+that tracks GPT tokenizers closely enough for budgeting.
+"""
+import re
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+_encoding = None
+# Words, runs of digits and single punctuation marks each count as at least one token
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Count (or closely estimate) the tokens in text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Common words are one token; long words split every ~6 letters, numbers every 3 digits
+    return sum((len(piece) + 5) // 6 if piece.isalpha() else (len(piece) + 2) // 3 for piece in _TOKEN_RE.findall(text))
+
+
+@lru_cache(maxsize=256)
+def truncate_to_tokens(text: Optional[str], max_tokens: int) -> str:
+    """Cut text to at most max_tokens, at a word boundary where possible"""
+    if not text or max_tokens <= 0:
+        return ''
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text)[:max_tokens])
+    else:
+        # Binary search on the character length that fits
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        cut = text[:low]
+
+    # Only back off when the cut splits a word; a cut on whitespace is already clean
+    rest = text[len(cut):] if text.startswith(cut) else ''
+    splits_word = cut and not cut[-1].isspace() and rest and not rest[0].isspace()
+    if splits_word and ' ' in cut.strip():
+        cut = cut[:cut.rstrip().rindex(' ')]
+    return cut.rstrip()
@@ -0,0 +1,404 @@
+"""
+Per-call usage ledger for model calls
+Every upstream call (and every cache hit that saved one) appends a compact
+record - client, platform, model, token counts, latency, cache hit, retries
+and estimated cost. record() only appends to a buffer. A background task
+flushes it to MongoDB in batches, so the request path never waits on the
+write. Without MongoDB, recent records are kept in memory.
+"""
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from database import get_usage_collection
+
+USAGE_LEDGER_ENABLED = os.getenv('USAGE_LEDGER_ENABLED', 'true').lower() == 'true'
+USAGE_LEDGER_BATCH_SIZE = int(os.getenv('USAGE_LEDGER_BATCH_SIZE', '200'))
+USAGE_LEDGER_FLUSH_SECONDS = float(os.getenv('USAGE_LEDGER_FLUSH_SECONDS', '2'))
+# Records held while MongoDB is unreachable (oldest are dropped beyond this)
+USAGE_LEDGER_MAX_BUFFER = int(os.getenv('USAGE_LEDGER_MAX_BUFFER', '10000'))
+# Records kept for aggregation when MongoDB is not connected
+USAGE_LEDGER_MEMORY_RECORDS = int(os.getenv('USAGE_LEDGER_MEMORY_RECORDS', '20000'))
+
+# USD per 1M tokens (input, cached input, output); images are USD per image
+DEFAULT_MODEL_PRICING = {
+    'gpt-4': {'input': 30.0, 'cached_input': 30.0, 'output': 60.0},
+    'gpt-4-turbo': {'input': 10.0, 'cached_input': 10.0, 'output': 30.0},
+    'gpt-4o': {'input': 2.5, 'cached_input': 1.25, 'output': 10.0},
+    'gpt-4o-mini': {'input': 0.15, 'cached_input': 0.075, 'output': 0.6},
+    'gpt-3.5-turbo': {'input': 0.5, 'cached_input': 0.5, 'output': 1.5},
+    'dall-e-3': {'image': 0.04}
+}
+# Overrides/additions, e.g. {"gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10}}
+MODEL_PRICING = {**DEFAULT_MODEL_PRICING, **json.loads(os.getenv('MODEL_PRICING', '{}') or '{}')}
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def _end_condition(end: str) -> Dict:
+    """
+    MongoDB condition on "ts" for an inclusive end of range
+
+    A date-only end ("2026-10-17") covers that whole day, so records must sort
+    before the next day; a timestamp end is compared as given.
+    """
+    try:
+        return {"$lt": (date.fromisoformat(end) + timedelta(days=1)).isoformat()}
+    except ValueError:
+        return {"$lte": end}
+
+
+def _before_end(ts: str, end: str) -> bool:
+    """In-memory version of _end_condition"""
+    condition = _end_condition(end)
+    return ts < condition["$lt"] if "$lt" in condition else ts <= condition["$lte"]
+
+# Latency histogram bucket upper bounds (ms). Percentiles are read from bucket
+# counts, so aggregation results stay a fixed size however many calls match.
+LATENCY_BUCKETS_MS = (
+    25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 4000, 5000,
+    7500, 10000, 15000, 20000, 30000, 45000, 60000, 90000, 120000
+)
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, cached_tokens: int, completion_tokens: int, images: int = 0) -> float:
+    """Estimated USD cost of a call from MODEL_PRICING (0 for unknown models)"""
+    pricing = MODEL_PRICING.get(model or '', {})
+    if images:
+        return round(images * pricing.get('image', 0.0), 6)
+    uncached = max(0, prompt_tokens - cached_tokens)
+    cost = (
+        uncached * pricing.get('input', 0.0)
+        + cached_tokens * pricing.get('cached_input', pricing.get('input', 0.0))
+        + completion_tokens * pricing.get('output', 0.0)
+    ) / 1_000_000
+    return round(cost, 6)
+
+
+def _platform_from_route(route: Optional[str]) -> Optional[str]:
+    """Routes are "<platform>:<content_type>"; "*" routes span several platforms"""
+    platform = (route or '').split(':')[0]
+    return platform if platform and platform != '*' else None
+
+
+def _bucket_index(latency_ms: float) -> int:
+    """Histogram bucket of a latency; len(LATENCY_BUCKETS_MS) is the overflow bucket"""
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _percentile(histogram: List[int], p: float, max_ms: float) -> float:
+    """Upper bound of the bucket holding the p-th sample (the observed max for the overflow bucket)"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    rank = max(1, int(p * total + 0.999999))
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            bound = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else max_ms
+            return round(min(bound, max_ms), 1)
+    return round(max_ms, 1)
+
+
+class UsageLedger:
+    """Buffered, batched writer of per-call usage records"""
+
+    def __init__(self):
+        self._buffer = deque()
+        self._memory = deque(maxlen=USAGE_LEDGER_MEMORY_RECORDS)
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flush_errors = 0
+
+    def record(
+        self,
+        context: Optional[Dict],
+        model: Optional[str],
+        kind: str,
+        usage=None,
+        latency_seconds: float = 0.0,
+        cache_hit: bool = False,
+        attempts: int = 1,
+        error: Optional[str] = None,
+        images: int = 0
+    ):
+        """
+        Append a usage record (never blocks or raises)
+
+        Args:
+            context: Call metadata from services._call_context
+            model: Model used
+            kind: "chat", "stream" or "image"
+            usage: The response's usage object, if any
+            latency_seconds: Wall time of the call
+            cache_hit: True if the generation cache answered instead of the model
+            attempts: Upstream attempts made (hedged calls make two)
+            error: Error message if the call failed
+            images: Images generated (image calls)
+        """
+        if not USAGE_LEDGER_ENABLED:
+            return
+        context = context or {}
+        details = getattr(usage, 'prompt_tokens_details', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', None) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', None) or 0
+        cached_tokens = getattr(details, 'cached_tokens', None) or 0
+        billed = not cache_hit and error is None
+
+        self._buffer.append({
+            "ts": datetime.now().isoformat(),
+            "client_id": context.get('client_id'),
+            "platform": _platform_from_route(context.get('route')),
+            "template": context.get('template'),
+            "lane": context.get('lane'),
+            "model": model,
+            "kind": kind,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "latency_ms": round(latency_seconds * 1000, 1),
+            "cache_hit": cache_hit,
+            "retries": max(0, attempts - 1),
+            "error": error,
+            "cost_usd": estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens, images) if billed else 0.0
+        })
+        self.recorded += 1
+        while len(self._buffer) > USAGE_LEDGER_MAX_BUFFER:
+            self._buffer.popleft()
+            self.dropped += 1
+
+    @contextmanager
+    def track(self, context: Optional[Dict], model: Optional[str], kind: str):
+        """
+        Time a call and record it on exit
+
+        Yields:
+            Dict the caller fills in: "usage", "attempts" and (for images) "images"
+        """
+        entry = {"usage": None, "attempts": 0, "images": 0}
+        started = time.monotonic()
+        try:
+            yield entry
+        except (Exception, asyncio.CancelledError) as e:
+            error = "cancelled" if isinstance(e, asyncio.CancelledError) else str(e)[:200]
+            self.record(context, model, kind, entry["usage"], time.monotonic() - started,
+                        attempts=max(1, entry["attempts"]), error=error)
+            raise
+        self.record(context, model, kind, entry["usage"], time.monotonic() - started,
+                    attempts=max(1, entry["attempts"]), images=entry["images"])
+
+    async def flush(self):
+        """Write buffered records in batches (to memory if MongoDB is not connected)"""
+        collection = get_usage_collection()
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(USAGE_LEDGER_BATCH_SIZE, len(self._buffer)))]
+            if collection is None:
+                self._memory.extend(batch)
+                continue
+            try:
+                await collection.insert_many([dict(record) for record in batch], ordered=False)
+                self.written += len(batch)
+            except Exception as e:
+                # Put the batch back and retry on the next flush
+                self._buffer.extendleft(reversed(batch))
+                self.flush_errors += 1
+                print(f"⚠️ Warning: Could not write usage records: {str(e)}")
+                return
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(USAGE_LEDGER_FLUSH_SECONDS)
+            await self.flush()
+
+    def start(self):
+        """Start the background flusher"""
+        if USAGE_LEDGER_ENABLED and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _records(self, query: Dict) -> Optional[List[Dict]]:
+        """Matching records from memory, or None when MongoDB should be aggregated instead"""
+        if get_usage_collection() is not None:
+            return None
+
+        def matches(record):
+            if record["ts"] < query.get("start", "") or ("end" in query and not _before_end(record["ts"], query["end"])):
+                return False
+            return not query.get("client_id") or record["client_id"] == query["client_id"]
+
+        return [record for record in list(self._memory) + list(self._buffer) if matches(record)]
+
+    async def summarize(self, start: Optional[str] = None, end: Optional[str] = None, client_id: Optional[str] = None) -> Dict:
+        """
+        Totals plus cost and latency percentiles per client, platform and model
+
+        Args:
+            start: ISO timestamp lower bound (inclusive)
+            end: ISO timestamp upper bound (inclusive); a date-only end includes that whole day
+            client_id: Restrict to one client
+
+        Returns:
+            Dict with "total", "by_client", "by_platform" and "by_model"
+        """
+        await self.flush()
+        query = {key: value for key, value in {"start": start, "end": end, "client_id": client_id}.items() if value}
+        records = await self._records(query)
+        if records is None:
+            groups = await self._aggregate_mongo(query)
+        else:
+            groups = {
+                facet: _group(records, field)
+                for facet, field in (("total", None), ("by_client", "client_id"), ("by_platform", "platform"), ("by_model", "model"))
+            }
+        return {
+            "range": {"start": start, "end": end},
+            "client_id": client_id,
+            "total": groups["total"][0] if groups["total"] else _summary(None, []),
+            "by_client": groups["by_client"],
+            "by_platform": groups["by_platform"],
+            "by_model": groups["by_model"]
+        }
+
+    async def _aggregate_mongo(self, query: Dict) -> Dict:
+        match = {}
+        if query.get("start") or query.get("end"):
+            match["ts"] = {}
+            if query.get("start"):
+                match["ts"]["$gte"] = query["start"]
+            if query.get("end"):
+                match["ts"].update(_end_condition(query["end"]))
+        if query.get("client_id"):
+            match["client_id"] = query["client_id"]
+
+        def group_stage(field):
+            return [
+                {"$group": {
+                    "_id": f"${field}" if field else None,
+                    "calls": {"$sum": 1},
+                    "cache_hits": {"$sum": {"$cond": ["$cache_hit", 1, 0]}},
+                    "errors": {"$sum": {"$cond": [{"$ifNull": ["$error", False]}, 1, 0]}},
+                    "retries": {"$sum": "$retries"},
+                    "prompt_tokens": {"$sum": "$prompt_tokens"},
+                    "completion_tokens": {"$sum": "$completion_tokens"},
+                    "cached_tokens": {"$sum": "$cached_tokens"},
+                    "cost_usd": {"$sum": "$cost_usd"},
+                    # Fixed-size histogram instead of pushing every latency
+                    # ($percentile needs MongoDB 7+)
+                    "latency_count": {"$sum": {"$cond": [{"$gte": ["$latency_bucket", 0]}, 1, 0]}},
+                    "latency_sum": {"$sum": {"$cond": [{"$gte": ["$latency_bucket", 0]}, "$latency_ms", 0]}},
+                    "latency_max": {"$max": {"$cond": [{"$gte": ["$latency_bucket", 0]}, "$latency_ms", 0]}},
+                    **{
+                        f"h{index}": {"$sum": {"$cond": [{"$eq": ["$latency_bucket", index]}, 1, 0]}}
+                        for index in range(len(LATENCY_BUCKETS_MS) + 1)
+                    }
+                }},
+                {"$sort": {"cost_usd": -1}}
+            ]
+
+        bucket = {"$switch": {
+            "branches": [
+                {"case": {"$lte": ["$latency_ms", bound]}, "then": index}
+                for index, bound in enumerate(LATENCY_BUCKETS_MS)
+            ],
+            "default": len(LATENCY_BUCKETS_MS)
+        }}
+        pipeline = [
+            {"$match": match},
+            # Cache hits have no upstream latency; -1 keeps them out of the histogram
+            {"$addFields": {"latency_bucket": {"$cond": ["$cache_hit", -1, bucket]}}},
+            {"$facet": {
+                "total": group_stage(None),
+                "by_client": group_stage("client_id"),
+                "by_platform": group_stage("platform"),
+                "by_model": group_stage("model")
+            }}
+        ]
+        result = await get_usage_collection().aggregate(pipeline).to_list(length=1)
+        facets = result[0] if result else {}
+        return {
+            facet: [_finish(group) for group in facets.get(facet, [])]
+            for facet in ("total", "by_client", "by_platform", "by_model")
+        }
+
+    def stats(self) -> Dict:
+        """Writer counters"""
+        return {
+            "enabled": USAGE_LEDGER_ENABLED,
+            "recorded": self.recorded,
+            "written": self.written,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "flush_errors": self.flush_errors
+        }
+
+
+def _finish(group: Dict) -> Dict:
+    """Turn a grouped aggregate (with a latency histogram) into a summary"""
+    histogram = [group.pop(f"h{index}", 0) for index in range(len(LATENCY_BUCKETS_MS) + 1)]
+    count = group.pop("latency_count", 0)
+    total = group.pop("latency_sum", 0.0)
+    max_ms = group.pop("latency_max", 0.0) or 0.0
+    group["key"] = group.pop("_id", None)
+    group["cost_usd"] = round(group.get("cost_usd", 0.0), 6)
+    group["latency_ms"] = {
+        "avg": round(total / count, 1) if count else 0.0,
+        "max": round(max_ms, 1),
+        **{f"p{int(p * 100)}": _percentile(histogram, p, max_ms) for p in PERCENTILES}
+    }
+    return group
+
+
+def _summary(key, records: List[Dict]) -> Dict:
+    latencies = [r["latency_ms"] for r in records if not r["cache_hit"]]
+    histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for latency in latencies:
+        histogram[_bucket_index(latency)] += 1
+    return _finish({
+        "_id": key,
+        "calls": len(records),
+        "cache_hits": sum(1 for r in records if r["cache_hit"]),
+        "errors": sum(1 for r in records if r["error"]),
+        "retries": sum(r["retries"] for r in records),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+        "completion_tokens": sum(r["completion_tokens"] for r in records),
+        "cached_tokens": sum(r["cached_tokens"] for r in records),
+        "cost_usd": sum(r["cost_usd"] for r in records),
+        "latency_count": len(latencies),
+        "latency_sum": sum(latencies),
+        "latency_max": max(latencies, default=0.0),
+        **{f"h{index}": count for index, count in enumerate(histogram)}
+    })
+
+
+def _group(records: List[Dict], field: Optional[str]) -> List[Dict]:
+    """In-memory equivalent of one $facet branch"""
+    if field is None:
+        return [_summary(None, records)] if records else []
+    grouped: Dict = {}
+    for record in records:
+        grouped.setdefault(record.get(field), []).append(record)
+    return sorted((_summary(key, items) for key, items in grouped.items()), key=lambda g: -g["cost_usd"])
+
+
+# Shared ledger used by services.py
+usage_ledger = UsageLedger()
@@ -7,6 +7,8 @@ import { useToastContext } from '../context/ToastContext';
 const CampaignAutomation = () => {
   const [campaigns, setCampaigns] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const toast = useToastContext();
   const [formData, setFormData] = useState({
@@ -29,6 +31,7 @@ const CampaignAutomation = () => {
       setLoading(true);
       const data = await getCampaigns();
       setCampaigns(data.campaigns || []);
+      setNextCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error loading campaigns:', error);
     } finally {
@@ -36,6 +39,21 @@ const CampaignAutomation = () => {
     }
   };
 
+  const loadMoreCampaigns = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const data = await getCampaigns(nextCursor);
+      setCampaigns(prev => [...prev, ...(data.campaigns || []).filter(item => !prev.some(c => c.id === item.id))]);
+      setNextCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error loading more campaigns:', error);
+      toast.error('Failed to load more campaigns');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleCreate = async (e) => {
     e.preventDefault();
     try {
@@ -176,6 +194,14 @@ const CampaignAutomation = () => {
           </div>
         )}
 
+        {nextCursor && (
+          <div className="load-more">
+            <button className="btn btn-secondary" onClick={loadMoreCampaigns} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
+
         {/* Create Campaign Modal */}
         {showCreateModal && (
           <div className="modal-overlay" onClick={() => setShowCreateModal(false)}>
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import './ContentApproval.css';
-import { getPendingContent, approveContent, editContent, deleteContent, regenerateContent, getClients } from '../services/api';
+import { getPendingContent, getContent, approveContent, editContent, autoFixContent, deleteContent, batchApproveContent, batchDeleteContent, streamRegenerateContent, getClients } from '../services/api';
 import BackButton from '../components/BackButton';
 import WorkflowProgress from '../components/WorkflowProgress';
 import PlatformSelectionModal from '../components/PlatformSelectionModal';
@@ -10,11 +10,16 @@ import { useToastContext } from '../context/ToastContext';
 const ContentApproval = () => {
   const [contentItems, setContentItems] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [editingId, setEditingId] = useState(null);
   const [editText, setEditText] = useState('');
   const [selectedClient, setSelectedClient] = useState('all');
   const [regeneratingIds, setRegeneratingIds] = useState(new Set());
+  const [selectedIds, setSelectedIds] = useState(new Set());
+  const [batchBusy, setBatchBusy] = useState(false);
   const [clients, setClients] = useState([]);
+  const [clientsCursor, setClientsCursor] = useState(null);
   const [workflowStep, setWorkflowStep] = useState('approval');
   const [completedSteps, setCompletedSteps] = useState(['onboarding', 'generating']);
   const [postingItemId, setPostingItemId] = useState(null);
@@ -27,14 +32,19 @@ const ContentApproval = () => {
 
   useEffect(() => {
     loadContent();
-    loadClients();
   }, [selectedClient]);
 
+  useEffect(() => {
+    loadClients();
+  }, []);
+
   const loadContent = async () => {
     try {
       setLoading(true);
       const data = await getPendingContent(selectedClient);
       setContentItems(data.content || []);
+      setNextCursor(data.next_cursor || null);
+      setSelectedIds(new Set());
     } catch (error) {
       console.error('Error loading content:', error);
       toast.error('Failed to load pending content');
@@ -43,10 +53,29 @@ const ContentApproval = () => {
     }
   };
 
-  const loadClients = async () => {
+  const loadMoreContent = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const data = await getPendingContent(selectedClient, nextCursor);
+      setContentItems(prev => [...prev, ...(data.content || []).filter(item => !prev.some(c => c.id === item.id))]);
+      setNextCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error loading more content:', error);
+      toast.error('Failed to load more content');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Client filter options are paged too; "Load more clients..." fetches the next page
+  const loadClients = async (cursor = null) => {
     try {
-      const data = await getClients();
-      setClients(data.clients || []);
+      const data = await getClients(cursor);
+      setClients(prev => cursor
+        ? [...prev, ...(data.clients || []).filter(client => !prev.some(c => c.client_id === client.client_id))]
+        : (data.clients || []));
+      setClientsCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error loading clients:', error);
       toast.error('Failed to load clients');
@@ -160,13 +189,58 @@ const ContentApproval = () => {
     }
   };
 
+  const toggleSelected = (itemId) => {
+    setSelectedIds(prev => {
+      const newSet = new Set(prev);
+      if (newSet.has(itemId)) {
+        newSet.delete(itemId);
+      } else {
+        newSet.add(itemId);
+      }
+      return newSet;
+    });
+  };
+
+  const toggleSelectAll = () => {
+    setSelectedIds(prev => (prev.size === contentItems.length ? new Set() : new Set(contentItems.map(c => c.id))));
+  };
+
+  const handleBatch = async (action) => {
+    const ids = [...selectedIds];
+    const label = action === 'approve' ? 'Approve' : 'Delete';
+    if (!window.confirm(`${label} ${ids.length} selected item(s)?`)) return;
+    try {
+      setBatchBusy(true);
+      const result = action === 'approve' ? await batchApproveContent(ids) : await batchDeleteContent(ids);
+      const done = result.counts.ok || 0;
+      const failed = result.requested - done;
+      const invalid = result.counts.invalid || 0;
+      await loadContent();
+      if (failed > 0) {
+        const reason = invalid > 0 ? ` (${invalid} fail platform validation)` : '';
+        toast.warning(`${label}d ${done} of ${result.requested} items; ${failed} could not be ${action}d${reason}`);
+      } else {
+        toast.success(`${label}d ${done} items`);
+      }
+    } catch (error) {
+      toast.error(`Error: ${error.message}`);
+    } finally {
+      setBatchBusy(false);
+    }
+  };
+
   const handleRegenerate = async (itemId, platform, contentType) => {
     if (window.confirm(`Regenerate ${contentType} for ${platform}?`)) {
       try {
         setRegeneratingIds(prev => new Set(prev).add(itemId));
         toast.info(`Regenerating content for ${platform}...`);
         
-        const result = await regenerateContent(itemId, platform, contentType);
+        // Show tokens in the card as they stream in
+        let streamedText = '';
+        await streamRegenerateContent(itemId, platform, contentType, (delta) => {
+          streamedText += delta;
+          setContentItems(prev => prev.map(c => (c.id === itemId ? { ...c, content: streamedText } : c)));
+        });
         await loadContent();
         
         setRegeneratingIds(prev => {
@@ -187,6 +261,25 @@ const ContentApproval = () => {
     }
   };
 
+  // List items carry a preview; fetch the full body when it is needed
+  const loadFullContent = async (itemId) => {
+    const item = contentItems.find(c => c.id === itemId);
+    if (item.content !== undefined) {
+      return item;
+    }
+    const result = await getContent(itemId);
+    setContentItems(items => items.map(c => c.id === itemId ? result.data : c));
+    return result.data;
+  };
+
+  const handleShowFull = async (itemId) => {
+    try {
+      await loadFullContent(itemId);
+    } catch (error) {
+      toast.error('Error loading content: ' + error.message);
+    }
+  };
+
   const handleEdit = async (itemId) => {
     if (editingId === itemId) {
       // Save edit
@@ -201,9 +294,23 @@ const ContentApproval = () => {
       }
     } else {
       // Start editing
-      const item = contentItems.find(c => c.id === itemId);
-      setEditingId(itemId);
-      setEditText(item.content);
+      try {
+        const item = await loadFullContent(itemId);
+        setEditingId(itemId);
+        setEditText(item.content);
+      } catch (error) {
+        toast.error('Error loading content: ' + error.message);
+      }
+    }
+  };
+
+  const handleAutoFix = async (itemId) => {
+    try {
+      const result = await autoFixContent(itemId);
+      setContentItems(items => items.map(c => c.id === itemId ? result.data : c));
+      toast.success(result.message);
+    } catch (error) {
+      toast.error('Error fixing content: ' + error.message);
     }
   };
 
@@ -286,7 +393,13 @@ const ContentApproval = () => {
         <div className="filters">
           <select 
             value={selectedClient} 
-            onChange={(e) => setSelectedClient(e.target.value)}
+            onChange={(e) => {
+              if (e.target.value === '__more__') {
+                loadClients(clientsCursor);
+              } else {
+                setSelectedClient(e.target.value);
+              }
+            }}
             className="filter-select"
           >
             <option value="all">All Clients</option>
@@ -295,9 +408,39 @@ const ContentApproval = () => {
                 {client.company_name} ({client.client_id})
               </option>
             ))}
+            {clientsCursor && (
+              <option value="__more__">Load more clients...</option>
+            )}
           </select>
         </div>
 
+        {contentItems.length > 0 && (
+          <div className="batch-bar">
+            <label className="batch-select-all">
+              <input
+                type="checkbox"
+                checked={selectedIds.size === contentItems.length}
+                onChange={toggleSelectAll}
+              />
+              {selectedIds.size > 0 ? `${selectedIds.size} selected` : 'Select all'}
+            </label>
+            <button
+              className="btn btn-success btn-sm"
+              onClick={() => handleBatch('approve')}
+              disabled={selectedIds.size === 0 || batchBusy}
+            >
+              ✓ Approve Selected
+            </button>
+            <button
+              className="btn btn-danger btn-sm"
+              onClick={() => handleBatch('delete')}
+              disabled={selectedIds.size === 0 || batchBusy}
+            >
+              🗑️ Delete Selected
+            </button>
+          </div>
+        )}
+
         {contentItems.length === 0 ? (
           <div className="empty-state">
             <div className="empty-icon">📋</div>
@@ -330,6 +473,12 @@ const ContentApproval = () => {
                 )}
                 <div className="content-header">
                   <div className="content-meta">
+                    <input
+                      type="checkbox"
+                      className="content-select"
+                      checked={selectedIds.has(item.id)}
+                      onChange={() => toggleSelected(item.id)}
+                    />
                     <span className="platform-badge">
                       {getPlatformIcon(item.platform)} {item.platform}
                     </span>
@@ -395,7 +544,24 @@ const ContentApproval = () => {
                       rows="6"
                     />
                   ) : (
-                    <div className="content-text">{item.content}</div>
+                    <div className="content-text">
+                      {item.content !== undefined ? item.content : item.preview}
+                      {item.content === undefined && item.preview_truncated && (
+                        <button className="show-full-btn" onClick={() => handleShowFull(item.id)}>
+                          Show full
+                        </button>
+                      )}
+                    </div>
+                  )}
+
+                  {item.validation && item.validation.violations.length > 0 && (
+                    <ul className="content-violations">
+                      {item.validation.violations.map((violation, idx) => (
+                        <li key={idx} className={`violation violation-${violation.severity}`}>
+                          {violation.severity === 'error' ? '⛔' : '⚠️'} {violation.message}
+                        </li>
+                      ))}
+                    </ul>
                   )}
                 </div>
 
@@ -433,6 +599,14 @@ const ContentApproval = () => {
                         >
                           ✏️ Edit
                         </button>
+                        {item.validation && item.validation.violations.some(v => v.fixable) && (
+                          <button 
+                            className="btn btn-secondary btn-sm"
+                            onClick={() => handleAutoFix(item.id)}
+                          >
+                            🛠️ Fix Locally
+                          </button>
+                        )}
                         <button 
                           className="btn btn-warning btn-sm"
                           onClick={() => handleRegenerate(item.id, item.platform, item.content_type)}
@@ -454,6 +628,14 @@ const ContentApproval = () => {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="load-more">
+            <button className="btn btn-secondary" onClick={loadMoreContent} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -62,6 +62,11 @@ export const onboardClient = async (formData, images = [], videos = []) => {
       throw new Error(result.message || 'Failed to onboard client');
     }
 
+    // Content is generated in a background job; wait for it to finish
+    if (result.job_id) {
+      result.job = await waitForJob(result.job_id);
+    }
+
     return result;
   } catch (error) {
     if (error.message.includes('Failed to fetch') || error.message.includes('NetworkError')) {
@@ -72,11 +77,53 @@ export const onboardClient = async (formData, images = [], videos = []) => {
 };
 
 /**
- * Get all clients
+ * Get status and per-platform progress of a background job
  */
-export const getClients = async () => {
+export const getJobStatus = async (jobId) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/api/clients`);
+    const response = await fetch(`${API_BASE_URL}/api/jobs/${jobId}`);
+    const data = await response.json();
+    if (!data.success) {
+      throw new Error(data.message || 'Failed to fetch job status');
+    }
+    return data.job;
+  } catch (error) {
+    throw new Error('Failed to fetch job status');
+  }
+};
+
+/**
+ * Poll a background job until it completes or fails
+ * @param {string} jobId - Job ID returned by the API
+ * @param {number} intervalMs - Delay between polls
+ * @param {number} maxWaitMs - Give up (and throw) after this long
+ */
+export const waitForJob = async (jobId, intervalMs = 1500, maxWaitMs = 10 * 60 * 1000) => {
+  const deadline = Date.now() + maxWaitMs;
+  for (;;) {
+    const job = await getJobStatus(jobId);
+    if (job.status === 'completed' || job.status === 'failed') {
+      return job;
+    }
+    if (Date.now() + intervalMs > deadline) {
+      throw new Error(`Content generation is still running after ${Math.round(maxWaitMs / 60000)} minutes. Check the Content Approval page later.`);
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+};
+
+/**
+ * Get one page of clients, newest first (pass next_cursor for the next page)
+ *
+ * Only the id and company name are returned, which is all the client pickers need.
+ */
+export const getClients = async (cursor = null) => {
+  try {
+    const params = new URLSearchParams({ fields: 'client_id,company_name' });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+    const response = await fetch(`${API_BASE_URL}/api/clients?${params.toString()}`);
     const data = await response.json();
     return data;
   } catch (error) {
@@ -98,13 +145,22 @@ export const getClient = async (clientId) => {
 };
 
 /**
- * Get pending content for approval
+ * Get one page of pending content for approval (pass next_cursor for the next page)
+ *
+ * Items come in the summary view: a truncated "preview" instead of the body.
+ * Use getContent for the full item.
  */
-export const getPendingContent = async (clientId = 'all') => {
+export const getPendingContent = async (clientId = 'all', cursor = null) => {
   try {
-    const url = clientId === 'all' 
-      ? `${API_BASE_URL}/api/content/pending`
-      : `${API_BASE_URL}/api/content/pending?client_id=${clientId}`;
+    const params = new URLSearchParams({ view: 'summary' });
+    if (clientId !== 'all') {
+      params.set('client_id', clientId);
+    }
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+    const query = params.toString();
+    const url = `${API_BASE_URL}/api/content/pending${query ? `?${query}` : ''}`;
     const response = await fetch(url);
     const data = await response.json();
     return data;
@@ -113,6 +169,22 @@ export const getPendingContent = async (clientId = 'all') => {
   }
 };
 
+/**
+ * Get a full content item
+ */
+export const getContent = async (contentId) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/content/${contentId}`);
+    const data = await response.json();
+    if (!data.success) {
+      throw new Error(data.message || 'Failed to fetch content');
+    }
+    return data;
+  } catch (error) {
+    throw new Error('Failed to fetch content');
+  }
+};
+
 /**
  * Approve content
  */
@@ -178,6 +250,24 @@ export const editContent = async (contentId, newContent) => {
   }
 };
 
+/**
+ * Apply local platform-constraint fixes (trimming, hashtag pruning, title extraction)
+ */
+export const autoFixContent = async (contentId) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/content/${contentId}/autofix`, {
+      method: 'POST'
+    });
+    const data = await response.json();
+    if (!data.success) {
+      throw new Error(data.message || 'Failed to fix content');
+    }
+    return data;
+  } catch (error) {
+    throw new Error('Failed to fix content');
+  }
+};
+
 /**
  * Delete content
  */
@@ -196,10 +286,41 @@ export const deleteContent = async (contentId) => {
   }
 };
 
+const postBatch = async (action, body) => {
+  const response = await fetch(`${API_BASE_URL}/api/content/batch/${action}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify(body)
+  });
+  const data = await response.json();
+  if (!data.success) {
+    throw new Error(data.message || `Failed to ${action} content`);
+  }
+  return data;
+};
+
+/**
+ * Approve many pending items at once (status only, no platform posting).
+ * Returns per-item results with status "ok", "skipped" or "not_found".
+ */
+export const batchApproveContent = async (contentIds) => postBatch('approve', { ids: contentIds });
+
+/**
+ * Delete many items at once
+ */
+export const batchDeleteContent = async (contentIds) => postBatch('delete', { ids: contentIds });
+
+/**
+ * Replace the text of many items at once ([{ id, content }])
+ */
+export const batchEditContent = async (items) => postBatch('edit', { items });
+
 /**
  * Regenerate content
  */
-export const regenerateContent = async (contentId, platform, contentType, improvementFocus = null) => {
+export const regenerateContent = async (contentId, platform, contentType, improvementFocus = null, variants = 1) => {
   try {
     const requestBody = { 
       platform, 
@@ -209,6 +330,11 @@ export const regenerateContent = async (contentId, platform, contentType, improv
     if (improvementFocus) {
       requestBody.improvement_focus = improvementFocus;
     }
+
+    // More than one variant stores alternatives as candidates instead of replacing the content
+    if (variants > 1) {
+      requestBody.variants = variants;
+    }
     
     const response = await fetch(`${API_BASE_URL}/api/content/${contentId}/regenerate`, {
       method: 'POST',
@@ -227,6 +353,83 @@ export const regenerateContent = async (contentId, platform, contentType, improv
   }
 };
 
+/**
+ * Replace content with one of its regenerated candidates
+ */
+export const selectContentCandidate = async (contentId, candidateId) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/content/${contentId}/candidates/${candidateId}/select`, {
+      method: 'POST'
+    });
+    const data = await response.json();
+    if (!data.success) {
+      throw new Error(data.message || 'Failed to select candidate');
+    }
+    return data;
+  } catch (error) {
+    throw new Error('Failed to select candidate');
+  }
+};
+
+/**
+ * Regenerate content, receiving tokens as they are generated
+ * @param {Function} onToken - Called with each text delta as it arrives
+ * @returns The saved content item once the stream completes
+ */
+export const streamRegenerateContent = async (contentId, platform, contentType, onToken, improvementFocus = null) => {
+  const requestBody = {
+    platform,
+    content_type: contentType
+  };
+
+  if (improvementFocus) {
+    requestBody.improvement_focus = improvementFocus;
+  }
+
+  const response = await fetch(`${API_BASE_URL}/api/content/${contentId}/regenerate/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify(requestBody)
+  });
+
+  if (!response.ok || !response.body) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.message || 'Failed to regenerate content');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Server-sent events are separated by a blank line
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+
+    for (const rawEvent of events) {
+      const lines = rawEvent.split('\n');
+      const event = (lines.find(line => line.startsWith('event: ')) || '').slice(7);
+      const data = JSON.parse((lines.find(line => line.startsWith('data: ')) || 'data: {}').slice(6));
+
+      if (event === 'token') {
+        onToken(data.delta);
+      } else if (event === 'done') {
+        return data;
+      } else if (event === 'error') {
+        throw new Error(data.message || 'Failed to regenerate content');
+      }
+    }
+  }
+
+  throw new Error('Regeneration stream ended unexpectedly');
+};
+
 /**
  * Get analytics data
  */
@@ -254,11 +457,12 @@ export const getDashboardStats = async () => {
 };
 
 /**
- * Get campaigns
+ * Get one page of campaigns, newest first (pass next_cursor for the next page)
  */
-export const getCampaigns = async () => {
+export const getCampaigns = async (cursor = null) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/api/campaigns`);
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const response = await fetch(`${API_BASE_URL}/api/campaigns${query}`);
     const data = await response.json();
     return data;
   } catch (error) {